@@ -1,26 +1,42 @@
 import os
 import logging
+import hashlib
+import base64
 import json
 import re
+import sys
+import io
+import csv
+import random
+import math
 import time
-from datetime import date, datetime, time as dtime, timezone
+from datetime import date, datetime, time as dtime, timedelta, timezone
 from decimal import Decimal
 from uuid import UUID
 import threading
+import sqlite3
+import queue
+import atexit
 from time import sleep
-from collections import defaultdict
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import OrderedDict, defaultdict, deque
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 from flask import Flask, jsonify, request, abort, g, Response
 from flask_cors import CORS
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, register_default_jsonb
+import psycopg2.errors
+import psycopg2.extensions
 from typing import Optional
-from ua_parser import user_agent_parser
 from user_agents import parse as ua_parse
 import ipaddress
+import bisect
+from zoneinfo import ZoneInfo
 import requests
-from functools import lru_cache
+from functools import lru_cache, wraps
+from urllib.parse import urlencode
+from werkzeug.http import http_date, parse_date, parse_etags
+import numpy as np
 
 # -------------------- Prometheus --------------------
 from prometheus_client import (
@@ -37,20 +53,110 @@ DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASS = os.getenv("DB_PASS", "")
 
 GEO_URL = os.getenv("GEO_URL", "http://ipgeo.epl-data.svc.cluster.local:8080")
+GEO_BACKEND = os.getenv("GEO_BACKEND", "http").lower()  # http|embedded
+GEO_CITY_DB = os.getenv("GEO_CITY_DB", "/data/dbip-city.mmdb")
+GEO_ASN_DB = os.getenv("GEO_ASN_DB", "/data/dbip-asn.mmdb")
 GEO_TIMEOUT = float(os.getenv("GEO_TIMEOUT", "0.35"))
+GEO_BATCH_ENABLED = os.getenv("GEO_BATCH_ENABLED", "true").lower() == "true"
+GEO_BATCH_MAX = int(os.getenv("GEO_BATCH_MAX", "500"))
+GEO_BATCH_TIMEOUT = float(os.getenv("GEO_BATCH_TIMEOUT", "2.0"))
 GEO_CACHE_TTL = int(os.getenv("GEO_CACHE_TTL", "1800")) 
-
-POOL: Optional[SimpleConnectionPool] = None
+GEO_NEGATIVE_TTL = int(os.getenv("GEO_NEGATIVE_TTL", "60"))
+GEO_CACHE_MAX = int(os.getenv("GEO_CACHE_MAX", "50000"))
+GEO_CACHE_V4_PREFIX = int(os.getenv("GEO_CACHE_V4_PREFIX", "24"))
+GEO_CACHE_V6_PREFIX = int(os.getenv("GEO_CACHE_V6_PREFIX", "48"))
+GEO_CACHE_BACKEND = os.getenv("GEO_CACHE_BACKEND", "local").lower()  # local|shared
+GEO_CACHE_PATH = os.getenv("GEO_CACHE_PATH", "/tmp/geo-cache.sqlite3")
+GEO_CACHE_SHARED_MAX = int(os.getenv("GEO_CACHE_SHARED_MAX", "200000"))
+
+UA_CACHE_MAX = int(os.getenv("UA_CACHE_MAX", "4096"))
+UA_MAX_LENGTH = int(os.getenv("UA_MAX_LENGTH", "512"))
+UA_PREWARM = os.getenv("UA_PREWARM", "true").lower() == "true"
+
+# Visits are geo/UA-enriched by a background thread, off the request path
+VISIT_QUEUE_MAX = int(os.getenv("VISIT_QUEUE_MAX", "10000"))
+VISIT_BATCH_SIZE = int(os.getenv("VISIT_BATCH_SIZE", "100"))
+VISIT_BATCH_WAIT = float(os.getenv("VISIT_BATCH_WAIT", "0.5"))
+
+# Enriched visits are buffered and written in batches to one or more outputs
+VISIT_SINK = os.getenv("VISIT_SINK", "stdout")  # comma-separated: stdout,file,postgres (or none)
+VISIT_SINK_PATH = os.getenv("VISIT_SINK_PATH", "/tmp/visits.ndjson")
+VISIT_SINK_BUFFER = int(os.getenv("VISIT_SINK_BUFFER", "20000"))
+VISIT_SINK_BATCH = int(os.getenv("VISIT_SINK_BATCH", "500"))
+VISIT_SINK_FLUSH_INTERVAL = float(os.getenv("VISIT_SINK_FLUSH_INTERVAL", "1.0"))
+VISIT_SAMPLE_RATES = os.getenv("VISIT_SAMPLE_RATES", "")  # e.g. "/health=0,/metrics=0.1" (path prefix=keep ratio)
+
+POOL: Optional["ConnectionPool"] = None
 POOL_LOCK = threading.Lock()
+REPLICA_POOLS: Dict[str, "ConnectionPool"] = {}
 
 
 POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
 POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "2.0"))          # max wait for a free connection
+POOL_QUEUE_MAX = int(os.getenv("DB_POOL_QUEUE_MAX", "64"))         # waiters beyond this are shed at once
+POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))   # ping connections idle longer than this
+POOL_RETRY_AFTER = int(os.getenv("DB_POOL_RETRY_AFTER", "1"))
+POOL_SAMPLE_INTERVAL = float(os.getenv("DB_POOL_SAMPLE_INTERVAL", "5"))
+
+# Read-only queries go to streaming replicas when listed; writes (and reads with no usable replica) use DB_HOST
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")  # comma-separated host[:port]
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "30"))           # seconds of replay lag tolerated
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+
+# Rate limiting: per-client token buckets; "shared" keeps them in a SQLite file every worker in the pod uses
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "shared").lower()  # local|shared
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", "/tmp/rate-limit.sqlite3")
+RATE_LIMIT_KEY = os.getenv("RATE_LIMIT_KEY", "ip").lower()  # ip|token
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "100"))  # burst, in cost units
+RATE_LIMIT_REFILL = float(os.getenv("RATE_LIMIT_REFILL", "20"))       # cost units regained per second
+RATE_LIMIT_COSTS = os.getenv(
+    "RATE_LIMIT_COSTS",
+    "/players=5,/completedFixtures=5,/fixtures=3,/weeklyTable=3,/fplPlayers=3,"
+    "/playersByTeam/<teamId>=2,/completedGamebyTeamId/<teamId>=2",
+)  # route rule=cost; unlisted routes cost 1
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Client addresses: forwarding headers only count on connections from these peers (our nginx / ingress)
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7")
+CLIENT_IP_HEADER = os.getenv("CLIENT_IP_HEADER", "")  # e.g. CF-Connecting-IP, if every path in overwrites it
 
 CORS_ENABLED = os.getenv("CORS_ENABLED", "false").lower() == "true"
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "").split(",") if os.getenv("CORS_ORIGINS") else []
 
+# Response cache (per worker); invalidated when the pipeline bumps data_versions
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "900"))
+DATA_VERSION_POLL = float(os.getenv("DATA_VERSION_POLL", "30"))
+
+# Single flight: concurrent identical cache misses share one render
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "5"))  # max wait on an in-flight render
+
+# Collections are buffered (and cacheable) unless the client asks for ?stream=1 or ?format=ndjson;
+# STREAM_COLLECTIONS=true streams the large ones (/players, /completedFixtures) by default instead
+STREAM_COLLECTIONS = os.getenv("STREAM_COLLECTIONS", "false").lower() == "true"
+STREAM_ITERSIZE = int(os.getenv("STREAM_ITERSIZE", "200"))
+STREAM_CHUNK_BYTES = int(os.getenv("STREAM_CHUNK_BYTES", str(64 * 1024)))
+STREAM_FANOUT_MAX_BYTES = int(os.getenv("STREAM_FANOUT_MAX_BYTES", str(1024 * 1024)))  # replay buffer per shared stream
+
+# Cache-Control policy: data only changes when the pipeline CronJobs run
+REFRESH_SCHEDULE = os.getenv("REFRESH_SCHEDULE", "00:00@UTC,01:00@America/Chicago")
+REFRESH_GRACE = int(os.getenv("REFRESH_GRACE", "1800"))    # how long a pipeline run may take to land
+MATCH_DURATION = int(os.getenv("MATCH_DURATION", "8100"))  # kickoff to final whistle incl. half time/stoppage
+LIVE_MAX_AGE = int(os.getenv("LIVE_MAX_AGE", "60"))
+KICKOFF_POLL = float(os.getenv("KICKOFF_POLL", "600"))
+CACHE_POLICIES_JSON = os.getenv("CACHE_POLICIES", "")
+NO_STORE_PREFIXES = ("/debug/", "/metrics", "/health", "/readyz")
+
 IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,63}$")
+MAX_PAGE_LIMIT = int(os.getenv("MAX_PAGE_LIMIT", "1000"))
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", "100"))  # upper bound for ?ids= multi-gets
+PG_INT_MAX = 2 ** 31 - 1  # key columns are Postgres INT
+LEADERBOARD_TOP = int(os.getenv("LEADERBOARD_TOP", "10"))
 
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -64,6 +170,8 @@ if PROM_MULTI_DIR:
 else:
     registry = CollectorRegistry()
 
+INVALID_TOKEN = "Missing or Invalid API token"
+
 PUBLIC_PATHS = {
     "/health",
     "/readyz",
@@ -128,36 +236,185 @@ logger = logging.getLogger(__name__)
 def _is_public(path: str) -> bool:
     return path in PUBLIC_PATHS
 
-def _device_family(ua_str: str) -> str:
-    ua = ua_parse(ua_str or "")
-    if ua.is_bot:    return "Bot"
-    if ua.is_mobile: return "Mobile"
-    if ua.is_tablet: return "Tablet"
-    if ua.is_pc:     return "Desktop"
-    return "Other"
-
-def _parse_ua(ua_str: str):
-    p = user_agent_parser.Parse(ua_str or "")
-    browser = (p["user_agent"]["family"] or "unknown").lower()
-    browser_major = p["user_agent"]["major"] or "0"
-    os_fam = (p["os"]["family"] or "unknown").lower()
-    os_major = p["os"]["major"] or "0"
-    dev = _device_family(ua_str or "")
-    return dev, os_fam, os_major, browser, browser_major
-
-_geo_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
-def _geo_cache_get(ip: str) -> Optional[Dict[str, Any]]:
-    now = time.time()
-    ent = _geo_cache.get(ip)
-    if not ent: return None
-    ts, val = ent
-    if now - ts > GEO_CACHE_TTL:
-        _geo_cache.pop(ip, None)
+def request_token(headers: Mapping[str, str], args: Mapping[str, str]) -> Optional[str]:
+    return headers.get("X-API-Token") or args.get("api_token")
+
+def _authorized(method: str, path: str, token: Optional[str]) -> bool:
+    return method == "OPTIONS" or _is_public(path) or (bool(API_TOKEN) and token == API_TOKEN)
+
+def request_id(headers: Mapping[str, str]) -> str:
+    return headers.get("X-Request-ID") or headers.get("X-Cf-Ray") or os.urandom(6).hex()
+
+# -------------------- User-agent classification --------------------
+UAClass = Tuple[str, str, str, str, str]  # device, os, os_major, browser, browser_major
+
+class UAClassifier:
+    """
+    Parses each distinct User-Agent once (user_agents wraps a single ua-parser
+    pass) and memoizes the coarse classification in a bounded, thread-safe LRU.
+    """
+
+    def __init__(self, max_entries: int, max_length: int):
+        self.max_entries = max_entries
+        self.max_length = max_length
+        self._entries: "OrderedDict[str, UAClass]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def classify(self, ua_str: str) -> UAClass:
+        key = (ua_str or "")[:self.max_length]
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+        if hit is not None:
+            UA_CACHE_LOOKUPS.labels(result="hit").inc()
+            return hit
+        UA_CACHE_LOOKUPS.labels(result="miss").inc()
+        value = self._parse(key)
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _parse(ua_str: str) -> UAClass:
+        ua = ua_parse(ua_str)
+        if ua.is_bot:      dev = "Bot"
+        elif ua.is_mobile: dev = "Mobile"
+        elif ua.is_tablet: dev = "Tablet"
+        elif ua.is_pc:     dev = "Desktop"
+        else:              dev = "Other"
+        browser = (ua.browser.family or "unknown").lower()
+        browser_major = str(ua.browser.version[0]) if ua.browser.version else "0"
+        os_fam = (ua.os.family or "unknown").lower()
+        os_major = str(ua.os.version[0]) if ua.os.version else "0"
+        return dev, os_fam, os_major, browser, browser_major
+
+    def warm(self) -> None:
+        """Compile the ua-parser regex tables off the request path."""
+        try:
+            self._parse("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36")
+        except Exception:
+            logger.exception("UA parser warm-up failed")
+
+UA_CLASSIFIER = UAClassifier(UA_CACHE_MAX, UA_MAX_LENGTH)
+if UA_PREWARM:
+    threading.Thread(target=UA_CLASSIFIER.warm, name="ua-warm", daemon=True).start()
+
+def _parse_ua(ua_str: str) -> UAClass:
+    return UA_CLASSIFIER.classify(ua_str)
+
+# -------------------- Geo cache --------------------
+class SharedGeoStore:
+    """
+    SQLite file shared by every worker in the pod (put it on a memory-backed
+    emptyDir). Each thread keeps its own connection; any error degrades to a miss.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._puts = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS geo (key TEXT PRIMARY KEY, expires REAL NOT NULL, value TEXT NOT NULL)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        try:
+            row = self._conn().execute("SELECT expires, value FROM geo WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.debug("Shared geo cache read failed: %s", e)
+            return None
+        if row is None or row[0] <= time.time():
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, expires: float, value: Dict[str, Any]) -> None:
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO geo (key, expires, value) VALUES (?, ?, ?)",
+                         (key, expires, json.dumps(value)))
+            self._puts += 1
+            if self._puts % 256 == 0:
+                conn.execute("DELETE FROM geo WHERE expires <= ?", (time.time(),))
+                conn.execute("DELETE FROM geo WHERE key IN (SELECT key FROM geo ORDER BY expires "
+                             "LIMIT max(0, (SELECT count(*) FROM geo) - ?))", (self.max_entries,))
+        except sqlite3.Error as e:
+            logger.debug("Shared geo cache write failed: %s", e)
+
+class GeoCache:
+    """
+    Thread-safe LRU+TTL cache of geo lookups, keyed by network prefix.
+
+    Failed lookups are cached as {} for GEO_NEGATIVE_TTL so an unavailable geo
+    service is not retried on every request. With a SharedGeoStore, local misses
+    fall through to the pod-wide store and local fills are written back to it.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, negative_ttl: int, v4_prefix: int, v6_prefix: int,
+                 shared: Optional[SharedGeoStore] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.v4_prefix = v4_prefix
+        self.v6_prefix = v6_prefix
+        self.shared = shared
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, ip: str) -> str:
+        addr = ipaddress.ip_address(ip)
+        prefix = self.v4_prefix if addr.version == 4 else self.v6_prefix
+        return str(ipaddress.ip_network(f"{addr}/{prefix}", strict=False))
+
+    def get(self, ip: str) -> Optional[Dict[str, Any]]:
+        """Cached value ({} for a cached failure) or None on a miss."""
+        key = self.key(ip)
+        now = time.time()
+        with self._lock:
+            ent = self._entries.get(key)
+            if ent is not None:
+                if ent[0] > now:
+                    self._entries.move_to_end(key)
+                    GEO_CACHE_LOOKUPS.labels(result="hit" if ent[1] else "negative_hit").inc()
+                    return ent[1]
+                del self._entries[key]
+        if self.shared is not None:
+            ent = self.shared.get(key)
+            if ent is not None:
+                self._store(key, *ent)
+                GEO_CACHE_LOOKUPS.labels(result="shared_hit").inc()
+                return ent[1]
+        GEO_CACHE_LOOKUPS.labels(result="miss").inc()
         return None
-    return val
 
-def _geo_cache_put(ip: str, val: Dict[str, Any]) -> None:
-    _geo_cache[ip] = (time.time(), val)
+    def put(self, ip: str, value: Dict[str, Any]) -> None:
+        key = self.key(ip)
+        expires = time.time() + (self.ttl if value else self.negative_ttl)
+        self._store(key, expires, value)
+        if self.shared is not None:
+            self.shared.put(key, expires, value)
+
+    def _store(self, key: str, expires: float, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+GEO_CACHE = GeoCache(
+    GEO_CACHE_MAX, GEO_CACHE_TTL, GEO_NEGATIVE_TTL, GEO_CACHE_V4_PREFIX, GEO_CACHE_V6_PREFIX,
+    shared=SharedGeoStore(GEO_CACHE_PATH, GEO_CACHE_SHARED_MAX) if GEO_CACHE_BACKEND == "shared" else None,
+)
 
 def _is_public_ip(ip: str) -> bool:
     try:
@@ -166,44 +423,104 @@ def _is_public_ip(ip: str) -> bool:
     except Exception:
         return False
 
+def _normalize_geo(data: Dict[str, Any]) -> Dict[str, Any]:
+    country = (data.get("country_iso2") or data.get("country_code") or data.get("country") or "").upper()
+    return {
+        "country_iso2": "" if country == "UNKNOWN" else country,
+        "country_name": data.get("country_name") or "",
+        "region":       data.get("region") or data.get("region_name") or "",
+        "city":         data.get("city") or "",
+        "latitude":     data.get("latitude"),
+        "longitude":    data.get("longitude"),
+        "asn":          data.get("asn") or data.get("as") or "",
+        "isp":          data.get("isp") or data.get("org") or data.get("as_org") or "",
+    }
+
+class EmbeddedGeoReader:
+    """
+    The geo service's .mmdb files opened in-process with MODE_MMAP, so every
+    worker shares the same page cache. Returns the same normalized dict as the
+    HTTP path.
+    """
+
+    def __init__(self, city_path: str, asn_path: str):
+        import maxminddb
+        self.city = maxminddb.open_database(city_path, maxminddb.MODE_MMAP)
+        self.asn = maxminddb.open_database(asn_path, maxminddb.MODE_MMAP) if os.path.exists(asn_path) else None
+
+    def lookup(self, ip: str) -> Dict[str, Any]:
+        city = self.city.get(ip) or {}
+        asn = (self.asn.get(ip) if self.asn else None) or {}
+        if not city and not asn:
+            return {}
+        subdivisions = city.get("subdivisions") or [{}]
+        loc = city.get("location") or {}
+        return _normalize_geo({
+            "country_iso2": (city.get("country") or {}).get("iso_code"),
+            "country_name": ((city.get("country") or {}).get("names") or {}).get("en"),
+            "region":       (subdivisions[0].get("names") or {}).get("en"),
+            "city":         ((city.get("city") or {}).get("names") or {}).get("en"),
+            "latitude":     loc.get("latitude"),
+            "longitude":    loc.get("longitude"),
+            "asn":          asn.get("autonomous_system_number"),
+            "isp":          asn.get("autonomous_system_organization"),
+        })
+
+_embedded_geo_state: Dict[str, Any] = {"reader": None, "loaded": False}
+_embedded_geo_lock = threading.Lock()
+
+def _embedded_geo() -> Optional[EmbeddedGeoReader]:
+    """The in-process reader when GEO_BACKEND=embedded and the files open; otherwise None (HTTP fallback)."""
+    if GEO_BACKEND != "embedded" or _embedded_geo_state["loaded"]:
+        return _embedded_geo_state["reader"]
+    with _embedded_geo_lock:
+        if not _embedded_geo_state["loaded"]:
+            try:
+                _embedded_geo_state["reader"] = EmbeddedGeoReader(GEO_CITY_DB, GEO_ASN_DB)
+                logger.info("Embedded geo reader opened %s", GEO_CITY_DB)
+            except Exception as e:
+                logger.warning("Embedded geo unavailable, falling back to %s: %s", GEO_URL, e)
+            _embedded_geo_state["loaded"] = True
+    return _embedded_geo_state["reader"]
+
 def _geo_lookup(ip: str) -> Dict[str, Any]:
 
     if not ip or not _is_public_ip(ip):
         return {}
-    hit = _geo_cache_get(ip)
+    hit = GEO_CACHE.get(ip)
     if hit is not None:
         return hit
 
+    out: Dict[str, Any] = {}
+    reader = _embedded_geo()
     try:
-        r = requests.get(f"{GEO_URL}/lookup", params={"ip": ip}, timeout=GEO_TIMEOUT)
-        if r.ok:
-            data = r.json() or {}
-            out = {
-                "country_iso2": (data.get("country_iso2") or data.get("country_code") or "").upper(),
-                "country_name": data.get("country_name") or "",
-                "region":       data.get("region") or data.get("region_name") or "",
-                "city":         data.get("city") or "",
-                "latitude":     data.get("latitude"),
-                "longitude":    data.get("longitude"),
-                "asn":          data.get("asn") or data.get("as") or "",
-                "isp":          data.get("isp") or data.get("org") or "",
-            }
-            _geo_cache_put(ip, out)
-            return out
+        if reader is not None:
+            out = reader.lookup(ip)
+        else:
+            r = requests.get(f"{GEO_URL}/lookup", params={"ip": ip}, timeout=GEO_TIMEOUT)
+            if r.ok:
+                out = _normalize_geo(r.json() or {})
     except Exception:
         pass
 
-    return {}
+    GEO_CACHE.put(ip, out)
+    return out
 
 
 
 # -------------------- Security headers --------------------
+def apply_security_headers(headers, path: str) -> None:
+    headers["X-Content-Type-Options"] = "nosniff"
+    headers["X-Frame-Options"] = "DENY"
+    headers["Referrer-Policy"] = "no-referrer"
+    if path.startswith(NO_STORE_PREFIXES):
+        headers["Cache-Control"] = "no-store"
+    else:
+        headers.setdefault("Cache-Control", "no-store")
+
 @app.after_request
 def add_security_headers(resp):
-    resp.headers["X-Content-Type-Options"] = "nosniff"
-    resp.headers["X-Frame-Options"] = "DENY"
-    resp.headers["Referrer-Policy"] = "no-referrer"
-    resp.headers["Cache-Control"] = "no-store"
+    apply_security_headers(resp.headers, request.path)
     return resp
 
 # -------------------- Prometheus metrics --------------------
@@ -241,11 +558,87 @@ REBUILD_DURATION = Histogram(
 DB_POOL_AVAILABLE = Gauge(
     "db_pool_available_connections",
     "Connections currently available in pool",
+    ["target"],  # primary or a DB_REPLICA_HOSTS entry
     registry=registry,
+    multiprocess_mode="livesum",
 )
 DB_POOL_INUSE = Gauge(
     "db_pool_inuse_connections",
     "Connections currently in use",
+    ["target"],
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to check out a DB connection",
+    ["target"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    registry=registry,
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_waiting_requests",
+    "Requests queued for a DB connection",
+    ["target"],
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total",
+    "DB connection checkouts",
+    ["endpoint", "target"],
+    registry=registry,
+)
+DB_POOL_HELD = Counter(
+    "db_pool_held_seconds_total",
+    "Time DB connections were held, by endpoint",
+    ["endpoint", "target"],
+    registry=registry,
+)
+DB_POOL_RECONNECTS = Counter(
+    "db_pool_reconnects_total",
+    "Dead pooled DB connections replaced on checkout",
+    ["target"],
+    registry=registry,
+)
+DB_POOL_CONN_AGE = Gauge(
+    "db_pool_oldest_connection_age_seconds",
+    "Age of the oldest open pooled DB connection",
+    ["target"],
+    registry=registry,
+    multiprocess_mode="max",
+)
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds",
+    "Replication replay lag last measured on each read replica",
+    ["target"],
+    registry=registry,
+    multiprocess_mode="max",
+)
+DB_REPLICA_HEALTHY = Gauge(
+    "db_replica_healthy",
+    "1 while a read replica is reachable and within DB_REPLICA_MAX_LAG",
+    ["target"],
+    registry=registry,
+    multiprocess_mode="min",
+)
+DB_STATEMENT_LATENCY = Histogram(
+    "db_statement_duration_seconds",
+    "Execution time of prepared statements",
+    ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    registry=registry,
+)
+DB_STATEMENT_PREPARES = Counter(
+    "db_statement_prepares_total",
+    "PREPAREs issued (once per statement per pooled connection)",
+    ["statement"],
+    registry=registry,
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "DB connection checkouts shed with 503",
+    ["reason", "target"],  # reason: timeout|queue_full
     registry=registry,
 )
 VISITS_TOTAL = Counter(
@@ -268,70 +661,641 @@ VISITS_BY_UA = Counter(
     registry=registry,
 )
 
+RESPONSE_CACHE_REQUESTS = Counter(
+    "api_response_cache_requests_total",
+    "Response cache lookups",
+    ["endpoint", "result"],  # hit|miss
+    registry=registry,
+)
+RESPONSE_CACHE_EVICTIONS = Counter(
+    "api_response_cache_evictions_total",
+    "Response cache evictions",
+    ["reason"],  # lru|expired|version
+    registry=registry,
+)
+NOT_MODIFIED = Counter(
+    "api_not_modified_total",
+    "Conditional requests answered with 304",
+    ["endpoint"],
+    registry=registry,
+)
+RESPONSE_CACHE_BYTES = Gauge(
+    "api_response_cache_bytes",
+    "Bytes held in the response cache",
+    registry=registry,
+    multiprocess_mode="livesum",
+)
+
+RATE_LIMIT_DECISIONS = Counter(
+    "api_rate_limit_decisions_total",
+    "Rate limiter decisions",
+    ["endpoint", "result"],  # allowed|limited|error
+    registry=registry,
+)
+RATE_LIMIT_COST = Counter(
+    "api_rate_limit_cost_total",
+    "Cost units spent by admitted requests",
+    ["endpoint"],
+    registry=registry,
+)
+RATE_LIMIT_FAIL_OPEN = Counter(
+    "api_rate_limit_fail_open_total",
+    "Requests let through unchecked because the bucket store failed",
+    ["reason"],  # locked|error
+    registry=registry,
+)
+RATE_LIMIT_CHECK = Histogram(
+    "api_rate_limit_check_seconds",
+    "Time spent taking tokens from a client's bucket",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05),
+    registry=registry,
+)
+
+SINGLE_FLIGHT_REQUESTS = Counter(
+    "api_single_flight_requests_total",
+    "Cache-miss renders by single-flight outcome",
+    ["endpoint", "result"],  # leader|coalesced|timeout|unshared
+    registry=registry,
+)
+
+UA_CACHE_LOOKUPS = Counter(
+    "ua_cache_lookups_total",
+    "User-agent classification cache lookups",
+    ["result"],  # hit|miss
+    registry=registry,
+)
+
+GEO_CACHE_LOOKUPS = Counter(
+    "geo_cache_lookups_total",
+    "Geo cache lookups",
+    ["result"],  # hit|negative_hit|shared_hit|miss
+    registry=registry,
+)
+
+VISITS_DROPPED = Counter(
+    "web_visits_dropped_total",
+    "Visits dropped because the enrichment queue was full",
+    registry=registry,
+)
+
+VISITS_SAMPLED_OUT = Counter(
+    "web_visits_sampled_out_total",
+    "Visits skipped by VISIT_SAMPLE_RATES",
+    registry=registry,
+)
+VISIT_EVENTS_WRITTEN = Counter(
+    "web_visit_events_written_total",
+    "Visit events written by the visit sink",
+    ["output"],  # stdout|file|postgres
+    registry=registry,
+)
+VISIT_EVENTS_DROPPED = Counter(
+    "web_visit_events_dropped_total",
+    "Visit events dropped by the visit sink",
+    ["reason"],  # overflow|write_error
+    registry=registry,
+)
+
 def _endpoint_label():
     # use rule endpoint if available; fallback to path
     if request.url_rule and request.url_rule.rule:
         return request.url_rule.rule
     return request.path or "unknown"
 
-@app.before_request
-def _api_token_gate():
-    if request.method == "OPTIONS" or _is_public(request.path):
-        return
-
-    token = request.headers.get("X-API-Token") or request.args.get("api_token")
-    if not API_TOKEN or token != API_TOKEN:
-        abort(401, description="Missing or Invalid API token")
-
-
 @app.before_request
 def _start_timer_and_request_id():
     g.start_time = time.time()
-    g.request_id = request.headers.get("X-Request-ID") or request.headers.get("X-Cf-Ray") or os.urandom(6).hex()
+    g.request_id = request_id(request.headers)
     g.request_path = request.path
     g.request_method = request.method
     INFLIGHT.inc()
 
 @app.before_request
-def _visit_enrich_and_count():
+def _api_token_gate():
+    if not _authorized(request.method, request.path, request_token(request.headers, request.args)):
+        abort(401, description=INVALID_TOKEN)
+
+# -------------------- Rate limiting --------------------
+class RateLimited(Exception):
+    """The client's token bucket cannot cover the cost of the request."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + max(now - updated, 0.0) * rate)
+
+class LocalBucketStore:
+    """Token buckets in this worker's memory (LRU-bounded); every worker limits on its own."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        """Spend cost from key's bucket. Returns the tokens left, negative (the shortfall) if refused."""
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, capacity, rate)
+            left = tokens - cost
+            self._buckets[key] = (left if left >= 0 else tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return left
+
+class SharedBucketStore:
+    """
+    Token buckets in a SQLite file shared by every worker in the pod (put it on a
+    memory-backed emptyDir), so a client's limit holds whichever worker serves it.
+    Each take is one BEGIN IMMEDIATE transaction; errors propagate to RateLimiter.
+    """
+
+    def __init__(self, path: str, max_keys: int):
+        self.path = path
+        self.max_keys = max_keys
+        self._local = threading.local()
+        self._takes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key: str, cost: float, capacity: float, rate: float) -> float:
+        """Spend cost from key's bucket. Returns the tokens left, negative (the shortfall) if refused."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else _refill(row[0], row[1], now, capacity, rate)
+            left = tokens - cost
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, left if left >= 0 else tokens, now))
+            self._takes += 1
+            if self._takes % 1024 == 0:
+                # a bucket idle long enough to have refilled is the same as no bucket
+                conn.execute("DELETE FROM buckets WHERE updated <= ?", (now - capacity / rate,))
+                conn.execute("DELETE FROM buckets WHERE key IN (SELECT key FROM buckets ORDER BY updated "
+                             "LIMIT max(0, (SELECT count(*) FROM buckets) - ?))", (self.max_keys,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return left
+
+def _parse_costs(spec: str) -> Dict[str, float]:
+    """'/players=5,/playersByTeam/<teamId>=2' -> {route rule: cost}."""
+    costs = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        rule, _, cost = part.partition("=")
+        try:
+            costs[rule.strip()] = max(float(cost), 0.0)
+        except ValueError:
+            logger.warning("Invalid RATE_LIMIT_COSTS entry %r ignored", part)
+    return costs
+
+class RateLimiter:
+    """
+    Per-client token buckets. Every request spends its route's cost from the
+    client's bucket, which refills at `rate` units/s up to `capacity`; when the
+    bucket cannot cover it the request is refused with the seconds until it can.
+    A failing store lets requests through rather than turning them away.
+    """
+
+    def __init__(self, store, capacity: float, rate: float, costs: Dict[str, float]):
+        # a bucket that never refills would lock a client out for good (and Retry-After divides by rate)
+        if capacity <= 0 or rate <= 0:
+            raise ValueError("RATE_LIMIT_CAPACITY and RATE_LIMIT_REFILL must be greater than 0")
+        self.store = store
+        self.capacity = capacity
+        self.rate = rate
+        self.costs = costs
+
+    def cost(self, endpoint: str) -> float:
+        # a cost above the burst size could never be paid
+        return min(self.costs.get(endpoint, 1.0), self.capacity)
+
+    def check(self, key: str, endpoint: str) -> Optional[int]:
+        """None when the request may proceed, else the Retry-After in seconds."""
+        cost = self.cost(endpoint)
+        started = time.perf_counter()
+        try:
+            left = self.store.take(key, cost, self.capacity, self.rate)
+        except sqlite3.Error as e:
+            logger.debug("Rate limit store failed: %s", e)
+            RATE_LIMIT_DECISIONS.labels(endpoint=endpoint, result="error").inc()
+            RATE_LIMIT_FAIL_OPEN.labels(reason="locked" if "locked" in str(e) else "error").inc()
+            return None
+        finally:
+            RATE_LIMIT_CHECK.observe(time.perf_counter() - started)
+        if left >= 0:
+            RATE_LIMIT_DECISIONS.labels(endpoint=endpoint, result="allowed").inc()
+            RATE_LIMIT_COST.labels(endpoint=endpoint).inc(cost)
+            return None
+        RATE_LIMIT_DECISIONS.labels(endpoint=endpoint, result="limited").inc()
+        return max(1, math.ceil(-left / self.rate))
+
+RATE_LIMITER = RateLimiter(
+    SharedBucketStore(RATE_LIMIT_PATH, RATE_LIMIT_MAX_KEYS) if RATE_LIMIT_BACKEND == "shared"
+    else LocalBucketStore(RATE_LIMIT_MAX_KEYS),
+    RATE_LIMIT_CAPACITY, RATE_LIMIT_REFILL, _parse_costs(RATE_LIMIT_COSTS),
+) if RATE_LIMIT_ENABLED else None
+
+_TRUSTED_PROXY_NETWORKS = [ipaddress.ip_network(n.strip(), strict=False) for n in TRUSTED_PROXIES.split(",") if n.strip()]
+
+def _is_trusted_proxy(addr: str) -> bool:
     try:
-        client_ip = request.headers.get("CF-Connecting-IP") \
-                    or request.headers.get("X-Forwarded-For","").split(",")[0].strip() \
-                    or request.remote_addr
-
-        cf_country = (request.headers.get("CF-IPCountry") or "").strip().upper()
-        geo = _geo_lookup(client_ip) if _is_public_ip(client_ip) else {}
-
-        country = (geo.get("country_iso2") or cf_country or "UNKNOWN").upper()
-
-        ua_str = request.headers.get("User-Agent","")
-        dev, os_fam, os_major, browser, browser_major = _parse_ua(ua_str)
-
-        g._visit = {
-            "ts": int(time.time()),
-            "path": request.path,
-            "method": request.method,
-            "ip": client_ip,
-            "country": country,
-            "city": geo.get("city") or "",
-            "region": geo.get("region") or "",
-            "asn": geo.get("asn") or "",
-            "isp": geo.get("isp") or "",
-            "lat": geo.get("latitude"),
-            "lon": geo.get("longitude"),
-            "device": dev,
-            "os": f"{os_fam} {os_major}",
-            "browser": f"{browser} {browser_major}",
-        }
+        ip = ipaddress.ip_address(addr)
+    except ValueError:
+        return False
+    return any(ip in network for network in _TRUSTED_PROXY_NETWORKS)
+
+def resolve_client_ip(headers: Mapping[str, str], remote_addr: Optional[str]) -> str:
+    """
+    The address of the client behind our proxies, used for rate-limit buckets and
+    visits. Forwarding headers are only believed on connections from
+    TRUSTED_PROXIES: then CLIENT_IP_HEADER when configured, else the right-most
+    X-Forwarded-For hop that is not itself a trusted proxy (each proxy appends its
+    peer; anything further left came from the client).
+    """
+    if not remote_addr or not _is_trusted_proxy(remote_addr):
+        return remote_addr or ""
+    if CLIENT_IP_HEADER:
+        value = headers.get(CLIENT_IP_HEADER, "").strip()
+        if value:
+            return value
+    hops = [hop.strip() for hop in headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else remote_addr
+
+def rate_limit_key(token: Optional[str], client_ip: str) -> str:
+    """The bucket a request draws from: its client IP, or its API token with RATE_LIMIT_KEY=token."""
+    if RATE_LIMIT_KEY == "token" and token:
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()[:16]
+    return "ip:" + client_ip
+
+def rate_limit_bucket(method: str, path: str, headers: Mapping[str, str], remote_addr: Optional[str],
+                      token: Optional[str]) -> Optional[str]:
+    """rate_limit_key for a request, or None when it is not rate limited."""
+    if RATE_LIMITER is None or method == "OPTIONS" or _is_public(path):
+        return None
+    return rate_limit_key(token, resolve_client_ip(headers, remote_addr))
+
+@app.before_request
+def _rate_limit():
+    key = rate_limit_bucket(request.method, request.path, request.headers, request.remote_addr,
+                            request_token(request.headers, request.args))
+    if key is None:
+        return
+    retry_after = RATE_LIMITER.check(key, _endpoint_label())
+    if retry_after is not None:
+        raise RateLimited(retry_after)
+
+# -------------------- Visit sink --------------------
+class StdoutVisitOutput:
+    name = "stdout"
+
+    def write(self, events: List[Dict[str, Any]]) -> None:
+        sys.stdout.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events))
+        sys.stdout.flush()
+
+class FileVisitOutput:
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, events: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in events))
+
+class PostgresVisitOutput:
+    """COPY batches into the visits table (see create_visits_table in backend/data/db/setupDB.py)."""
+    name = "postgres"
+    COLUMNS = ("ts", "path", "method", "ip", "country", "city", "region", "asn", "isp",
+               "lat", "lon", "device", "os", "browser", "status")
+
+    def write(self, events: List[Dict[str, Any]]) -> None:
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        for e in events:
+            row = dict(e, ts=datetime.fromtimestamp(e["ts"], timezone.utc).isoformat())
+            w.writerow(["" if row.get(c) is None else row.get(c) for c in self.COLUMNS])
+        buf.seek(0)
+        with ConnCtx(write=True) as conn, conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY visits ({', '.join(self.COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf
+            )
+
+def _visit_outputs(spec: str) -> List[Any]:
+    outputs: List[Any] = []
+    for name in (x.strip().lower() for x in spec.split(",")):
+        if name == "stdout":
+            outputs.append(StdoutVisitOutput())
+        elif name == "file":
+            outputs.append(FileVisitOutput(VISIT_SINK_PATH))
+        elif name == "postgres":
+            outputs.append(PostgresVisitOutput())
+        elif name and name != "none":
+            logger.warning("Unknown VISIT_SINK output %r ignored", name)
+    return outputs
+
+def _parse_sample_rates(spec: str) -> List[Tuple[str, float]]:
+    """'/health=0,/metrics=0.1' -> [(prefix, keep ratio)], longest prefix first."""
+    rates = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        prefix, _, rate = part.partition("=")
+        try:
+            rates.append((prefix.strip(), min(max(float(rate), 0.0), 1.0)))
+        except ValueError:
+            logger.warning("Invalid VISIT_SAMPLE_RATES entry %r ignored", part)
+    return sorted(rates, key=lambda r: len(r[0]), reverse=True)
+
+VISIT_SAMPLING = _parse_sample_rates(VISIT_SAMPLE_RATES)
+
+def _visit_sampled(path: str) -> bool:
+    for prefix, rate in VISIT_SAMPLING:
+        if path.startswith(prefix):
+            return rate >= 1.0 or random.random() < rate
+    return True
+
+class VisitSink:
+    """
+    Ring buffer of enriched visit events flushed by a daemon thread.
+
+    Events are written every VISIT_SINK_FLUSH_INTERVAL seconds, or as soon as
+    VISIT_SINK_BATCH are waiting, one write per output per batch. When the
+    buffer is full the oldest event is overwritten; overwritten events and
+    batches an output fails to write are counted in web_visit_events_dropped_total.
+    """
+
+    def __init__(self, outputs: List[Any], capacity: int, batch_size: int, interval: float):
+        self.outputs = outputs
+        self.batch_size = batch_size
+        self.interval = interval
+        self._buffer: "deque[Dict[str, Any]]" = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stopping = False
+
+    def emit(self, events: List[Dict[str, Any]]) -> None:
+        if not self.outputs:
+            return
+        self._ensure_started()
+        with self._cond:
+            overflow = len(self._buffer) + len(events) - self._buffer.maxlen
+            self._buffer.extend(events)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        if overflow > 0:
+            VISIT_EVENTS_DROPPED.labels(reason="overflow").inc(min(overflow, len(events)))
+
+    def stop(self, timeout: float = 2.0) -> None:
+        if self._thread is None or self._pid != os.getpid():
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        # Gunicorn forks workers: each process needs its own thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="visit-sink", daemon=True)
+            self._thread.start()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        n = min(len(self._buffer), self.batch_size)
+        return [self._buffer.popleft() for _ in range(n)]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.interval)
+                batch = self._drain()
+                stopping = self._stopping
+            while batch:
+                self._write(batch)
+                with self._cond:
+                    batch = self._drain() if stopping or len(self._buffer) >= self.batch_size else []
+            if stopping:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        for out in self.outputs:
+            try:
+                out.write(batch)
+                VISIT_EVENTS_WRITTEN.labels(output=out.name).inc(len(batch))
+            except Exception:
+                VISIT_EVENTS_DROPPED.labels(reason="write_error").inc(len(batch))
+                logger.exception("Visit sink %s write failed", out.name)
+
+VISIT_SINK_WRITER = VisitSink(
+    _visit_outputs(VISIT_SINK), VISIT_SINK_BUFFER, VISIT_SINK_BATCH, VISIT_SINK_FLUSH_INTERVAL
+)
+atexit.register(VISIT_SINK_WRITER.stop)
+
+# -------------------- Visit enrichment --------------------
+def _geo_lookup_batch(ips: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Resolve IPs with POST /lookup/batch; None if the geo service does not support it."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for i in range(0, len(ips), GEO_BATCH_MAX):
+        chunk = ips[i:i + GEO_BATCH_MAX]
+        try:
+            r = requests.post(f"{GEO_URL}/lookup/batch", json={"ips": chunk}, timeout=GEO_BATCH_TIMEOUT)
+        except Exception:
+            return None
+        if r.status_code in (404, 405):
+            return None
+        results = (r.json() or {}).get("results", []) if r.ok else []
+        for item in results:
+            if item.get("ip") and not item.get("error"):
+                out[item["ip"]] = _normalize_geo(item)
+    return out
+
+def _geo_lookup_many(ips: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Resolve many IPs, going to the geo service once for all cache misses."""
+    out: Dict[str, Dict[str, Any]] = {}
+    misses = []
+    for ip in ips:
+        if not ip or not _is_public_ip(ip):
+            out[ip] = {}
+            continue
+        hit = GEO_CACHE.get(ip)
+        if hit is None:
+            misses.append(ip)
+        else:
+            out[ip] = hit
+    if not misses:
+        return out
+
+    use_batch = GEO_BATCH_ENABLED and len(misses) > 1 and _embedded_geo() is None
+    resolved = _geo_lookup_batch(misses) if use_batch else None
+    if resolved is None:
+        out.update((ip, _geo_lookup(ip)) for ip in misses)
+        return out
+    for ip in misses:
+        out[ip] = resolved.get(ip, {})
+        GEO_CACHE.put(ip, out[ip])
+    return out
+
+def _enrich_visit(raw: Dict[str, Any], geo: Dict[str, Any]) -> Dict[str, Any]:
+    country = (geo.get("country_iso2") or raw["cf_country"] or "UNKNOWN").upper()
+    dev, os_fam, os_major, browser, browser_major = _parse_ua(raw["ua"])
+
+    VISITS_TOTAL.inc()
+    if country != "UNKNOWN":
+        VISITS_BY_COUNTRY.labels(country=country).inc()
+    VISITS_BY_UA.labels(
+        device=dev, os=os_fam, os_major=os_major,
+        browser=browser, browser_major=browser_major
+    ).inc()
+
+    return {
+        "ts": raw["ts"],
+        "path": raw["path"],
+        "method": raw["method"],
+        "ip": raw["ip"],
+        "country": country,
+        "city": geo.get("city") or "",
+        "region": geo.get("region") or "",
+        "asn": geo.get("asn") or "",
+        "isp": geo.get("isp") or "",
+        "lat": geo.get("latitude"),
+        "lon": geo.get("longitude"),
+        "device": dev,
+        "os": f"{os_fam} {os_major}",
+        "browser": f"{browser} {browser_major}",
+        "status": raw["status"],
+        "event": "visit",
+    }
+
+class VisitEnricher:
+    """
+    Bounded queue of raw visits drained by a daemon thread.
+
+    Requests only enqueue (ip, ua, path, status); the worker collects up to
+    VISIT_BATCH_SIZE visits (waiting at most VISIT_BATCH_WAIT), resolves each
+    distinct IP once, updates the visit metrics and hands the events to the
+    visit sink.
+    When the queue is full the visit is dropped and counted, never blocked on.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, batch_wait: float):
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def submit(self, visit: Dict[str, Any]) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(visit)
+        except queue.Full:
+            VISITS_DROPPED.inc()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        if self._thread is None or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        # Gunicorn forks workers: each process needs its own thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="visit-enricher", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._process(batch)
+            except Exception:
+                logger.exception("Visit enrichment failed")
+            if stopping:
+                return
+
+    def _process(self, batch: List[Dict[str, Any]]) -> None:
+        geo = _geo_lookup_many({v["ip"] for v in batch if _is_public_ip(v["ip"])})
+        VISIT_SINK_WRITER.emit([_enrich_visit(raw, geo.get(raw["ip"]) or {}) for raw in batch])
+
+VISIT_ENRICHER = VisitEnricher(VISIT_QUEUE_MAX, VISIT_BATCH_SIZE, VISIT_BATCH_WAIT)
+atexit.register(VISIT_ENRICHER.stop)
+
+def visit_event(method: str, path: str, headers: Mapping[str, str], remote_addr: Optional[str], ts: float) -> Dict[str, Any]:
+    return {
+        "ts": int(ts),
+        "path": path,
+        "method": method,
+        "ip": resolve_client_ip(headers, remote_addr),
+        "cf_country": (headers.get("CF-IPCountry") or "").strip().upper(),
+        "ua": headers.get("User-Agent", ""),
+    }
+
+def submit_visit(visit: Dict[str, Any], status: int) -> None:
+    """Queue a visit for enrichment unless VISIT_SAMPLE_RATES drops it."""
+    if _visit_sampled(visit["path"]):
+        VISIT_ENRICHER.submit({**visit, "status": status})
+    else:
+        VISITS_SAMPLED_OUT.inc()
 
-        VISITS_TOTAL.inc()
-        if country != "UNKNOWN":
-            VISITS_BY_COUNTRY.labels(country=country).inc()
-        VISITS_BY_UA.labels(
-            device=dev, os=os_fam, os_major=os_major,
-            browser=browser, browser_major=browser_major
-        ).inc()
+def observe_request(method: str, endpoint: str, path: str, status: int, duration: float) -> None:
+    REQ_LATENCY.labels(method, endpoint).observe(duration)
+    REQUESTS.labels(method, endpoint, str(status)).inc()
+    logger.info(f"{method} {path} -> {status} in {duration:.4f}s")
 
+@app.before_request
+def _visit_capture():
+    # runs after the token gate and rate limiter, so 401 and 429 answers are not recorded as visits
+    try:
+        g._visit = visit_event(request.method, request.path, request.headers, request.remote_addr, time.time())
     except Exception:
         pass
 
@@ -340,22 +1304,15 @@ def _visit_enrich_and_count():
 def _record_metrics_and_log(resp):
     try:
         duration = max(time.time() - getattr(g, "start_time", time.time()), 0)
-        endpoint = _endpoint_label()
-        REQ_LATENCY.labels(request.method, endpoint).observe(duration)
-        REQUESTS.labels(request.method, endpoint, str(resp.status_code)).inc()
+        observe_request(request.method, _endpoint_label(), request.path, resp.status_code, duration)
         g.response_status = resp.status_code
-        logger.info(f"{request.method} {request.path} -> {resp.status_code} in {duration:.4f}s")
     finally:
         INFLIGHT.dec()
     resp.headers["X-Request-ID"] = g.request_id
     try:
         v = getattr(g, "_visit", None)
         if v:
-            v = dict(v) 
-            v["status"] = resp.status_code
-            v["event"] = "visit"
-
-            print(json.dumps(v, ensure_ascii=False), flush=True)
+            submit_visit(v, resp.status_code)
     except Exception:
         pass
     return resp
@@ -364,18 +1321,372 @@ def _record_metrics_and_log(resp):
 def metrics():
     return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
 
-def _export_pool_metrics():
+# -------------------- DB pool --------------------
+class PoolTimeout(Exception):
+    """No connection could be checked out before the acquisition deadline."""
+
+class _Waiter:
+    __slots__ = ("event", "conn")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.conn = None
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection that remembers which STATEMENTS it has prepared, and
+    the statement timings taken while it was checked out (collected by putconn).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: set = set()
+        self.statement_times: List[Tuple[str, float]] = []
+
+_NEW_CONNECTION = object()  # handed to a waiter when a slot frees up without a reusable connection
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 pool with a FIFO wait queue.
+
+    Up to maxconn connections are opened lazily. When all are checked out,
+    getconn() queues the caller (at most max_waiting of them) and a returned
+    connection is handed straight to the oldest waiter. A caller that is not
+    served within its timeout gets PoolTimeout. Connections idle for longer
+    than check_after seconds are pinged before being handed out and replaced
+    if they are dead.
+
+    Checkouts, hold time per label, reconnects, connection ages, checkout
+    wait times and statement timings are kept as plain counters under the pool
+    lock; PoolTelemetry publishes them under the pool's name as the metrics'
+    target label. At most MAX_PENDING_SAMPLES timings are kept between samples.
+    """
+
+    MAX_PENDING_SAMPLES = 65536
+
+    def __init__(self, minconn: int, maxconn: int, max_waiting: int, check_after: float,
+                 name: str = "primary", **dsn):
+        self.name = name
+        self.maxconn = maxconn
+        self.max_waiting = max_waiting
+        self.check_after = check_after
+        self.dsn = dsn
+        self._idle: "deque[Any]" = deque()
+        self._last_used: Dict[int, float] = {}
+        self._created: Dict[int, float] = {}
+        self._checked_out: Dict[int, Tuple[float, str]] = {}
+        self.checkouts: Dict[str, int] = defaultdict(int)
+        self.held_seconds: Dict[str, float] = defaultdict(float)
+        self.reconnects = 0
+        self.wait_times: List[float] = []
+        self.statement_times: List[Tuple[str, float]] = []
+        self._waiters: "deque[_Waiter]" = deque()
+        self._opened = 0
+        self._lock = threading.Lock()
+        for _ in range(minconn):
+            self._opened += 1
+            self._idle.append(self._connect())
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    @property
+    def in_use(self) -> int:
+        return self._opened - len(self._idle)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def snapshot(self) -> Tuple[int, int, int, List[float]]:
+        """(opened, idle, waiting, connection ages in seconds), read together under the pool lock."""
+        now = time.monotonic()
+        with self._lock:
+            return self._opened, len(self._idle), len(self._waiters), [now - t for t in self._created.values()]
+
+    def drain_samples(self) -> Tuple[Dict[str, int], Dict[str, float], int, List[float], List[Tuple[str, float]]]:
+        """
+        The running totals (checkouts and held seconds per label, reconnects) and
+        the wait and statement timings buffered since the last call, which are cleared.
+        """
+        with self._lock:
+            wait_times, self.wait_times = self.wait_times, []
+            statement_times, self.statement_times = self.statement_times, []
+            return dict(self.checkouts), dict(self.held_seconds), self.reconnects, wait_times, statement_times
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(connection_factory=PooledConnection, **self.dsn)
+        except Exception:
+            with self._lock:
+                self._opened -= 1
+            raise
+        with self._lock:
+            self._created[id(conn)] = time.monotonic()
+        return conn
+
+    def getconn(self, timeout: float, label: str = "background"):
+        started = time.monotonic()
+        waiter = None
+        with self._lock:
+            if self._idle and not self._waiters:
+                conn = self._idle.pop()
+            elif self._opened < self.maxconn:
+                self._opened += 1
+                conn = _NEW_CONNECTION
+            elif len(self._waiters) >= self.max_waiting:
+                DB_POOL_TIMEOUTS.labels(reason="queue_full", target=self.name).inc()
+                raise PoolTimeout("connection wait queue is full")
+            else:
+                waiter = _Waiter()
+                self._waiters.append(waiter)
+        if waiter is not None:
+            waiter.event.wait(timeout)
+            with self._lock:
+                conn = waiter.conn
+                if conn is None:
+                    self._waiters.remove(waiter)
+                    self._record_wait(time.monotonic() - started)
+            if conn is None:
+                DB_POOL_TIMEOUTS.labels(reason="timeout", target=self.name).inc()
+                raise PoolTimeout(f"no connection available within {timeout:g}s")
+        waited = time.monotonic() - started
+        conn = self._checkout(conn)
+        with self._lock:
+            self._record_wait(waited)
+            self.checkouts[label] += 1
+            self._checked_out[id(conn)] = (time.monotonic(), label)
+        return conn
+
+    def _record_wait(self, seconds: float) -> None:
+        # caller holds self._lock
+        if len(self.wait_times) < self.MAX_PENDING_SAMPLES:
+            self.wait_times.append(seconds)
+
+    def _checkout(self, conn):
+        if conn is _NEW_CONNECTION:
+            return self._connect()
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if not conn.closed and idle_for < self.check_after:
+            return conn
+        try:
+            if not conn.closed:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1;")
+                conn.rollback()
+                return conn
+        except psycopg2.Error:
+            pass
+        logger.info("Replacing dead pooled DB connection to %s", self.name)
+        self._discard(conn)
+        with self._lock:
+            self.reconnects += 1
+        return self._connect()
+
+    def _discard(self, conn) -> None:
+        with self._lock:
+            self._last_used.pop(id(conn), None)
+            self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
 
-    try:
-        if POOL is None:
-            DB_POOL_AVAILABLE.set(0)
-            DB_POOL_INUSE.set(0)
+    def putconn(self, conn, close: bool = False) -> None:
+        with self._lock:
+            since, label = self._checked_out.pop(id(conn), (None, ""))
+            if since is not None:
+                self.held_seconds[label] += time.monotonic() - since
+            timings = getattr(conn, "statement_times", None)
+            if timings:
+                self.statement_times.extend(timings[:self.MAX_PENDING_SAMPLES - len(self.statement_times)])
+                timings.clear()
+        if not close and not conn.closed and conn.status != psycopg2.extensions.STATUS_READY:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                close = True
+        if close or conn.closed:
+            self._discard(conn)
+            conn = _NEW_CONNECTION
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.conn = conn
+                waiter.event.set()
+            elif conn is _NEW_CONNECTION:
+                self._opened -= 1
+            else:
+                self._idle.append(conn)
+
+class PoolTelemetry:
+    """
+    Publishes ConnectionPool counters to Prometheus every POOL_SAMPLE_INTERVAL
+    seconds from a daemon thread, so checkouts never touch metric storage.
+    """
+
+    def __init__(self, pool: ConnectionPool, interval: float):
+        self.pool = pool
+        self.interval = interval
+        self._published_checkouts: Dict[str, int] = defaultdict(int)
+        self._published_held: Dict[str, float] = defaultdict(float)
+        self._published_reconnects = 0
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name=f"pool-telemetry-{self.pool.name}", daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("Pool telemetry sample failed")
+            time.sleep(self.interval)
+
+    def publish(self) -> None:
+        opened, idle, waiting, ages = self.pool.snapshot()
+        checkouts, held, reconnects, wait_times, statement_times = self.pool.drain_samples()
+        target = self.pool.name
+        DB_POOL_AVAILABLE.labels(target=target).set(idle)
+        DB_POOL_INUSE.labels(target=target).set(opened - idle)
+        DB_POOL_WAITING.labels(target=target).set(waiting)
+        DB_POOL_CONN_AGE.labels(target=target).set(max(ages) if ages else 0)
+        for label, n in checkouts.items():
+            delta = n - self._published_checkouts[label]
+            if delta:
+                DB_POOL_CHECKOUTS.labels(endpoint=label, target=target).inc(delta)
+                self._published_checkouts[label] = n
+        for label, secs in held.items():
+            delta = secs - self._published_held[label]
+            if delta > 0:
+                DB_POOL_HELD.labels(endpoint=label, target=target).inc(delta)
+                self._published_held[label] = secs
+        if reconnects > self._published_reconnects:
+            DB_POOL_RECONNECTS.labels(target=target).inc(reconnects - self._published_reconnects)
+            self._published_reconnects = reconnects
+        wait = DB_POOL_WAIT.labels(target=target)
+        for seconds in wait_times:
+            wait.observe(seconds)
+        for name, seconds in statement_times:
+            DB_STATEMENT_LATENCY.labels(statement=name).observe(seconds)
+
+# -------------------- Read replicas --------------------
+# Replay lag in seconds; 0 on a caught-up streaming standby (an idle primary makes the
+# replay timestamp age without any real lag) and on a server that is not in recovery.
+REPLICA_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+         AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8, 'Infinity'::float8)
+END
+"""
+
+def _replica_targets(spec: str) -> List[Tuple[str, str, int]]:
+    """Parse DB_REPLICA_HOSTS into (target, host, port); the entry itself is the metrics label."""
+    targets = []
+    for entry in (x.strip() for x in spec.split(",")):
+        if not entry:
+            continue
+        host, _, port = entry.partition(":")
+        targets.append((entry, host, int(port) if port else DB_PORT))
+    return targets
+
+REPLICA_TARGETS = _replica_targets(DB_REPLICA_HOSTS)
+
+class ReplicaSet:
+    """
+    Health of the read replicas. A replica is used only while its last lag check
+    succeeded and measured at most max_lag seconds; reads round-robin over the
+    healthy ones, and pick() returns None (read from the primary) when there are none.
+    """
+
+    def __init__(self, targets: List[str], max_lag: float):
+        self.targets = targets
+        self.max_lag = max_lag
+        self._healthy: Tuple[str, ...] = ()
+        self._status: Dict[str, bool] = {t: False for t in targets}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def pick(self) -> Optional[str]:
+        healthy = self._healthy
+        if not healthy:
+            return None
+        self._next += 1  # a racy increment only skews the rotation
+        return healthy[self._next % len(healthy)]
+
+    def record(self, target: str, lag: Optional[float]) -> bool:
+        """Store a lag measurement (None = unreachable) and return whether target is usable."""
+        ok = lag is not None and lag <= self.max_lag
+        with self._lock:
+            was = self._status.get(target)
+            self._status[target] = ok
+            self._healthy = tuple(t for t in self.targets if self._status[t])
+        if was != ok:
+            if ok:
+                logger.info("Read replica %s in rotation (lag %.1fs)", target, lag)
+            elif lag is None:
+                logger.warning("Read replica %s unreachable; out of rotation", target)
+            else:
+                logger.warning("Read replica %s lagging %.1fs (> %gs); out of rotation", target, lag, self.max_lag)
+        if lag is not None:
+            DB_REPLICA_LAG.labels(target=target).set(lag)
+        DB_REPLICA_HEALTHY.labels(target=target).set(1 if ok else 0)
+        return ok
+
+REPLICAS = ReplicaSet([t for t, _, _ in REPLICA_TARGETS], DB_REPLICA_MAX_LAG)
+
+class ReplicaMonitor:
+    """Measures every replica's lag each DB_REPLICA_CHECK_INTERVAL seconds from a daemon thread."""
+
+    def __init__(self, pools: Dict[str, ConnectionPool], replicas: ReplicaSet, interval: float):
+        self.pools = pools
+        self.replicas = replicas
+        self.interval = interval
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="replica-monitor", daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            for target, pool in self.pools.items():
+                try:
+                    self.check(target, pool)
+                except Exception:
+                    logger.exception("Replica check for %s failed", target)
+            time.sleep(self.interval)
+
+    def check(self, target: str, pool: ConnectionPool) -> None:
+        try:
+            conn = pool.getconn(POOL_TIMEOUT)
+        except PoolTimeout:
+            return  # saturated, not unhealthy: keep the last verdict
+        except psycopg2.Error as e:
+            logger.debug("Replica %s connect failed: %s", target, e)
+            self.replicas.record(target, None)
             return
-        DB_POOL_AVAILABLE.set(POOL._pool.qsize())
-        inuse = len(getattr(POOL, "_used", {}))
-        DB_POOL_INUSE.set(inuse)
-    except Exception:
-        pass
+        lag, broken = None, False
+        try:
+            with conn.cursor() as cur:
+                cur.execute(REPLICA_LAG_SQL)
+                lag = float(cur.fetchone()[0])
+            conn.rollback()
+        except psycopg2.Error as e:
+            logger.debug("Replica %s lag query failed: %s", target, e)
+            broken = True
+        finally:
+            pool.putconn(conn, close=broken)
+        self.replicas.record(target, lag)
+
+def _pool_label() -> str:
+    try:
+        return _endpoint_label()
+    except RuntimeError:
+        return "background"  # outside a request (visit sink, kickoff poll)
 
 def _ensure_pool():
     """Initialize the pool once with small retry/backoff."""
@@ -387,9 +1698,11 @@ def _ensure_pool():
             return
         for attempt in range(1, 31):
             try:
-                p = SimpleConnectionPool(
-                    POOL_MIN,
+                POOL = ConnectionPool(
+                    max(POOL_MIN, 1),
                     POOL_MAX,
+                    POOL_QUEUE_MAX,
+                    POOL_CHECK_AFTER,
                     host=DB_HOST,
                     port=DB_PORT,
                     dbname=DB_NAME,
@@ -398,36 +1711,172 @@ def _ensure_pool():
                     connect_timeout=5,
                     application_name="epl_api",
                 )
-                with p.getconn() as c:
-                    with c.cursor() as cur:
-                        cur.execute("SELECT 1;")
-                POOL = p
                 logger.info("DB pool initialized")
-                _export_pool_metrics()
+                PoolTelemetry(POOL, POOL_SAMPLE_INTERVAL).start()
                 return
             except Exception as e:
                 logger.warning("DB pool init attempt %d/30 failed: %s", attempt, e)
                 time.sleep(2)
         logger.error("DB pool could not be initialized after retries")
 
+def _ensure_replica_pools() -> None:
+    """Create the (lazily connecting) replica pools and start their lag monitor once."""
+    if REPLICA_POOLS or not REPLICA_TARGETS:
+        return
+    with POOL_LOCK:
+        if REPLICA_POOLS:
+            return
+        pools = {
+            target: ConnectionPool(
+                0,
+                POOL_MAX,
+                POOL_QUEUE_MAX,
+                POOL_CHECK_AFTER,
+                name=target,
+                host=host,
+                port=port,
+                dbname=DB_NAME,
+                user=DB_USER,
+                password=DB_PASS,
+                connect_timeout=5,
+                application_name="epl_api",
+            )
+            for target, host, port in REPLICA_TARGETS
+        }
+        for pool in pools.values():
+            PoolTelemetry(pool, POOL_SAMPLE_INTERVAL).start()
+        ReplicaMonitor(pools, REPLICAS, DB_REPLICA_CHECK_INTERVAL).start()
+        REPLICA_POOLS.update(pools)
+
 class ConnCtx:
+    """
+    Pooled connection for one unit of work. Reads go to a healthy replica when
+    DB_REPLICA_HOSTS is set and fall back to the primary; write=True always
+    uses the primary.
+    """
+
+    def __init__(self, write: bool = False):
+        self.write = write
+
     def __enter__(self):
         _ensure_pool()
         if POOL is None:
             raise RuntimeError("DB unavailable")
-        self.conn = POOL.getconn()
-        _export_pool_metrics()
+        label = _pool_label()
+        if not self.write:
+            _ensure_replica_pools()
+            target = REPLICAS.pick()
+            if target is not None:
+                pool = REPLICA_POOLS[target]
+                try:
+                    self.pool, self.conn = pool, pool.getconn(POOL_TIMEOUT, label)
+                    return self.conn
+                except psycopg2.OperationalError as e:
+                    REPLICAS.record(target, None)
+                    logger.warning("Reading from primary instead of %s: %s", target, e)
+        self.pool, self.conn = POOL, POOL.getconn(POOL_TIMEOUT, label)
         return self.conn
 
     def __exit__(self, exc_type, exc, tb):
+        broken = False
         try:
             if exc:
                 self.conn.rollback()
             else:
                 self.conn.commit()
+        except psycopg2.Error:
+            broken = True
+            raise
         finally:
-            POOL.putconn(self.conn)
-            _export_pool_metrics()
+            self.pool.putconn(self.conn, close=broken or isinstance(exc, psycopg2.OperationalError))
+
+# -------------------- Prepared statements --------------------
+# Hot lookups, PREPAREd once per pooled connection on first use and run with EXECUTE.
+# A replacement connection starts with an empty `prepared` set, so it re-prepares.
+LEADERBOARD_SQL = (
+    "SELECT v.player_id, p.player_name, v.position, v.team_id, p.team_name, p.team_short_name, v.value "
+    "FROM player_stat_values v JOIN players p USING (player_id) "
+    "WHERE v.stat = $1 {filters} ORDER BY v.value DESC, v.player_id LIMIT $2"
+)
+
+# Prepared statements name their columns: a plan keeps the row type it was prepared with, so a
+# SELECT * would fail every EXECUTE once a migration adds or drops a column.
+PLAYER_COLUMNS = (
+    "player_id", "player_name", "position", "first_name", "last_name", "team_id", "team_name",
+    "team_short_name", "country", "dob", "height", "weight", "preferred_foot", "shirt_num",
+    "stats", "fpl_id", "fpl_stats",
+)
+TEAM_COLUMNS = ("id", "name", "short_name", "abbr", "stadium", "fpl_id", "fpl_data", "stats")
+FIXTURE_COLUMNS = (
+    "match_id", "kickoff_timezone", "kickoff_time", "home_team_id", "home_team_name", "home_team_abbr",
+    "away_team_id", "away_team_name", "away_team_abbr", "gameweek", "venue", "status",
+)
+COMPLETED_FIXTURE_COLUMNS = (
+    "match_id", "kickoff_timezone", "kickoff_time", "home_team_id", "home_team_name", "home_team_abbr",
+    "home_team_score", "home_team_redcard", "away_team_id", "away_team_name", "away_team_abbr",
+    "away_team_score", "away_team_redcard", "gameweek", "venue",
+)
+MATCH_DETAIL_COLUMNS = ("events", "home_stats", "away_stats", "home_team_lineup", "away_team_lineup", "match_report")
+
+def _column_list(columns: Tuple[str, ...], alias: str = "") -> str:
+    return ", ".join(f"{alias}.{c}" if alias else c for c in columns)
+
+STATEMENTS: Dict[str, str] = {
+    "players_by_id": f"SELECT {_column_list(PLAYER_COLUMNS)} FROM players WHERE player_id = $1",
+    "players_by_team": f"SELECT {_column_list(PLAYER_COLUMNS)} FROM players WHERE team_id = $1",
+    "teams_by_id": f"SELECT {_column_list(TEAM_COLUMNS)} FROM teams WHERE id = $1",
+    "fixtures_by_id": f"SELECT {_column_list(FIXTURE_COLUMNS)} FROM fixtures WHERE match_id = $1",
+    "completed_by_id": f"SELECT {_column_list(COMPLETED_FIXTURE_COLUMNS, 'c')}, {_column_list(MATCH_DETAIL_COLUMNS, 'd')} "
+                       "FROM completedfixtures c LEFT JOIN matchdetails d USING (match_id) "
+                       "WHERE c.match_id = $1",
+    "completed_by_team": f"SELECT {_column_list(COMPLETED_FIXTURE_COLUMNS)} FROM completedfixtures "
+                         "WHERE home_team_id = $1 OR away_team_id = $1",
+    "completed_by_team_stats": f"SELECT {_column_list(COMPLETED_FIXTURE_COLUMNS, 'c')}, d.home_stats, d.away_stats "
+                               "FROM completedfixtures c LEFT JOIN matchdetails d USING (match_id) "
+                               "WHERE c.home_team_id = $1 OR c.away_team_id = $1",
+    "match_report": "SELECT match_report FROM matchdetails WHERE match_id = $1",
+    "match_details": f"SELECT match_id, {_column_list(MATCH_DETAIL_COLUMNS)} FROM matchdetails WHERE match_id = $1",
+    # one variant per filter combination so each walks its own (stat, ..., value DESC) index
+    "leaderboard": LEADERBOARD_SQL.format(filters=""),
+    "leaderboard_position": LEADERBOARD_SQL.format(filters="AND v.position = $3"),
+    "leaderboard_team": LEADERBOARD_SQL.format(filters="AND v.team_id = $3"),
+    "leaderboard_position_team": LEADERBOARD_SQL.format(filters="AND v.position = $3 AND v.team_id = $4"),
+    "leaderboard_stat": "SELECT EXISTS (SELECT 1 FROM player_stat_values WHERE stat = $1) AS known",
+}
+
+def _prepare(cur, name: str) -> None:
+    try:
+        cur.execute(f"PREPARE {name} AS {STATEMENTS[name]}")
+    except psycopg2.errors.DuplicatePreparedStatement:
+        cur.connection.rollback()
+    cur.connection.prepared.add(name)
+    DB_STATEMENT_PREPARES.labels(statement=name).inc()
+
+def execute_prepared(cur, name: str, params: Tuple[Any, ...]) -> None:
+    """Run STATEMENTS[name] on cur, preparing it on this connection first if needed."""
+    conn = cur.connection
+    if name not in conn.prepared:
+        _prepare(cur, name)
+    execute = sql.SQL("EXECUTE {} ({})").format(
+        sql.Identifier(name), sql.SQL(", ").join([sql.Placeholder()] * len(params))
+    )
+    started = time.perf_counter()
+    try:
+        cur.execute(execute, params)
+    except psycopg2.errors.InvalidSqlStatementName:
+        # the server dropped the statement (DEALLOCATE, pooler reset); prepare again and retry once
+        conn.rollback()
+        conn.prepared.clear()
+        _prepare(cur, name)
+        cur.execute(execute, params)
+    except psycopg2.errors.FeatureNotSupported:
+        # "cached plan must not change result type": a migration changed a table under the plan
+        conn.rollback()
+        cur.execute(sql.SQL("DEALLOCATE {}").format(sql.Identifier(name)))
+        conn.prepared.discard(name)
+        _prepare(cur, name)
+        cur.execute(execute, params)
+    conn.statement_times.append((name, time.perf_counter() - started))
 
 def _to_jsonable(v):
     if isinstance(v, (datetime, date, dtime)):
@@ -438,9 +1887,1083 @@ def _to_jsonable(v):
         return str(v)
     return v
 
+# -------------------- JSON encoding --------------------
+class RawJSON(str):
+    """JSONB column text, spliced into responses verbatim instead of decoded and re-encoded."""
+
+# The API only ever forwards JSONB to clients, so skip json.loads for every JSONB cell.
+register_default_jsonb(globally=True, loads=RawJSON)
+
+def _json_default(v):
+    out = _to_jsonable(v)
+    if out is v:
+        raise TypeError(f"Object of type {type(v).__name__} is not JSON serializable")
+    return out
+
+_encode_scalar = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_json_default).encode
+
+def encode_record(rec: Dict[str, Any]) -> str:
+    """Encode one row; keys are sorted like Flask's jsonify, RawJSON values pass through."""
+    return "{" + ",".join(
+        f"{_encode_scalar(k)}:{v if isinstance(v, RawJSON) else _encode_scalar(v)}"
+        for k, v in sorted(rec.items())
+    ) + "}"
+
+def encode_records(records) -> str:
+    """JSON array of rows; None entries (batch misses) become null."""
+    return "[" + ",".join("null" if rec is None else encode_record(rec) for rec in records) + "]"
+
 def jsonify_records(records):
-    return jsonify([{k: _to_jsonable(v) for k, v in rec.items()} for rec in records])
+    return Response(encode_records(records), mimetype="application/json")
+
+def jsonify_record(rec: Dict[str, Any]):
+    return Response(encode_record(rec), mimetype="application/json")
+
+def wants_ndjson(args: Mapping[str, str]) -> bool:
+    return args.get("format", "").lower() == "ndjson"
+
+def _wants_stream(spec: Dict[str, Any], args: Mapping[str, str]) -> bool:
+    """Stream a whole collection only on request (?stream=1, ?format=ndjson) or when STREAM_COLLECTIONS opts it in."""
+    if wants_ndjson(args) or args.get("stream", "").lower() in ("1", "true"):
+        return True
+    return STREAM_COLLECTIONS and spec["stream"]
+
+class StreamEncoder:
+    """
+    Encodes streamed rows as one JSON array (or NDJSON lines), handing back
+    ~STREAM_CHUNK_BYTES pieces; both serving modes feed their cursors through it.
+    """
+
+    def __init__(self, ndjson: bool):
+        self.ndjson = ndjson
+        self.mimetype = "application/x-ndjson" if ndjson else "application/json"
+        self._buf: List[str] = [] if ndjson else ["["]
+        self._size = 0
+        self._first = True
+
+    def add(self, rec: Dict[str, Any]) -> Optional[str]:
+        """Buffer one row; returns a chunk once enough has been buffered."""
+        item = encode_record(rec)
+        if self.ndjson:
+            item += "\n"
+        elif not self._first:
+            item = "," + item
+        self._first = False
+        self._buf.append(item)
+        self._size += len(item)
+        if self._size < STREAM_CHUNK_BYTES:
+            return None
+        chunk, self._buf, self._size = "".join(self._buf), [], 0
+        return chunk
+
+    def close(self) -> Optional[str]:
+        """The last chunk (closing the array), if anything is left."""
+        if not self.ndjson:
+            self._buf.append("]")
+        chunk, self._buf = "".join(self._buf), []
+        return chunk or None
+
+def stream_records(query: Any, params: Iterable[Any] = ()):
+    """
+    Stream a query as a JSON array (or NDJSON with ?format=ndjson) from a named cursor.
+
+    Rows are pulled STREAM_ITERSIZE at a time and flushed in ~STREAM_CHUNK_BYTES
+    pieces, so worker memory stays flat regardless of result size. The pooled
+    connection is held until the last chunk is written.
+    """
+    encoder = StreamEncoder(wants_ndjson(request.args))
+    params = tuple(params)
+    # Check out before the response starts so pool exhaustion is still a clean 503
+    ctx = ConnCtx()
+    conn = ctx.__enter__()
+    released = []
+
+    def release(exc: Optional[BaseException] = None) -> None:
+        if not released:
+            released.append(True)
+            ctx.__exit__(type(exc) if exc else None, exc, None)
+
+    def generate():
+        try:
+            yield from rows()
+        except BaseException as e:
+            release(e)
+            raise
+        release()
+
+    def rows():
+        with conn.cursor(name=f"stream_{os.urandom(4).hex()}", cursor_factory=RealDictCursor) as cur:
+            cur.itersize = STREAM_ITERSIZE
+            cur.execute(query, params)
+            for rec in cur:
+                chunk = encoder.add(rec)
+                if chunk:
+                    yield chunk
+            chunk = encoder.close()
+            if chunk:
+                yield chunk
+
+    resp = Response(generate(), mimetype=encoder.mimetype)
+    resp.call_on_close(release)
+    return resp
 
+# -------------------- Collections (projection + keyset pagination) --------------------
+# Whitelisted columns per table for ?fields=; `key` is the keyset ordering used by ?after=.
+COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    "players": {
+        "key": ("player_id",),
+        "stream": True,
+        "columns": PLAYER_COLUMNS,
+    },
+    "completedfixtures": {
+        "key": ("match_id",),
+        "stream": True,
+        "columns": COMPLETED_FIXTURE_COLUMNS,
+    },
+    "teams": {
+        "key": ("id",),
+        "stream": False,
+        "columns": TEAM_COLUMNS,
+    },
+    "fixtures": {
+        "key": ("match_id",),
+        "stream": False,
+        "columns": FIXTURE_COLUMNS,
+    },
+    "teamform": {
+        "key": ("team_id",),
+        "stream": False,
+        "columns": (
+            "team_id", "team_name", "team_abbr", "played", "form", "home_form", "away_form", "streak",
+            "unbeaten", "home", "away", "last_results", "updated_at",
+        ),
+    },
+    "weeklystandings": {
+        "key": ("gameweek", "team_id"),
+        "stream": False,
+        "columns": (
+            "gameweek", "team_id", "team_name", "team_abbr", "team_short_name", "position", "played", "won",
+            "drawn", "lost", "goals_for", "goals_against", "goal_difference", "points",
+        ),
+    },
+}
+
+def _parse_fields(spec: Dict[str, Any], raw: Optional[str]) -> Optional[List[str]]:
+    if not raw:
+        return None
+    fields = []
+    for name in (f.strip() for f in raw.split(",")):
+        if not name:
+            continue
+        if not IDENTIFIER_RE.match(name) or name not in spec["columns"]:
+            abort(400, description=f"Unknown field: {name}")
+        if name not in fields:
+            fields.append(name)
+    # key columns are always returned so the next page can be requested
+    return [k for k in spec["key"] if k not in fields] + fields
+
+def _parse_limit(raw: Optional[str]) -> Optional[int]:
+    if raw is None:
+        return None
+    try:
+        limit = int(raw)
+    except ValueError:
+        abort(400, description="limit must be an integer")
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        abort(400, description=f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+    return limit
+
+def _parse_ids(spec: Dict[str, Any], raw: Optional[str]) -> Optional[List[int]]:
+    if raw is None:
+        return None
+    if len(spec["key"]) != 1:
+        abort(400, description="ids is only supported on collections with a single-column key")
+    try:
+        ids = [int(x) for x in raw.split(",") if x.strip()]
+    except ValueError:
+        abort(400, description="ids must be a comma-separated list of integers")
+    if not all(1 <= i <= PG_INT_MAX for i in ids):
+        abort(400, description=f"ids must be between 1 and {PG_INT_MAX}")
+    if not 1 <= len(ids) <= MAX_BATCH_IDS:
+        abort(400, description=f"ids must list between 1 and {MAX_BATCH_IDS} ids")
+    return ids
+
+def _encode_cursor(values: Iterable[Any]) -> str:
+    raw = json.dumps([_to_jsonable(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _parse_after(spec: Dict[str, Any], raw: Optional[str]) -> Optional[List[Any]]:
+    if not raw:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+    except Exception:
+        abort(400, description="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(spec["key"]):
+        abort(400, description="Invalid cursor")
+    return [_cursor_value(column, value) for column, value in zip(spec["key"], values)]
+
+def _cursor_value(column: str, value: Any) -> Any:
+    """A decoded cursor value checked against its key column: ISO timestamps for *_time keys, else INT."""
+    if column.endswith("_time"):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            abort(400, description="Invalid cursor")
+    if type(value) is not int or not -PG_INT_MAX - 1 <= value <= PG_INT_MAX:
+        abort(400, description="Invalid cursor")
+    return value
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _placeholder(paramstyle: str, n: int) -> str:
+    """The n-th (1-based) bind parameter: %s for psycopg2 ("format"), $n for asyncpg ("numeric")."""
+    return f"${n}" if paramstyle == "numeric" else "%s"
+
+def collection_args(table: str, args: Mapping[str, str]):
+    """Validated (fields, ids, limit, after) for a collection request; ids excludes limit and after."""
+    spec = COLLECTIONS[table]
+    fields = _parse_fields(spec, args.get("fields"))
+    ids = _parse_ids(spec, args.get("ids"))
+    if ids is not None:
+        if "limit" in args or "after" in args:
+            abort(400, description="ids cannot be combined with limit or after")
+        return fields, ids, None, None
+    return fields, None, _parse_limit(args.get("limit")), _parse_after(spec, args.get("after"))
+
+def collection_query(table: str, fields: Optional[List[str]], limit: Optional[int], after: Optional[List[Any]],
+                     paramstyle: str = "format") -> Tuple[str, List[Any]]:
+    """The page query (ordered by the key columns when paging) and its parameters. Identifiers come from COLLECTIONS."""
+    key = ", ".join(map(_quote, COLLECTIONS[table]["key"]))
+    query = f"SELECT {', '.join(map(_quote, fields)) if fields else '*'} FROM {_quote(table)}"
+    params: List[Any] = []
+    if after is not None:
+        values = ", ".join(_placeholder(paramstyle, i + 1) for i in range(len(after)))
+        query += f" WHERE ({key}) > ({values})"
+        params.extend(after)
+    if limit is not None or after is not None:
+        query += f" ORDER BY {key}"
+    if limit is not None:
+        params.append(limit + 1)
+        query += f" LIMIT {_placeholder(paramstyle, len(params))}"
+    return query, params
+
+def next_page(table: str, rows: List[Any], limit: Optional[int]) -> Tuple[List[Any], Optional[str]]:
+    """Cut the extra row fetched by collection_query; returns the page and the cursor for the next one."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, _encode_cursor(rows[-1][k] for k in COLLECTIONS[table]["key"])
+
+def next_page_headers(path: str, args: Iterable[Tuple[str, str]], cursor: str) -> Dict[str, str]:
+    """X-Next-Cursor and a Link to the next page, keeping the other query arguments (first value of each)."""
+    link_args: Dict[str, str] = {}
+    for k, v in args:
+        if k != "api_token":
+            link_args.setdefault(k, v)
+    link_args["after"] = cursor
+    return {"X-Next-Cursor": cursor, "Link": f'<{path}?{urlencode(link_args)}>; rel="next"'}
+
+def collection_response(table: str):
+    """
+    Serve a whitelisted table with optional ?fields=, ?limit= and ?after=.
+
+    Without ?limit the whole table is returned, buffered unless ?stream=1 or
+    ?format=ndjson asks for it to be streamed (see _wants_stream). With ?limit the page is buffered, ordered by the key columns,
+    and the cursor for the next page is sent in X-Next-Cursor / Link.
+    With ?ids= the listed rows are fetched in one query instead (see batch_response).
+    """
+    fields, ids, limit, after = collection_args(table, request.args)
+    if ids is not None:
+        return batch_response(table, fields, ids)
+    query, params = collection_query(table, fields, limit, after)
+
+    if limit is None and _wants_stream(COLLECTIONS[table], request.args):
+        return stream_records(query, params)
+
+    with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(query, tuple(params))
+        rows = cur.fetchall()
+    rows, next_cursor = next_page(table, rows, limit)
+
+    resp = jsonify_records(rows)
+    if next_cursor:
+        resp.headers.update(next_page_headers(request.path, request.args.items(multi=True), next_cursor))
+    return resp
+
+def batch_rows_in_order(rows: Iterable[Dict[str, Any]], key: str, ids: List[int]) -> List[Optional[Dict[str, Any]]]:
+    by_id = {row[key]: row for row in rows}
+    return [by_id.get(i) for i in ids]
+
+def batch_query(table: str, fields: Optional[List[str]], paramstyle: str = "format") -> str:
+    """`key = ANY(...)` over the collection's single key column; bind the sorted distinct ids."""
+    (key,) = COLLECTIONS[table]["key"]
+    cols = ", ".join(map(_quote, fields)) if fields else "*"
+    return f"SELECT {cols} FROM {_quote(table)} WHERE {_quote(key)} = ANY({_placeholder(paramstyle, 1)})"
+
+def batch_response(table: str, fields: Optional[List[str]], ids: List[int]):
+    """
+    Multi-get: one `key = ANY(...)` query for up to MAX_BATCH_IDS ids.
+
+    The JSON array follows the order of ?ids= (duplicates included) and holds
+    null where an id does not exist.
+    """
+    with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(batch_query(table, fields), (sorted(set(ids)),))
+        rows = cur.fetchall()
+    return jsonify_records(batch_rows_in_order(rows, COLLECTIONS[table]["key"][0], ids))
+
+# -------------------- Single flight --------------------
+class _FanoutReader:
+    """A follower's body. close(), or dropping it unread, gives up its place in the fanout."""
+
+    __slots__ = ("fanout", "reader")
+
+    def __init__(self, fanout: "StreamFanout", reader: int):
+        self.fanout, self.reader = fanout, reader
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.fanout._read(self.reader)
+
+    def close(self) -> None:
+        self.fanout._leave(self.reader)
+
+    __del__ = close
+
+class StreamFanout:
+    """
+    Shares one streamed body with identical requests that arrive while it is sent.
+
+    It is the leader's WSGI iterable: every chunk pulled from `source` is also
+    kept for the followers (see join), which replay from the first chunk and
+    then follow the leader live. Only the first `max_bytes` are kept for
+    replay. Past that the fanout is sealed: it takes no new followers and keeps
+    just the chunks its followers have not read yet, and the leader waits for
+    them while that backlog is over `max_bytes`. If the leader's client goes
+    away, the rest of the source is still read for the followers attached.
+    """
+
+    def __init__(self, source: Iterable[Any], status: int, mimetype: str, headers: Dict[str, str],
+                 max_bytes: int = STREAM_FANOUT_MAX_BYTES):
+        self.status, self.mimetype, self.headers = status, mimetype, headers
+        self.max_bytes = max_bytes
+        self._source = iter(source)
+        self._close_source = getattr(source, "close", None)
+        self._chunks: List[Any] = []  # chunks from index _base on
+        self._base = 0
+        self._bytes = 0
+        self._sealed = False
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._readers: Dict[int, int] = {}  # follower -> index of the next chunk it reads
+        self._next_reader = 0
+        self._on_sealed: List[Callable[[], None]] = []
+        self._cond = threading.Condition()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._source)
+        except StopIteration:
+            self._finish(None)
+            raise
+        except BaseException as e:
+            self._finish(e)
+            raise
+        self._publish(chunk)
+        return chunk
+
+    def close(self) -> None:
+        """Called when the leader's response ends, including when its client went away."""
+        if not self._done:
+            with self._cond:
+                drain = bool(self._readers)
+            if drain:
+                try:
+                    for chunk in self._source:
+                        self._publish(chunk)
+                    self._finish(None)
+                except Exception as e:
+                    self._finish(e)
+            else:
+                self._finish(ConnectionAbortedError("streamed response abandoned"))
+        if self._close_source is not None:
+            self._close_source()
+
+    def on_sealed(self, callback: Callable[[], None]) -> None:
+        """Run callback once the fanout stops taking followers (the stream ended or outgrew max_bytes)."""
+        with self._cond:
+            if not self._sealed:
+                self._on_sealed.append(callback)
+                return
+        callback()
+
+    def join(self) -> Optional[Tuple[int, Iterable[Any], str, Dict[str, str]]]:
+        """A (status, body, mimetype, headers) snapshot for a follower, or None if sealed or failed."""
+        with self._cond:
+            if self._sealed or self._error is not None:
+                return None
+            reader, self._next_reader = self._next_reader, self._next_reader + 1
+            self._readers[reader] = self._base
+        return self.status, _FanoutReader(self, reader), self.mimetype, self.headers
+
+    def _read(self, reader: int) -> Any:
+        with self._cond:
+            if reader not in self._readers:
+                raise StopIteration
+            while self._readers[reader] == self._base + len(self._chunks) and not self._done:
+                self._cond.wait()
+            position = self._readers[reader]
+            if position < self._base + len(self._chunks):
+                chunk = self._chunks[position - self._base]
+                self._readers[reader] = position + 1
+                self._trim()
+                return chunk
+            error = self._error
+        self._leave(reader)
+        if error is not None:
+            raise error
+        raise StopIteration
+
+    def _leave(self, reader: int) -> None:
+        with self._cond:
+            if reader in self._readers:
+                del self._readers[reader]
+                self._trim()
+
+    def _publish(self, chunk: Any) -> None:
+        with self._cond:
+            self._chunks.append(chunk)
+            self._bytes += len(chunk)
+            self._cond.notify_all()
+            if self._sealed:
+                while self._readers and self._bytes > self.max_bytes:
+                    self._cond.wait()
+                self._trim()
+                return
+            if self._bytes <= self.max_bytes:
+                return
+            callbacks = self._seal()
+        for callback in callbacks:
+            callback()
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        with self._cond:
+            if self._done:
+                return
+            self._done, self._error = True, error
+            callbacks = self._seal()
+            self._cond.notify_all()
+        for callback in callbacks:
+            callback()
+
+    def _seal(self) -> List[Callable[[], None]]:
+        """Stop taking followers; returns the on_sealed callbacks to run outside the lock."""
+        if self._sealed:
+            return []
+        self._sealed = True
+        self._trim()
+        callbacks, self._on_sealed = self._on_sealed, []
+        return callbacks
+
+    def _trim(self) -> None:
+        """Once sealed, drop the chunks every follower has read and wake a leader waiting on them."""
+        if not self._sealed:
+            return
+        keep = min(self._readers.values(), default=self._base + len(self._chunks))
+        if keep > self._base:
+            dropped = self._chunks[:keep - self._base]
+            del self._chunks[:keep - self._base]
+            self._base = keep
+            self._bytes -= sum(len(chunk) for chunk in dropped)
+            self._cond.notify_all()
+
+class SingleFlight:
+    """
+    Collapses concurrent identical renders. fn returns (result, shareable): the
+    caller's own result and what identical callers may reuse (None if nothing).
+    The first caller for a key runs fn; callers arriving while it is in flight
+    wait up to `timeout` and get (None, shareable), or re-raise its exception.
+    A StreamFanout keeps the flight open until it is sealed, and its
+    callers get a joined snapshot. A caller that times out, or finds nothing
+    to share, runs fn on its own.
+    """
+
+    class _Flight:
+        __slots__ = ("done", "shareable", "error")
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.shareable: Any = None
+            self.error: Optional[BaseException] = None
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._flights: Dict[Any, "SingleFlight._Flight"] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Any, fn: Callable[[], Tuple[Any, Any]], endpoint: str) -> Tuple[Any, Any]:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = self._Flight()
+        if leader:
+            SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="leader").inc()
+            try:
+                result, flight.shareable = fn()
+                return result, flight.shareable
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                if isinstance(flight.shareable, StreamFanout):
+                    flight.shareable.on_sealed(lambda: self._forget(key))
+                else:
+                    self._forget(key)
+                flight.done.set()
+        if not flight.done.wait(self.timeout):
+            SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="timeout").inc()
+            return fn()
+        if flight.error is not None:
+            SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="coalesced").inc()
+            raise flight.error
+        shareable = flight.shareable
+        if isinstance(shareable, StreamFanout):
+            shareable = shareable.join()
+        if shareable is None:
+            SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="unshared").inc()
+            return fn()
+        SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="coalesced").inc()
+        return None, shareable
+
+    def _forget(self, key: Any) -> None:
+        with self._lock:
+            del self._flights[key]
+
+SINGLE_FLIGHT = SingleFlight(SINGLE_FLIGHT_TIMEOUT) if SINGLE_FLIGHT_ENABLED else None
+
+# -------------------- Response cache --------------------
+class ResponseCache:
+    """LRU of serialized GET responses, bounded by entry count and total bytes."""
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[bytes, str, Tuple[int, ...], float, Dict[str, str]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, str], version: Tuple[int, ...]) -> Optional[Tuple[bytes, str, Dict[str, str]]]:
+        with self._lock:
+            ent = self._entries.get(key)
+            if ent is None:
+                return None
+            body, mimetype, ent_version, expires, headers = ent
+            if ent_version != version:
+                self._drop(key, "version")
+                return None
+            if time.monotonic() >= expires:
+                self._drop(key, "expired")
+                return None
+            self._entries.move_to_end(key)
+            return body, mimetype, headers
+
+    def put(self, key: Tuple[str, str], body: bytes, mimetype: str, version: Tuple[int, ...], ttl: int,
+            headers: Optional[Dict[str, str]] = None) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key, None)
+            self._entries[key] = (body, mimetype, version, time.monotonic() + ttl, headers or {})
+            self._bytes += len(body)
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                self._drop(next(iter(self._entries)), "lru")
+            RESPONSE_CACHE_BYTES.set(self._bytes)
+
+    def clear(self, reason: str = "version") -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key, reason)
+            RESPONSE_CACHE_BYTES.set(self._bytes)
+
+    def _drop(self, key, reason: Optional[str]) -> None:
+        body = self._entries.pop(key)[0]
+        self._bytes -= len(body)
+        if reason:
+            RESPONSE_CACHE_EVICTIONS.labels(reason=reason).inc()
+
+# Response headers stored alongside cached bodies (pagination cursors)
+CACHED_HEADERS = ("X-Next-Cursor", "Link")
+
+RESPONSE_CACHE = ResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRIES)
+
+DataVersions = Dict[str, Tuple[int, Optional[datetime]]]
+
+_data_versions: Dict[str, Any] = {"value": {}, "checked": float("-inf")}
+_data_versions_lock = threading.Lock()
+
+DATA_VERSIONS_SQL = "SELECT name, version, updated_at FROM data_versions"
+
+def _data_versions_due() -> bool:
+    return time.monotonic() - _data_versions["checked"] >= DATA_VERSION_POLL
+
+def _current_data_versions() -> DataVersions:
+    """Per-table versions bumped by dataPipeline.py; re-read at most every DATA_VERSION_POLL seconds."""
+    if not _data_versions_due():
+        return _data_versions["value"]
+    with _data_versions_lock:
+        if not _data_versions_due():
+            return _data_versions["value"]
+        versions = _data_versions["value"]
+        try:
+            with ConnCtx() as conn, conn.cursor() as cur:
+                cur.execute(DATA_VERSIONS_SQL)
+                versions = {name: (int(version), updated_at) for name, version, updated_at in cur.fetchall()}
+        except Exception as e:
+            logger.warning("Could not read data versions: %s", e)
+        return _store_data_versions(versions)
+
+def _store_data_versions(versions: DataVersions) -> DataVersions:
+    if versions != _data_versions["value"]:
+        logger.info("Data versions changed, clearing response cache")
+        RESPONSE_CACHE.clear("version")
+    _data_versions["value"] = versions
+    _data_versions["checked"] = time.monotonic()
+    return versions
+
+def _cache_key_for(path: str, args: Iterable[Tuple[str, str]]) -> Tuple[str, str]:
+    return path, urlencode(sorted((k, v) for k, v in args if k != "api_token"))
+
+def _etag(key: Tuple[str, str], version: Tuple[int, ...]) -> str:
+    raw = f"{key[0]}?{key[1]}|{','.join(map(str, version))}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def cache_validators(tables: Tuple[str, ...], versions: DataVersions, path: str,
+                     args: Iterable[Tuple[str, str]]) -> Tuple[Tuple[str, str], Tuple[int, ...], str, Optional[datetime]]:
+    """(cache key, version, ETag, Last-Modified) of a request to a route reading `tables`."""
+    version = tuple(versions.get(t, (0, None))[0] for t in tables)
+    last_modified = max((versions[t][1] for t in tables if t in versions), default=None)
+    key = _cache_key_for(path, args)
+    return key, version, _etag(key, version), last_modified
+
+def not_modified(headers: Mapping[str, str], etag: str, last_modified: Optional[datetime]) -> bool:
+    inm = headers.get("If-None-Match")
+    if inm:
+        return parse_etags(inm).contains_weak(etag)
+    ims = parse_date(headers.get("If-Modified-Since"))
+    return bool(ims and last_modified and last_modified.replace(microsecond=0) <= ims)
+
+def validator_headers(etag: str, last_modified: Optional[datetime], cache_control: str) -> Dict[str, str]:
+    """ETag, Last-Modified and Cache-Control for a 200 or 304 from a cached route."""
+    headers = {"ETag": f'"{etag}"', "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+def keep_rendered(key: Tuple[str, str], version: Tuple[int, ...], ttl: Optional[int], status: int, body: bytes,
+                  mimetype: str, headers: Dict[str, str]) -> Tuple[int, bytes, str, Dict[str, str]]:
+    """Store a rendered 200 in RESPONSE_CACHE; returns the snapshot SINGLE_FLIGHT hands to followers."""
+    if RESPONSE_CACHE_ENABLED and status == 200:
+        RESPONSE_CACHE.put(key, body, mimetype, version, ttl or RESPONSE_CACHE_TTL, headers)
+    return status, body, mimetype, headers
+
+def _render(fn, args, kwargs, endpoint: str, key: Tuple[str, str], version: Tuple[int, ...],
+            ttl: Optional[int]) -> Response:
+    """
+    Run the view for a cache miss through SINGLE_FLIGHT, so concurrent identical
+    requests share one serialized body (also stored in RESPONSE_CACHE), or one
+    streamed body while it is being sent.
+    """
+    def render():
+        resp = app.make_response(fn(*args, **kwargs))
+        headers = {h: resp.headers[h] for h in CACHED_HEADERS if h in resp.headers}
+        if resp.is_streamed:
+            if SINGLE_FLIGHT is None:
+                return resp, None
+            resp.response = fanout = StreamFanout(resp.response, resp.status_code, resp.mimetype, headers)
+            return resp, fanout
+        return resp, keep_rendered(key, version, ttl, resp.status_code, resp.get_data(), resp.mimetype, headers)
+
+    if SINGLE_FLIGHT is None:
+        return render()[0]
+    resp, snapshot = SINGLE_FLIGHT.do((key, version), render, endpoint)
+    if resp is not None:
+        return resp
+    status, body, mimetype, headers = snapshot
+    return Response(body, status=status, mimetype=mimetype, headers=headers)
+
+def cached(*tables: str, ttl: Optional[int] = None, policy: str = "nightly"):
+    """
+    Version a read-only route by the data_versions of the tables it reads.
+
+    Conditional requests matching the ETag / Last-Modified are answered with
+    304 before the view runs; otherwise the body is served from RESPONSE_CACHE
+    while those versions are unchanged; concurrent misses for the same key
+    share one render (SINGLE_FLIGHT). `policy` names the CACHE_POLICIES
+    entry used for the Cache-Control header.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET":
+                return fn(*args, **kwargs)
+            endpoint = _endpoint_label()
+            key, version, etag, last_modified = cache_validators(
+                tables, _current_data_versions(), request.path, request.args.items(multi=True)
+            )
+
+            if not_modified(request.headers, etag, last_modified):
+                NOT_MODIFIED.labels(endpoint=endpoint).inc()
+                resp = Response(status=304)
+            elif not RESPONSE_CACHE_ENABLED:
+                resp = _render(fn, args, kwargs, endpoint, key, version, ttl)
+            else:
+                hit = RESPONSE_CACHE.get(key, version)
+                if hit is not None:
+                    RESPONSE_CACHE_REQUESTS.labels(endpoint=endpoint, result="hit").inc()
+                    body, mimetype, headers = hit
+                    resp = Response(body, mimetype=mimetype, headers=headers)
+                else:
+                    RESPONSE_CACHE_REQUESTS.labels(endpoint=endpoint, result="miss").inc()
+                    resp = _render(fn, args, kwargs, endpoint, key, version, ttl)
+
+            if resp.status_code in (200, 304):
+                resp.headers.update(validator_headers(etag, last_modified, _cache_control(policy)))
+            return resp
+        return wrapper
+    return decorator
+
+# -------------------- FPL analytics --------------------
+# /fplPlayers: per-player FPL metrics computed once per data version as NumPy
+# column arrays, then filtered / sorted / cut to top-N per request.
+FPL_TABLES = ("players", "teams", "fixtures")
+
+def _fpl_num(expr: str) -> str:
+    # FPL sends numbers as strings ("5.5"); anything unparsable becomes NULL -> NaN
+    return f"CASE WHEN ({expr}) ~ '^-?[0-9]+(\\.[0-9]+)?$' THEN ({expr})::float8 END"
+
+FPL_NUMERIC = (
+    "appearances", "now_cost", "total_points", "event_points", "points_per_game", "form",
+    "ict_index", "selected_by_percent", "minutes", "chance_of_playing",
+)
+
+FPL_PLAYERS_SQL = f"""
+    SELECT player_id, player_name, position, team_id,
+           {_fpl_num("stats->>'appearances'")} AS appearances,
+           {_fpl_num("fpl_stats->>'now_cost'")} AS now_cost,
+           {_fpl_num("fpl_stats->>'total_points'")} AS total_points,
+           {_fpl_num("fpl_stats->>'event_points'")} AS event_points,
+           {_fpl_num("fpl_stats->>'points_per_game'")} AS points_per_game,
+           {_fpl_num("fpl_stats->>'form'")} AS form,
+           {_fpl_num("fpl_stats->>'ict_index'")} AS ict_index,
+           {_fpl_num("fpl_stats->>'selected_by_percent'")} AS selected_by_percent,
+           {_fpl_num("fpl_stats->>'minutes'")} AS minutes,
+           {_fpl_num("fpl_stats->>'chance_of_playing_next_round'")} AS chance_of_playing,
+           COALESCE(fpl_stats->>'status', 'a') = 'a' AS is_available,
+           COALESCE(fpl_stats->>'news', '') AS news
+    FROM players
+    ORDER BY player_id
+"""
+
+FPL_TEAMS_SQL = f"""SELECT id, name, abbr, {_fpl_num("fpl_data->>'strength'")} AS strength FROM teams ORDER BY id"""
+
+# Same gameweek /upcomingGameweek reports; postponed games still count as that round's fixtures
+FPL_NEXT_FIXTURES_SQL = """
+    SELECT gameweek, home_team_id, away_team_id FROM fixtures
+    WHERE status IN ('scheduled', 'postponed')
+      AND gameweek = (SELECT gameweek FROM fixtures WHERE status = 'scheduled' ORDER BY kickoff_time LIMIT 1)
+    ORDER BY kickoff_time, match_id
+"""
+
+# Sortable (numeric) metrics, in response order
+FPL_METRICS = (
+    "now_cost", "total_points", "points_per_game", "points_per_90", "last_gameweek_points", "form",
+    "ict_index", "selected_by_percent", "minutes_per_game", "value_season", "value_form",
+    "performance_index", "next_opponent_difficulty", "chance_of_playing",
+)
+FPL_DEFAULT_DIFFICULTY = 3
+
+def _lookup(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Index of each id in sorted_ids; len(sorted_ids) (a sentinel slot) where it is missing or NaN."""
+    pos = np.searchsorted(sorted_ids, ids)
+    clipped = np.minimum(pos, max(len(sorted_ids) - 1, 0))
+    found = (pos < len(sorted_ids)) & (sorted_ids[clipped] == ids) if len(sorted_ids) else np.zeros(len(ids), bool)
+    return np.where(found, pos, len(sorted_ids))
+
+def build_fpl_table(players: List[Any], teams: List[Any], fixtures: List[Any]) -> Dict[str, Any]:
+    """
+    Column arrays for every player, mirroring the metrics the dashboard used to derive client-side.
+
+    `players`, `teams` and `fixtures` are rows of FPL_PLAYERS_SQL, FPL_TEAMS_SQL
+    and FPL_NEXT_FIXTURES_SQL (tuples or asyncpg Records).
+    """
+    raw = {name: np.array([r[4 + i] for r in players], dtype=float) for i, name in enumerate(FPL_NUMERIC)}
+    num = {name: np.nan_to_num(arr) for name, arr in raw.items()}
+    team_of = np.array([r[3] for r in players], dtype=float)
+
+    # teams sorted by id, plus a trailing sentinel slot for "no team"
+    team_ids = np.array([t[0] for t in teams], dtype=float)
+    team_names = np.array([t[1] for t in teams] + [None], dtype=object)
+    team_abbrs = np.array([t[2] for t in teams] + [None], dtype=object)
+    strength = np.array([t[3] for t in teams] + [None], dtype=float)
+    strength = np.where(np.isnan(strength), FPL_DEFAULT_DIFFICULTY, strength)
+
+    # opponent per team slot in the next gameweek; rows come earliest-first, and in a
+    # double gameweek np.unique keeps each team's first (earliest) fixture
+    opponent = np.full(len(teams) + 1, np.nan)
+    if fixtures:
+        home = np.array([f[1] for f in fixtures], dtype=float)
+        away = np.array([f[2] for f in fixtures], dtype=float)
+        slots, first = np.unique(_lookup(team_ids, np.column_stack((home, away)).ravel()), return_index=True)
+        opponent[slots] = np.column_stack((away, home)).ravel()[first]
+        opponent[-1] = np.nan
+    team_idx = _lookup(team_ids, team_of)
+    opp_id = opponent[team_idx]
+    opp_idx = _lookup(team_ids, opp_id)
+
+    cost = num["now_cost"] / 10
+    minutes = num["minutes"]
+    total = num["total_points"]
+    form = num["form"]
+    ppg = num["points_per_game"]
+    appearances = np.where(num["appearances"] > 0, num["appearances"], 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        points_per_90 = np.where(minutes > 0, np.round(total / minutes * 90, 2), 0.0)
+        value_season = np.where(cost > 0, np.round(total / cost, 1), 0.0)
+        value_form = np.where(cost > 0, np.round(form / cost, 1), 0.0)
+
+    metrics = {
+        "now_cost": cost,
+        "total_points": total.astype(np.int64),
+        "points_per_game": ppg,
+        "points_per_90": points_per_90,
+        "last_gameweek_points": num["event_points"].astype(np.int64),
+        "form": form,
+        "ict_index": num["ict_index"],
+        "selected_by_percent": num["selected_by_percent"],
+        "minutes_per_game": np.round(minutes / appearances, 1),
+        "value_season": value_season,
+        "value_form": value_form,
+        "performance_index": np.round(form * 0.6 + ppg * 0.4, 2),
+        "next_opponent_difficulty": strength[opp_idx].astype(np.int64),
+        "chance_of_playing": np.where(np.isnan(raw["chance_of_playing"]), 100, raw["chance_of_playing"]).astype(np.int64),
+    }
+    return {
+        "size": len(players),
+        "gameweek": fixtures[0][0] if fixtures else None,
+        "player_id": np.array([r[0] for r in players], dtype=np.int64),
+        "player_name": np.array([r[1] for r in players], dtype=object),
+        "position": np.array([r[2] for r in players], dtype=object),
+        "team_id": np.array([r[3] for r in players], dtype=object),
+        "team_name": team_names[team_idx],
+        "team_abbr": team_abbrs[team_idx],
+        "next_opponent_id": np.array([None if np.isnan(v) else int(v) for v in opp_id], dtype=object),
+        "next_opponent_name": team_names[opp_idx],
+        "next_opponent_abbr": team_abbrs[opp_idx],
+        "is_available": np.array([r[4 + len(FPL_NUMERIC)] for r in players], dtype=bool),
+        "news": np.array([r[5 + len(FPL_NUMERIC)] for r in players], dtype=object),
+        "metrics": metrics,
+    }
+
+_fpl_table: Dict[str, Any] = {"version": None, "value": None}
+_fpl_table_lock = threading.Lock()
+
+def _fpl_version(versions: DataVersions) -> Tuple[int, ...]:
+    return tuple(versions.get(t, (0, None))[0] for t in FPL_TABLES)
+
+def fpl_table() -> Dict[str, Any]:
+    """The current build_fpl_table result; rebuilt only when players, teams or fixtures change."""
+    version = _fpl_version(_current_data_versions())
+    if _fpl_table["version"] == version:
+        return _fpl_table["value"]
+    with _fpl_table_lock:
+        if _fpl_table["version"] != version:
+            with ConnCtx() as conn, conn.cursor() as cur:
+                cur.execute(FPL_PLAYERS_SQL)
+                players = cur.fetchall()
+                cur.execute(FPL_TEAMS_SQL)
+                teams = cur.fetchall()
+                cur.execute(FPL_NEXT_FIXTURES_SQL)
+                fixtures = cur.fetchall()
+            _fpl_table["value"] = build_fpl_table(players, teams, fixtures)
+            _fpl_table["version"] = version
+        return _fpl_table["value"]
+
+def _parse_float(args, name: str) -> Optional[float]:
+    raw = args.get(name)
+    if raw is None:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        abort(400, description=f"{name} must be a number")
+
+def parse_fpl_query(args) -> Dict[str, Any]:
+    """
+    Validate the /fplPlayers query before any data is read.
+
+    ?position= and ?team_id= take comma-separated lists, ?available=true keeps
+    fit players, ?max_cost= and ?min_minutes_per_game= bound price and playing time.
+    ?sort= is one of FPL_METRICS (default total_points), ?order=asc|desc, and
+    ?limit= keeps the top N.
+    """
+    sort = args.get("sort", "total_points")
+    if sort not in FPL_METRICS:
+        abort(400, description=f"sort must be one of: {', '.join(FPL_METRICS)}")
+    order = args.get("order", "desc").lower()
+    if order not in ("asc", "desc"):
+        abort(400, description="order must be asc or desc")
+    limit = _parse_limit(args.get("limit"))
+    positions = [p.strip() for p in args["position"].split(",")] if args.get("position") else None
+    team_ids = None
+    if args.get("team_id"):
+        try:
+            team_ids = [int(x) for x in args["team_id"].split(",") if x.strip()]
+        except ValueError:
+            abort(400, description="team_id must be a comma-separated list of integers")
+    available = args.get("available", "").lower()
+    if available not in ("", "true", "false"):
+        abort(400, description="available must be true or false")
+    return {
+        "sort": sort,
+        "order": order,
+        "limit": limit,
+        "positions": positions,
+        "team_ids": team_ids,
+        "available": None if not available else available == "true",
+        "max_cost": _parse_float(args, "max_cost"),
+        "min_minutes": _parse_float(args, "min_minutes_per_game"),
+    }
+
+def fpl_rows(table: Dict[str, Any], query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Filter, sort and cut the FPL table for one request's parse_fpl_query() result."""
+    metrics = table["metrics"]
+    sort, order, limit = query["sort"], query["order"], query["limit"]
+
+    mask = np.ones(table["size"], dtype=bool)
+    if query["positions"] is not None:
+        mask &= np.isin(table["position"], query["positions"])
+    if query["team_ids"] is not None:
+        mask &= np.isin(table["team_id"], query["team_ids"])
+    if query["available"] is not None:
+        mask &= table["is_available"] == query["available"]
+    if query["max_cost"] is not None:
+        mask &= metrics["now_cost"] <= query["max_cost"]
+    if query["min_minutes"] is not None:
+        mask &= metrics["minutes_per_game"] >= query["min_minutes"]
+
+    idx = np.flatnonzero(mask)
+    keys = metrics[sort][idx]
+    # player_id breaks ties so pages and top-N cuts are stable
+    idx = idx[np.lexsort((table["player_id"][idx], -keys if order == "desc" else keys))]
+    if limit is not None:
+        idx = idx[:limit]
+
+    base = {name: table[name][idx].tolist() for name in ("player_id", "player_name", "position", "team_id", "team_name", "team_abbr")}
+    extra = {name: table[name][idx].tolist() for name in ("next_opponent_id", "next_opponent_name", "next_opponent_abbr", "is_available", "news")}
+    values = {name: metrics[name][idx].tolist() for name in FPL_METRICS}
+    rows = []
+    for i in range(len(idx)):
+        derived = {name: values[name][i] for name in FPL_METRICS}
+        derived.update((name, extra[name][i]) for name in extra)
+        row = {name: base[name][i] for name in base}
+        row["derived"] = derived
+        rows.append(row)
+    return rows
+
+# -------------------- Cache-Control policy --------------------
+# max_age applies to browsers, s_maxage to nginx/CDN; both are further capped
+# by the time left until the next scheduled pipeline run.
+CACHE_POLICIES: Dict[str, Optional[Dict[str, int]]] = {
+    "nightly":  {"max_age": 300, "s_maxage": 86400, "stale_while_revalidate": 600},
+    "volatile": {"max_age": 60,  "s_maxage": 600,   "stale_while_revalidate": 60},
+    "no-store": None,
+}
+if CACHE_POLICIES_JSON:
+    for _name, _spec in json.loads(CACHE_POLICIES_JSON).items():
+        CACHE_POLICIES[_name] = None if _spec is None else {**(CACHE_POLICIES.get(_name) or {}), **_spec}
+
+def _parse_refresh_schedule(spec: str) -> List[Tuple[int, int, ZoneInfo]]:
+    """Parse "HH:MM@Zone,..." (the daily CronJob schedules) into (hour, minute, tz)."""
+    out = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        hhmm, _, tz = item.partition("@")
+        hh, mm = hhmm.split(":")
+        out.append((int(hh), int(mm), ZoneInfo(tz or "UTC")))
+    return out
+
+REFRESH_TIMES = _parse_refresh_schedule(REFRESH_SCHEDULE)
+
+def _refresh_window(now: datetime) -> Tuple[float, float]:
+    """Seconds since the last and until the next scheduled pipeline run."""
+    since, until = float("inf"), float("inf")
+    for hh, mm, tz in REFRESH_TIMES:
+        local = now.astimezone(tz)
+        prev = local.replace(hour=hh, minute=mm, second=0, microsecond=0)
+        if prev > local:
+            prev -= timedelta(days=1)
+        since = min(since, (local - prev).total_seconds())
+        until = min(until, (prev + timedelta(days=1) - local).total_seconds())
+    return since, until
+
+_kickoffs: Dict[str, Any] = {"value": [], "checked": float("-inf")}
+_kickoffs_lock = threading.Lock()
+
+KICKOFF_TIMES_SQL = "SELECT kickoff_time FROM fixtures WHERE kickoff_time IS NOT NULL ORDER BY kickoff_time"
+
+def _kickoffs_due() -> bool:
+    return time.monotonic() - _kickoffs["checked"] >= KICKOFF_POLL
+
+def _store_kickoffs(kickoffs: Optional[List[datetime]]) -> List[datetime]:
+    """Record a poll of KICKOFF_TIMES_SQL; None (the read failed) keeps the previous list until the next poll."""
+    if kickoffs is not None:
+        _kickoffs["value"] = kickoffs
+    _kickoffs["checked"] = time.monotonic()
+    return _kickoffs["value"]
+
+def _kickoff_times() -> List[datetime]:
+    if not _kickoffs_due():
+        return _kickoffs["value"]
+    with _kickoffs_lock:
+        if not _kickoffs_due():
+            return _kickoffs["value"]
+        kickoffs = None
+        try:
+            with ConnCtx() as conn, conn.cursor() as cur:
+                cur.execute(KICKOFF_TIMES_SQL)
+                kickoffs = [row[0] for row in cur.fetchall()]
+        except Exception as e:
+            logger.warning("Could not read kickoff times: %s", e)
+        return _store_kickoffs(kickoffs)
+
+def _match_in_progress(now: datetime) -> bool:
+    kickoffs = _kickoff_times()
+    i = bisect.bisect_right(kickoffs, now)
+    return i > 0 and (now - kickoffs[i - 1]).total_seconds() < MATCH_DURATION
+
+def _cache_control(policy_name: str) -> str:
+    policy = CACHE_POLICIES.get(policy_name)
+    if policy is None:
+        return "no-store"
+    now = datetime.now(timezone.utc)
+    since, until = _refresh_window(now)
+    horizon = int(until)
+    if since < REFRESH_GRACE or _match_in_progress(now):
+        horizon = min(horizon, LIVE_MAX_AGE)
+    max_age = max(0, min(policy["max_age"], horizon))
+    s_maxage = max(0, min(policy["s_maxage"], horizon))
+    # a stale copy may be served for stale-while-revalidate after it expires, so that must end by the horizon too
+    stale = max(0, min(policy["stale_while_revalidate"], horizon - max(max_age, s_maxage)))
+    value = f"public, max-age={max_age}, s-maxage={s_maxage}"
+    return f"{value}, stale-while-revalidate={stale}" if stale else value
 
 # -------------------- Health --------------------
 @app.route("/health", methods=["GET"])
@@ -459,122 +2982,237 @@ def readyz():
         abort(503, description="DB not ready")
 
 # -------------------- Routes --------------------
+STANDINGS_SQL = "SELECT * FROM standings"
+UPCOMING_FIXTURES_SQL = """SELECT * FROM fixtures
+                           WHERE status IN ('scheduled', 'postponed')
+                           ORDER BY kickoff_time"""
+UPCOMING_GAMEWEEK_SQL = """SELECT gameweek FROM fixtures
+                           WHERE status = 'scheduled'
+                           ORDER BY kickoff_time
+                           LIMIT 1"""
+
 @app.route("/standings", methods=["GET"])
+@cached("standings", ttl=900)
 def standings():
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM standings')
+        cur.execute(STANDINGS_SQL)
         return jsonify_records(cur.fetchall())
     
 @app.route("/weeklyTable", methods=["GET"])
+@cached("weeklystandings", ttl=3600)
 def weekly_table():
-    with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM weeklystandings')
-        return jsonify_records(cur.fetchall())
+    return collection_response('weeklystandings')
 
 @app.route("/players", methods=["GET"])
+@cached("players", ttl=900)
 def players():
-    with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM players')
-        return jsonify_records(cur.fetchall())
+    return collection_response('players')
 
 @app.route("/playersById/<playerId>", methods=["GET"])
+@cached("players", ttl=900)
 def players_by_id(playerId):
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM players WHERE player_id = %s', (playerId,))
+        execute_prepared(cur, "players_by_id", (playerId,))
         return jsonify_records(cur.fetchall())
 
 @app.route("/playersByTeam/<teamId>", methods=["GET"])
+@cached("players", ttl=900)
 def players_by_team(teamId):
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM players WHERE team_id = %s', (teamId,))
+        execute_prepared(cur, "players_by_team", (teamId,))
         return jsonify_records(cur.fetchall())
 
 @app.route("/teams", methods=["GET"])
+@cached("teams", ttl=3600)
 def teams():
+    return collection_response('teams')
+
+@app.route("/teamForm", methods=["GET"])
+@cached("teamform", ttl=3600)
+def team_form():
+    return collection_response('teamform')
+
+@app.route("/fplPlayers", methods=["GET"])
+@cached(*FPL_TABLES, ttl=900)
+def fpl_players():
+    query = parse_fpl_query(request.args)
+    return jsonify_records(fpl_rows(fpl_table(), query))
+
+def leaderboard_query(args) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Pick the /leaderboard statement and its parameters.
+
+    ?stat= is required, ?position= and ?team= narrow the board, ?top= (default
+    LEADERBOARD_TOP) keeps the first N.
+    """
+    stat = args.get("stat")
+    if not stat:
+        abort(400, description="stat is required")
+    if not IDENTIFIER_RE.match(stat):
+        abort(400, description=f"Unknown stat: {stat}")
+    try:
+        top = int(args.get("top", LEADERBOARD_TOP))
+    except ValueError:
+        abort(400, description="top must be an integer")
+    if not 1 <= top <= MAX_PAGE_LIMIT:
+        abort(400, description=f"top must be between 1 and {MAX_PAGE_LIMIT}")
+    statement, params = "leaderboard", (stat, top)
+    if args.get("position"):
+        statement, params = statement + "_position", params + (args["position"],)
+    if args.get("team"):
+        try:
+            team = int(args["team"])
+        except ValueError:
+            abort(400, description="team must be an integer")
+        statement, params = statement + "_team", params + (team,)
+    return statement, params
+
+@app.route("/leaderboard", methods=["GET"])
+@cached("players", ttl=900)
+def leaderboard():
+    statement, params = leaderboard_query(request.args)
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM teams')
-        return jsonify_records(cur.fetchall())
+        execute_prepared(cur, statement, params)
+        rows = cur.fetchall()
+        if not rows:
+            execute_prepared(cur, "leaderboard_stat", params[:1])
+            known = cur.fetchone()["known"]
+    if not rows and not known:
+        abort(400, description=f"Unknown stat: {params[0]}")
+    return jsonify_records(rows)
 
 @app.route("/teamsById/<teamId>", methods=["GET"])
+@cached("teams", ttl=3600)
 def teams_by_id(teamId):
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM teams WHERE id = %s', (teamId,))
+        execute_prepared(cur, "teams_by_id", (teamId,))
         return jsonify_records(cur.fetchall())
     
 @app.route("/fixtures", methods=["GET"])
+@cached("fixtures", ttl=3600)
 def fixtures():
-    with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM fixtures')
-        return jsonify_records(cur.fetchall())
+    return collection_response('fixtures')
     
 @app.route("/fixturesById/<fixtureId>", methods=["GET"])
+@cached("fixtures", ttl=3600)
 def fixtures_by_id(fixtureId):
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM fixtures WHERE match_id = %s', (fixtureId,))
+        execute_prepared(cur, "fixtures_by_id", (fixtureId,))
         return jsonify_records(cur.fetchall())
 
 @app.route('/completedFixtures', methods=['GET'])
+@cached("completedfixtures", ttl=900)
 def completed_fixtures():
-    with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM completedfixtures')
-        return jsonify_records(cur.fetchall())
+    return collection_response('completedfixtures')
 
 @app.route('/completedGamebyId/<matchId>', methods=['GET'])
+@cached("completedfixtures", ttl=3600)
 def completed_game_by_id(matchId):
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM completedfixtures WHERE match_id = %s', (matchId,))
+        execute_prepared(cur, "completed_by_id", (matchId,))
         return jsonify_records(cur.fetchall())
 
+def _team_games_statement(include: Optional[str]) -> str:
+    """/completedGamebyTeamId returns scoreline rows; ?include=stats adds each side's match stats."""
+    if not include:
+        return "completed_by_team"
+    if include != "stats":
+        abort(400, description="include must be stats")
+    return "completed_by_team_stats"
+
 @app.route('/completedGamebyTeamId/<teamId>', methods=['GET'])
+@cached("completedfixtures", ttl=900)
 def completed_game_by_team_id(teamId):
+    statement = _team_games_statement(request.args.get("include"))
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT * FROM completedfixtures WHERE home_team_id = %s OR away_team_id = %s', (teamId, teamId))
+        execute_prepared(cur, statement, (teamId,))
         return jsonify_records(cur.fetchall())
 
     
 @app.route('/matchReport/<matchId>', methods=['GET'])
+@cached("completedfixtures", ttl=3600)
 def match_report(matchId):
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('SELECT match_report FROM completedfixtures WHERE match_id = %s', (matchId,))
-        return cur.fetchone()
+        execute_prepared(cur, "match_report", (matchId,))
+        row = cur.fetchone()
+    if row is None:
+        abort(404, description="Match not found")
+    return row
+
+@app.route('/matchDetails/<matchId>', methods=['GET'])
+@cached("completedfixtures", ttl=3600)
+def match_details(matchId):
+    with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        execute_prepared(cur, "match_details", (matchId,))
+        row = cur.fetchone()
+    if row is None:
+        abort(404, description="Match not found")
+    return jsonify_record(row)
 
 @app.route('/upcomingFixtures', methods=['GET'])
+@cached("fixtures", ttl=300, policy="volatile")
 def upcoming_fixtures():
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('''SELECT * FROM fixtures
-                        WHERE match_id NOT IN (
-                            SELECT match_id from completedfixtures)
-                        ORDER BY kickoff_time''')
+        cur.execute(UPCOMING_FIXTURES_SQL)
         return jsonify_records(cur.fetchall())
 
 @app.route('/upcomingFixturesbyID/<fixtureId>', methods=['GET'])
+@cached("fixtures", ttl=3600)
 def upcoming_fixtures_by_id(fixtureId):
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('''SELECT * FROM fixtures
-                        WHERE match_id = %s''', (fixtureId,))
+        execute_prepared(cur, "fixtures_by_id", (fixtureId,))
         return jsonify_records(cur.fetchall())    
 
 @app.route('/upcomingGameweek', methods=['GET'])
+@cached("fixtures", ttl=300, policy="volatile")
 def upcoming_gameweek():
     with ConnCtx() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute('''SELECT gameweek FROM fixtures
-                        WHERE match_id NOT IN (
-                            SELECT match_id from completedfixtures)
-                        LIMIT 1''')
-        return (cur.fetchone())
+        cur.execute(UPCOMING_GAMEWEEK_SQL)
+        row = cur.fetchone()
+    if row is None:
+        abort(404, description="No upcoming gameweek")
+    return row
 
 # -------------------- Error Handlers --------------------
+ERROR_NAMES = {
+    400: "bad_request",
+    401: "unauthorized",
+    404: "not_found",
+    405: "method_not_allowed",
+    429: "too_many_requests",
+    503: "service_unavailable",
+}
+
+def error_payload(status: int, message: str) -> Dict[str, str]:
+    return {"error": ERROR_NAMES.get(status, "error"), "message": message}
+
 @app.errorhandler(400)
 def bad_request(e):
-    return jsonify(error="bad_request", message=str(e.description)), 400
+    return jsonify(error_payload(400, str(e.description))), 400
+
+@app.errorhandler(401)
+def unauthorized(e):
+    return jsonify(error_payload(401, str(e.description))), 401
 
 @app.errorhandler(404)
 def not_found(e):
-    return jsonify(error="not_found", message=str(e.description)), 404
+    return jsonify(error_payload(404, str(e.description))), 404
 
 @app.errorhandler(503)
 def svc_unavailable(e):
-    return jsonify(error="service_unavailable", message=str(e.description)), 503
+    return jsonify(error_payload(503, str(e.description))), 503
+
+@app.errorhandler(PoolTimeout)
+def pool_timeout(e):
+    resp = jsonify(error_payload(503, str(e)))
+    resp.headers["Retry-After"] = str(POOL_RETRY_AFTER)
+    return resp, 503
+
+@app.errorhandler(RateLimited)
+def rate_limited(e):
+    resp = jsonify(error_payload(429, str(e)))
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp, 429
 
 @app.errorhandler(Exception)
 def unhandled(e):
@@ -583,9 +3221,7 @@ def unhandled(e):
 
 @app.route("/debug/geo")
 def debug_geo():
-    ip = request.args.get("ip") or request.headers.get("CF-Connecting-IP") \
-         or request.headers.get("X-Forwarded-For","").split(",")[0].strip() \
-         or request.remote_addr
+    ip = request.args.get("ip") or resolve_client_ip(request.headers, request.remote_addr)
     return jsonify({"ip": ip, "geo": _geo_lookup(ip)})
 
 # -------------------- Entrypoint --------------------
@@ -0,0 +1,828 @@
+"""
+Asyncio serving mode for the API (API_MODE=asgi).
+
+Serves the same routes, JSON shapes, cache headers and Prometheus metrics as
+app.py, but on uvicorn workers with an asyncpg pool and an httpx geo client:
+a slow client or query parks a coroutine instead of holding a worker thread.
+Configuration, caches, metrics and JSON encoding are shared with app.py.
+"""
+import asyncio
+import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from functools import wraps
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.routing import Match
+from werkzeug.exceptions import HTTPException, NotFound
+
+import app as api
+
+logger = logging.getLogger("asgi")
+
+# -------------------- DB pool --------------------
+class AsyncDB:
+    """
+    asyncpg pools mirroring ConnectionPool's limits: at most DB_POOL_QUEUE_MAX
+    coroutines wait for a connection, each for at most DB_POOL_TIMEOUT seconds,
+    after which PoolTimeout is raised (answered with 503 + Retry-After).
+
+    With DB_REPLICA_HOSTS set there is one pool per replica next to the primary
+    one; reads are routed through app.REPLICAS exactly like ConnCtx does.
+    Checkout waits and statement timings are buffered like ConnectionPool's
+    and published by sample().
+    """
+
+    def __init__(self):
+        self.pools: Dict[str, asyncpg.Pool] = {}
+        self.waiting: Dict[str, int] = {}
+        self.wait_times: List[Tuple[str, float]] = []
+        self.statement_times: List[Tuple[str, float]] = []
+        self._owners: Dict[int, str] = {}
+
+    async def _create_pool(self, host: str, port: int, min_size: int) -> asyncpg.Pool:
+        return await asyncpg.create_pool(
+            host=host,
+            port=port,
+            database=api.DB_NAME,
+            user=api.DB_USER,
+            password=api.DB_PASS,
+            min_size=min_size,
+            max_size=api.POOL_MAX,
+            timeout=5,
+            init=self._init_connection,
+            server_settings={"application_name": "epl_api"},
+        )
+
+    async def start(self) -> None:
+        for target, host, port in api.REPLICA_TARGETS:
+            if target not in self.pools:
+                self.pools[target] = await self._create_pool(host, port, 0)  # connects on first use
+                self.waiting[target] = 0
+        self.pools["primary"] = await self._create_pool(api.DB_HOST, api.DB_PORT, max(api.POOL_MIN, 1))
+        self.waiting["primary"] = 0
+        logger.info("Async DB pool initialized")
+
+    async def start_with_retry(self) -> None:
+        for attempt in range(1, 31):
+            try:
+                await self.start()
+                return
+            except Exception as e:
+                logger.warning("Async DB pool init attempt %d/30 failed: %s", attempt, e)
+                await asyncio.sleep(2)
+        logger.error("Async DB pool could not be initialized after retries")
+
+    async def close(self) -> None:
+        for pool in self.pools.values():
+            await pool.close()
+
+    @staticmethod
+    async def _init_connection(conn) -> None:
+        # JSON columns are forwarded verbatim, like register_default_jsonb in app.py
+        for typ in ("jsonb", "json"):
+            await conn.set_type_codec(typ, schema="pg_catalog", encoder=str, decoder=api.RawJSON, format="text")
+
+    async def _acquire(self, target: str):
+        pool = self.pools[target]
+        started = time.monotonic()
+        saturated = pool.get_idle_size() == 0 and pool.get_size() >= api.POOL_MAX
+        if saturated and self.waiting[target] >= api.POOL_QUEUE_MAX:
+            api.DB_POOL_TIMEOUTS.labels(reason="queue_full", target=target).inc()
+            raise api.PoolTimeout("connection wait queue is full")
+        self.waiting[target] += 1
+        try:
+            conn = await pool.acquire(timeout=api.POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            if not saturated and target != "primary":
+                # the timeout was spent opening a connection: treat the replica as unreachable
+                raise ConnectionError(f"connecting to {target} timed out")
+            api.DB_POOL_TIMEOUTS.labels(reason="timeout", target=target).inc()
+            raise api.PoolTimeout(f"no connection available within {api.POOL_TIMEOUT:g}s")
+        finally:
+            self.waiting[target] -= 1
+            if len(self.wait_times) < api.ConnectionPool.MAX_PENDING_SAMPLES:
+                self.wait_times.append((target, time.monotonic() - started))
+        self._owners[id(conn)] = target
+        return conn
+
+    async def acquire(self, write: bool = False):
+        if "primary" not in self.pools:
+            raise RuntimeError("DB unavailable")
+        target = None if write else api.REPLICAS.pick()
+        if target is not None:
+            try:
+                return await self._acquire(target)
+            except (OSError, asyncpg.PostgresConnectionError, asyncpg.CannotConnectNowError) as e:
+                api.REPLICAS.record(target, None)
+                logger.warning("Reading from primary instead of %s: %s", target, e)
+        return await self._acquire("primary")
+
+    async def release(self, conn) -> None:
+        await self.pools[self._owners.pop(id(conn))].release(conn)
+
+    @asynccontextmanager
+    async def connection(self, write: bool = False):
+        conn = await self.acquire(write)
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def fetch(self, query: str, *params: Any) -> List[asyncpg.Record]:
+        async with self.connection() as conn:
+            return await conn.fetch(query, *params)
+
+    async def fetchrow(self, query: str, *params: Any) -> Optional[asyncpg.Record]:
+        async with self.connection() as conn:
+            return await conn.fetchrow(query, *params)
+
+    async def statement(self, name: str, *params: Any, one: bool = False):
+        """Run app.STATEMENTS[name]; asyncpg prepares it once per connection in its statement cache."""
+        async with self.connection() as conn:
+            started = time.perf_counter()
+            if one:
+                result = await conn.fetchrow(api.STATEMENTS[name], *params)
+            else:
+                result = await conn.fetch(api.STATEMENTS[name], *params)
+            if len(self.statement_times) < api.ConnectionPool.MAX_PENDING_SAMPLES:
+                self.statement_times.append((name, time.perf_counter() - started))
+            return result
+
+    async def sample(self) -> None:
+        """Publish pool gauges and buffered timings every DB_POOL_SAMPLE_INTERVAL seconds, like PoolTelemetry."""
+        while True:
+            for target, pool in list(self.pools.items()):
+                idle = pool.get_idle_size()
+                api.DB_POOL_AVAILABLE.labels(target=target).set(idle)
+                api.DB_POOL_INUSE.labels(target=target).set(pool.get_size() - idle)
+                api.DB_POOL_WAITING.labels(target=target).set(self.waiting[target])
+            wait_times, self.wait_times = self.wait_times, []
+            statement_times, self.statement_times = self.statement_times, []
+            for target, seconds in wait_times:
+                api.DB_POOL_WAIT.labels(target=target).observe(seconds)
+            for name, seconds in statement_times:
+                api.DB_STATEMENT_LATENCY.labels(statement=name).observe(seconds)
+            await asyncio.sleep(api.POOL_SAMPLE_INTERVAL)
+
+    async def monitor_replicas(self) -> None:
+        """Async twin of ReplicaMonitor: measure each replica's lag every DB_REPLICA_CHECK_INTERVAL seconds."""
+        while True:
+            for target, _, _ in api.REPLICA_TARGETS:
+                if target in self.pools:
+                    await self._check_replica(target)
+            await asyncio.sleep(api.DB_REPLICA_CHECK_INTERVAL)
+
+    async def _check_replica(self, target: str) -> None:
+        try:
+            conn = await self._acquire(target)
+        except api.PoolTimeout:
+            return  # saturated, not unhealthy: keep the last verdict
+        except Exception as e:
+            logger.debug("Replica %s connect failed: %s", target, e)
+            api.REPLICAS.record(target, None)
+            return
+        lag = None
+        try:
+            lag = float(await conn.fetchval(api.REPLICA_LAG_SQL))
+        except Exception as e:
+            logger.debug("Replica %s lag query failed: %s", target, e)
+        finally:
+            await self.release(conn)
+        api.REPLICAS.record(target, lag)
+
+DB = AsyncDB()
+GEO_CLIENT: Optional[httpx.AsyncClient] = None
+
+def _id(value: str) -> Any:
+    # asyncpg binds typed parameters; path ids arrive as strings
+    return int(value) if value.lstrip("-").isdigit() else value
+
+# -------------------- Lifespan --------------------
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    global GEO_CLIENT
+    GEO_CLIENT = httpx.AsyncClient(timeout=api.GEO_TIMEOUT)
+    # connect in the background so /health answers while the DB is still coming up
+    tasks = [asyncio.create_task(DB.start_with_retry()), asyncio.create_task(DB.sample()),
+             asyncio.create_task(DB.monitor_replicas())]
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await GEO_CLIENT.aclose()
+        await DB.close()
+
+app = FastAPI(lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+if api.CORS_ENABLED:
+    app.add_middleware(CORSMiddleware, allow_origins=api.CORS_ORIGINS)
+
+ROUTE_LABELS: Dict[Any, str] = {}
+
+def route(path: str):
+    """Register a GET route; metrics use the Flask-style rule so both modes share label values."""
+    def decorator(fn):
+        ROUTE_LABELS[fn] = re.sub(r"\{(\w+)\}", r"<\1>", path)
+        app.add_api_route(path, fn, methods=["GET"])
+        return fn
+    return decorator
+
+def _endpoint_label(request: Request) -> str:
+    return ROUTE_LABELS.get(request.scope.get("endpoint")) or request.url.path or "unknown"
+
+def _route_label(request: Request) -> str:
+    """_endpoint_label before routing has run, for middleware that needs it up front."""
+    for r in app.router.routes:
+        match, child = r.matches(request.scope)
+        if match == Match.FULL:
+            # also label responses the middleware answers itself (e.g. 429) by route
+            request.scope.setdefault("endpoint", child.get("endpoint"))
+            break
+    return _endpoint_label(request)
+
+# -------------------- Responses --------------------
+def _error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    return json_object(api.error_payload(status, message), status=status, headers=headers)
+
+def json_records(records) -> Response:
+    return Response(api.encode_records(None if r is None else dict(r) for r in records), media_type="application/json")
+
+def json_record(record) -> Response:
+    # a row with JSONB columns: app.encode_record splices them in verbatim
+    return Response(api.encode_record(dict(record)), media_type="application/json")
+
+def json_object(record, status: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    # same encoding as Flask's jsonify(dict): sorted keys, compact, ASCII-escaped
+    body = json.dumps(dict(record), sort_keys=True, separators=(",", ":"), default=api._json_default)
+    return Response(body + "\n", status_code=status, media_type="application/json", headers=headers)
+
+@app.exception_handler(HTTPException)
+async def _werkzeug_error(request: Request, e: HTTPException):
+    # shared helpers (e.g. _parse_limit) abort() with werkzeug exceptions
+    return _error(e.code, str(e.description))
+
+@app.exception_handler(StarletteHTTPException)
+async def _starlette_error(request: Request, e: StarletteHTTPException):
+    message = NotFound.description if e.status_code == 404 else str(e.detail)
+    return _error(e.status_code, message)
+
+@app.exception_handler(api.PoolTimeout)
+async def _pool_timeout(request: Request, e: api.PoolTimeout):
+    return _error(503, str(e), headers={"Retry-After": str(api.POOL_RETRY_AFTER)})
+
+# -------------------- Request pipeline --------------------
+def _remote_addr(request: Request) -> Optional[str]:
+    return request.client.host if request.client else None
+
+async def _rate_limit(request: Request, token: Optional[str]) -> Optional[int]:
+    key = api.rate_limit_bucket(request.method, request.url.path, request.headers, _remote_addr(request), token)
+    if key is None:
+        return None
+    route_label = _route_label(request)
+    if isinstance(api.RATE_LIMITER.store, api.LocalBucketStore):
+        return api.RATE_LIMITER.check(key, route_label)
+    # the shared store is a SQLite transaction that can wait on its busy timeout; keep it off the loop
+    return await run_in_threadpool(api.RATE_LIMITER.check, key, route_label)
+
+@app.middleware("http")
+async def _request_pipeline(request: Request, call_next):
+    start = time.time()
+    request_id = api.request_id(request.headers)
+    path = request.url.path
+    api.INFLIGHT.inc()
+    try:
+        token = api.request_token(request.headers, request.query_params)
+        if not api._authorized(request.method, path, token):
+            resp = _error(401, api.INVALID_TOKEN)
+        elif (retry_after := await _rate_limit(request, token)) is not None:
+            resp = _error(429, str(api.RateLimited(retry_after)), headers={"Retry-After": str(retry_after)})
+        else:
+            try:
+                resp = await call_next(request)
+            except Exception:
+                logger.exception("Unhandled error")
+                resp = Response('{"error":"internal_error"}\n', status_code=500, media_type="application/json")
+    finally:
+        api.INFLIGHT.dec()
+
+    api.observe_request(request.method, _endpoint_label(request), path, resp.status_code, max(time.time() - start, 0))
+    resp.headers["X-Request-ID"] = request_id
+    api.apply_security_headers(resp.headers, path)
+    # like the Flask gates, requests turned away with 401 or 429 are not recorded as visits
+    if resp.status_code not in (401, 429):
+        api.submit_visit(api.visit_event(request.method, path, request.headers, _remote_addr(request), start),
+                         resp.status_code)
+    return resp
+
+# -------------------- Cache validation --------------------
+_versions_lock = asyncio.Lock()
+_kickoffs_lock = asyncio.Lock()
+
+async def _current_data_versions() -> api.DataVersions:
+    if not api._data_versions_due():
+        return api._data_versions["value"]
+    async with _versions_lock:
+        if not api._data_versions_due():
+            return api._data_versions["value"]
+        versions = api._data_versions["value"]
+        try:
+            rows = await DB.fetch(api.DATA_VERSIONS_SQL)
+            versions = {r["name"]: (int(r["version"]), r["updated_at"]) for r in rows}
+        except Exception as e:
+            logger.warning("Could not read data versions: %s", e)
+        return api._store_data_versions(versions)
+
+async def _cache_control(policy_name: str) -> str:
+    # refresh the kickoff list here so api._cache_control never queries synchronously
+    if api._kickoffs_due():
+        async with _kickoffs_lock:
+            if api._kickoffs_due():
+                kickoffs = None
+                try:
+                    kickoffs = [r["kickoff_time"] for r in await DB.fetch(api.KICKOFF_TIMES_SQL)]
+                except Exception as e:
+                    logger.warning("Could not read kickoff times: %s", e)
+                api._store_kickoffs(kickoffs)
+    return api._cache_control(policy_name)
+
+class _AsyncFanoutReader:
+    """A reader's body. aclose(), or dropping it unread, gives up its place in the fanout."""
+
+    __slots__ = ("fanout", "reader")
+
+    def __init__(self, fanout: "AsyncStreamFanout", reader: int):
+        self.fanout, self.reader = fanout, reader
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.fanout._read(self.reader)
+
+    async def aclose(self) -> None:
+        self.fanout._leave(self.reader)
+
+    def __del__(self):
+        self.fanout._leave(self.reader)
+
+class AsyncStreamFanout:
+    """
+    Async twin of app.StreamFanout. The source is read by its own task rather
+    than by the leader, so the leader and its followers all replay the kept
+    chunks. Once sealed, the task waits while the unread backlog is over
+    `max_bytes`, and it is cancelled when the last reader goes away early.
+    """
+
+    def __init__(self, resp: StreamingResponse, headers: Dict[str, str], max_bytes: int = api.STREAM_FANOUT_MAX_BYTES):
+        self.status, self.media_type, self.headers = resp.status_code, resp.media_type, headers
+        self.max_bytes = max_bytes
+        self._source = resp.body_iterator
+        self._background, resp.background = resp.background, None  # releases the connection once the source is done
+        self._chunks: List[Any] = []  # chunks from index _base on
+        self._base = 0
+        self._bytes = 0
+        self._sealed = False
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._readers: Dict[int, int] = {}  # reader -> index of the next chunk it reads
+        self._next_reader = 0
+        self._changed = asyncio.Event()
+        self._on_sealed: List[Any] = []
+        self._task = asyncio.create_task(self._pump())
+
+    async def _pump(self) -> None:
+        try:
+            async for chunk in self._source:
+                self._chunks.append(chunk)
+                self._bytes += len(chunk)
+                self._notify()
+                if not self._sealed and self._bytes > self.max_bytes:
+                    self._seal()
+                while self._sealed and self._readers and self._bytes > self.max_bytes:
+                    await self._changed.wait()
+        except asyncio.CancelledError:
+            self._error = ConnectionAbortedError("streamed response abandoned")
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._notify()
+            if self._background is not None:
+                await self._background()
+            self._seal()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def on_sealed(self, callback) -> None:
+        if self._sealed:
+            callback()
+        else:
+            self._on_sealed.append(callback)
+
+    def join(self):
+        """A (status, body, media_type, headers) snapshot for a reader, or None if sealed or failed."""
+        if self._sealed or self._error is not None:
+            return None
+        reader, self._next_reader = self._next_reader, self._next_reader + 1
+        self._readers[reader] = self._base
+        return self.status, _AsyncFanoutReader(self, reader), self.media_type, self.headers
+
+    async def _read(self, reader: int) -> Any:
+        while reader in self._readers:
+            position = self._readers[reader]
+            if position < self._base + len(self._chunks):
+                chunk = self._chunks[position - self._base]
+                self._readers[reader] = position + 1
+                self._trim()
+                return chunk
+            if self._done:
+                error = self._error
+                self._leave(reader)
+                if error is not None:
+                    raise error
+                break
+            try:
+                await self._changed.wait()
+            except asyncio.CancelledError:
+                self._leave(reader)
+                raise
+        raise StopAsyncIteration
+
+    def _leave(self, reader: int) -> None:
+        if reader not in self._readers:
+            return
+        del self._readers[reader]
+        self._trim()
+        if not self._readers and not self._done:
+            self._task.cancel()
+
+    def _seal(self) -> None:
+        if self._sealed:
+            return
+        self._sealed = True
+        self._trim()
+        callbacks, self._on_sealed = self._on_sealed, []
+        for callback in callbacks:
+            callback()
+
+    def _trim(self) -> None:
+        if not self._sealed:
+            return
+        keep = min(self._readers.values(), default=self._base + len(self._chunks))
+        if keep > self._base:
+            dropped = self._chunks[:keep - self._base]
+            del self._chunks[:keep - self._base]
+            self._base = keep
+            self._bytes -= sum(len(chunk) for chunk in dropped)
+            self._notify()
+
+class AsyncSingleFlight:
+    """Async twin of app.SingleFlight, for the coroutines of one event loop."""
+
+    _ABANDONED = object()  # the leader was cancelled (client went away); followers render themselves
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._flights: Dict[Any, asyncio.Future] = {}
+
+    async def do(self, key: Any, fn, endpoint: str):
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = asyncio.get_running_loop().create_future()
+            api.SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="leader").inc()
+            try:
+                result, shareable = await fn()
+            except asyncio.CancelledError:
+                flight.set_result(self._ABANDONED)
+                del self._flights[key]
+                raise
+            except BaseException as e:
+                flight.set_exception(e)
+                flight.exception()  # retrieved, so a flight without followers is not logged as unhandled
+                del self._flights[key]
+                raise
+            if isinstance(shareable, AsyncStreamFanout):
+                shareable.on_sealed(lambda: self._flights.pop(key, None))
+            else:
+                del self._flights[key]
+            flight.set_result(shareable)
+            return result, shareable
+        done, _ = await asyncio.wait({flight}, timeout=self.timeout)
+        if not done or (flight.exception() is None and flight.result() is self._ABANDONED):
+            api.SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="timeout").inc()
+            return await fn()
+        if flight.exception() is not None:
+            api.SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="coalesced").inc()
+            raise flight.exception()
+        shareable = flight.result()
+        if isinstance(shareable, AsyncStreamFanout):
+            shareable = shareable.join()
+        if shareable is None:
+            api.SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="unshared").inc()
+            return await fn()
+        api.SINGLE_FLIGHT_REQUESTS.labels(endpoint=endpoint, result="coalesced").inc()
+        return None, shareable
+
+SINGLE_FLIGHT = AsyncSingleFlight(api.SINGLE_FLIGHT_TIMEOUT) if api.SINGLE_FLIGHT_ENABLED else None
+
+async def _render(fn, request: Request, kwargs, endpoint: str, key, version, ttl: Optional[int]) -> Response:
+    """Async twin of app._render."""
+    async def render():
+        resp = await fn(request, **kwargs)
+        headers = {h: resp.headers[h] for h in api.CACHED_HEADERS if h in resp.headers}
+        if isinstance(resp, StreamingResponse):
+            if SINGLE_FLIGHT is None:
+                return resp, None
+            fanout = AsyncStreamFanout(resp, headers)
+            resp.body_iterator = fanout.join()[1]  # the leader reads the kept chunks like any follower
+            return resp, fanout
+        return resp, api.keep_rendered(key, version, ttl, resp.status_code, resp.body, resp.media_type, headers)
+
+    if SINGLE_FLIGHT is None:
+        return (await render())[0]
+    resp, snapshot = await SINGLE_FLIGHT.do((key, version), render, endpoint)
+    if resp is not None:
+        return resp
+    status, body, media_type, headers = snapshot
+    if not isinstance(body, bytes):
+        return StreamingResponse(body, status_code=status, media_type=media_type, headers=headers)
+    return Response(body, status_code=status, media_type=media_type, headers=headers)
+
+def cached(*tables: str, ttl: Optional[int] = None, policy: str = "nightly"):
+    """Async twin of app.cached: same ETags, RESPONSE_CACHE entries and Cache-Control policy."""
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(request: Request, **kwargs):
+            endpoint = _endpoint_label(request)
+            key, version, etag, last_modified = api.cache_validators(
+                tables, await _current_data_versions(), request.url.path, request.query_params.multi_items()
+            )
+
+            if api.not_modified(request.headers, etag, last_modified):
+                api.NOT_MODIFIED.labels(endpoint=endpoint).inc()
+                resp = Response(status_code=304)
+            elif not api.RESPONSE_CACHE_ENABLED:
+                resp = await _render(fn, request, kwargs, endpoint, key, version, ttl)
+            else:
+                hit = api.RESPONSE_CACHE.get(key, version)
+                if hit is not None:
+                    api.RESPONSE_CACHE_REQUESTS.labels(endpoint=endpoint, result="hit").inc()
+                    body, mimetype, headers = hit
+                    resp = Response(body, media_type=mimetype, headers=headers)
+                else:
+                    api.RESPONSE_CACHE_REQUESTS.labels(endpoint=endpoint, result="miss").inc()
+                    resp = await _render(fn, request, kwargs, endpoint, key, version, ttl)
+
+            if resp.status_code in (200, 304):
+                resp.headers.update(api.validator_headers(etag, last_modified, await _cache_control(policy)))
+            return resp
+        return wrapper
+    return decorator
+
+# -------------------- Collections --------------------
+async def stream_records(query: str, params: List[Any], ndjson: bool) -> StreamingResponse:
+    """Async twin of app.stream_records, reading through a server-side cursor."""
+    conn = await DB.acquire()  # before the response starts, so exhaustion is still a clean 503
+    encoder = api.StreamEncoder(ndjson)
+    released = []
+
+    async def release() -> None:
+        if not released:
+            released.append(True)
+            await DB.release(conn)
+
+    async def generate():
+        try:
+            async with conn.transaction(readonly=True):
+                async for rec in conn.cursor(query, *params, prefetch=api.STREAM_ITERSIZE):
+                    chunk = encoder.add(dict(rec))
+                    if chunk:
+                        yield chunk
+                chunk = encoder.close()
+                if chunk:
+                    yield chunk
+        finally:
+            await release()
+
+    return StreamingResponse(generate(), media_type=encoder.mimetype, background=BackgroundTask(release))
+
+async def collection_response(request: Request, table: str) -> Response:
+    """Async twin of app.collection_response (?fields=, ?limit=, ?after=, ?stream=, ?format=ndjson)."""
+    args = request.query_params
+    fields, ids, limit, after = api.collection_args(table, args)
+    if ids is not None:
+        return await batch_response(table, fields, ids)
+    query, params = api.collection_query(table, fields, limit, after, paramstyle="numeric")
+
+    if limit is None and api._wants_stream(api.COLLECTIONS[table], args):
+        return await stream_records(query, params, api.wants_ndjson(args))
+
+    rows, next_cursor = api.next_page(table, await DB.fetch(query, *params), limit)
+    resp = json_records(rows)
+    if next_cursor:
+        resp.headers.update(api.next_page_headers(request.url.path, args.multi_items(), next_cursor))
+    return resp
+
+async def batch_response(table: str, fields: Optional[List[str]], ids: List[int]) -> Response:
+    """Async twin of app.batch_response: input order, null for missing ids."""
+    rows = await DB.fetch(api.batch_query(table, fields, paramstyle="numeric"), sorted(set(ids)))
+    return json_records(api.batch_rows_in_order(rows, api.COLLECTIONS[table]["key"][0], ids))
+
+# -------------------- FPL analytics --------------------
+_fpl_lock = asyncio.Lock()
+
+async def fpl_table() -> Dict[str, Any]:
+    """Async twin of app.fpl_table; shares its memo, so both modes rebuild on the same versions."""
+    version = api._fpl_version(await _current_data_versions())
+    state = api._fpl_table
+    if state["version"] == version:
+        return state["value"]
+    async with _fpl_lock:
+        if state["version"] != version:
+            players = await DB.fetch(api.FPL_PLAYERS_SQL)
+            teams = await DB.fetch(api.FPL_TEAMS_SQL)
+            fixtures = await DB.fetch(api.FPL_NEXT_FIXTURES_SQL)
+            state["value"] = await run_in_threadpool(api.build_fpl_table, players, teams, fixtures)
+            state["version"] = version
+        return state["value"]
+
+# -------------------- Health --------------------
+@route("/health")
+async def health(request: Request):
+    return Response('{"status":"ok"}\n', media_type="application/json")
+
+@route("/readyz")
+async def readyz(request: Request):
+    try:
+        await DB.fetchrow("SELECT 1;")
+        return Response('{"ready":true}\n', media_type="application/json")
+    except Exception:
+        logger.exception("Readiness check failed")
+        return _error(503, "DB not ready")
+
+@route("/metrics")
+async def metrics(request: Request):
+    return Response(generate_latest(api.registry), media_type=CONTENT_TYPE_LATEST)
+
+# -------------------- Routes --------------------
+@route("/standings")
+@cached("standings", ttl=900)
+async def standings(request: Request):
+    return json_records(await DB.fetch(api.STANDINGS_SQL))
+
+@route("/weeklyTable")
+@cached("weeklystandings", ttl=3600)
+async def weekly_table(request: Request):
+    return await collection_response(request, "weeklystandings")
+
+@route("/players")
+@cached("players", ttl=900)
+async def players(request: Request):
+    return await collection_response(request, "players")
+
+@route("/playersById/{playerId}")
+@cached("players", ttl=900)
+async def players_by_id(request: Request, playerId: str):
+    return json_records(await DB.statement("players_by_id", _id(playerId)))
+
+@route("/playersByTeam/{teamId}")
+@cached("players", ttl=900)
+async def players_by_team(request: Request, teamId: str):
+    return json_records(await DB.statement("players_by_team", _id(teamId)))
+
+@route("/teams")
+@cached("teams", ttl=3600)
+async def teams(request: Request):
+    return await collection_response(request, "teams")
+
+@route("/teamForm")
+@cached("teamform", ttl=3600)
+async def team_form(request: Request):
+    return await collection_response(request, "teamform")
+
+@route("/fplPlayers")
+@cached(*api.FPL_TABLES, ttl=900)
+async def fpl_players(request: Request):
+    query = api.parse_fpl_query(request.query_params)
+    return json_records(api.fpl_rows(await fpl_table(), query))
+
+@route("/leaderboard")
+@cached("players", ttl=900)
+async def leaderboard(request: Request):
+    statement, params = api.leaderboard_query(request.query_params)
+    rows = await DB.statement(statement, *params)
+    if not rows and not (await DB.statement("leaderboard_stat", params[0], one=True))["known"]:
+        return _error(400, f"Unknown stat: {params[0]}")
+    return json_records(rows)
+
+@route("/teamsById/{teamId}")
+@cached("teams", ttl=3600)
+async def teams_by_id(request: Request, teamId: str):
+    return json_records(await DB.statement("teams_by_id", _id(teamId)))
+
+@route("/fixtures")
+@cached("fixtures", ttl=3600)
+async def fixtures(request: Request):
+    return await collection_response(request, "fixtures")
+
+@route("/fixturesById/{fixtureId}")
+@cached("fixtures", ttl=3600)
+async def fixtures_by_id(request: Request, fixtureId: str):
+    return json_records(await DB.statement("fixtures_by_id", _id(fixtureId)))
+
+@route("/completedFixtures")
+@cached("completedfixtures", ttl=900)
+async def completed_fixtures(request: Request):
+    return await collection_response(request, "completedfixtures")
+
+@route("/completedGamebyId/{matchId}")
+@cached("completedfixtures", ttl=3600)
+async def completed_game_by_id(request: Request, matchId: str):
+    return json_records(await DB.statement("completed_by_id", _id(matchId)))
+
+@route("/completedGamebyTeamId/{teamId}")
+@cached("completedfixtures", ttl=900)
+async def completed_game_by_team_id(request: Request, teamId: str):
+    statement = api._team_games_statement(request.query_params.get("include"))
+    return json_records(await DB.statement(statement, _id(teamId)))
+
+@route("/matchReport/{matchId}")
+@cached("completedfixtures", ttl=3600)
+async def match_report(request: Request, matchId: str):
+    row = await DB.statement("match_report", _id(matchId), one=True)
+    if row is None:
+        return _error(404, "Match not found")
+    return json_object(row)
+
+@route("/matchDetails/{matchId}")
+@cached("completedfixtures", ttl=3600)
+async def match_details(request: Request, matchId: str):
+    row = await DB.statement("match_details", _id(matchId), one=True)
+    if row is None:
+        return _error(404, "Match not found")
+    return json_record(row)
+
+@route("/upcomingFixtures")
+@cached("fixtures", ttl=300, policy="volatile")
+async def upcoming_fixtures(request: Request):
+    return json_records(await DB.fetch(api.UPCOMING_FIXTURES_SQL))
+
+@route("/upcomingFixturesbyID/{fixtureId}")
+@cached("fixtures", ttl=3600)
+async def upcoming_fixtures_by_id(request: Request, fixtureId: str):
+    return json_records(await DB.statement("fixtures_by_id", _id(fixtureId)))
+
+@route("/upcomingGameweek")
+@cached("fixtures", ttl=300, policy="volatile")
+async def upcoming_gameweek(request: Request):
+    row = await DB.fetchrow(api.UPCOMING_GAMEWEEK_SQL)
+    if row is None:
+        return _error(404, "No upcoming gameweek")
+    return json_object(row)
+
+# -------------------- Debug --------------------
+async def _geo_lookup(ip: str) -> Dict[str, Any]:
+    """
+    Async twin of app._geo_lookup; shares GEO_CACHE and the embedded reader. The
+    cache (SQLite with a SharedGeoStore) and the reader run in the threadpool.
+    """
+    if not ip or not api._is_public_ip(ip):
+        return {}
+    hit = await run_in_threadpool(api.GEO_CACHE.get, ip)
+    if hit is not None:
+        return hit
+
+    out: Dict[str, Any] = {}
+    reader = await run_in_threadpool(api._embedded_geo)  # opens the database files on first use
+    try:
+        if reader is not None:
+            out = await run_in_threadpool(reader.lookup, ip)
+        else:
+            r = await GEO_CLIENT.get(f"{api.GEO_URL}/lookup", params={"ip": ip})
+            if r.is_success:
+                out = api._normalize_geo(r.json() or {})
+    except Exception:
+        pass
+
+    await run_in_threadpool(api.GEO_CACHE.put, ip, out)
+    return out
+
+@route("/debug/geo")
+async def debug_geo(request: Request):
+    ip = request.query_params.get("ip") or api.resolve_client_ip(request.headers, _remote_addr(request))
+    body = json.dumps({"ip": ip, "geo": await _geo_lookup(ip)}, sort_keys=True, separators=(",", ":"))
+    return Response(body + "\n", media_type="application/json")
@@ -0,0 +1,18 @@
+# Gunicorn settings for the API image. API_MODE picks the serving mode at deploy time:
+#   wsgi (default) - Flask app.py on threaded workers
+#   asgi           - asyncio asgi.py on uvicorn workers (asyncpg pool, httpx geo client)
+import os
+
+API_MODE = os.getenv("API_MODE", "wsgi").lower()
+
+bind = "0.0.0.0:8000"
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+timeout = 30
+
+if API_MODE == "asgi":
+    worker_class = "uvicorn_worker.UvicornWorker"
+    wsgi_app = "asgi:app"
+else:
+    worker_class = "gthread"
+    threads = int(os.getenv("GUNICORN_THREADS", "8"))
+    wsgi_app = "app:app"
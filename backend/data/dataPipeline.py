@@ -1,11 +1,16 @@
 from soupsieve import match
-from extractors.fetchData import fetchData
+from extractors.fetchData import fetchData, fixtureStatus
 from utils.logger import Logger
 from db.setupDB import initialize_database
+from datetime import datetime, timedelta, timezone
 import argparse
+import sys
 
 logger = Logger(__name__).get()
 
+# A fixture still in PreMatch this long after its kickoff time is treated as postponed
+POSTPONED_AFTER = timedelta(hours=3)
+
 fetcher = fetchData()
 
 def initialize():
@@ -45,23 +50,47 @@ def initialize():
     buildWeeklyTable()
     logger.info("Weekly Performance Table built successfully.")
 
+    from transformers.buildTeamForm import buildTeamForm
+    logger.info("Building Team Form Table")
+    buildTeamForm()
+    logger.info("Team Form Table built successfully.")
+
     logger.info("Database setup and seeding completed successfully.")
 
 def update():
+    # Bring an existing database up to the current schema first; every create/alter in setupDB is idempotent
+    logger.info("Migrating the plDashboard database schema...")
+    if not initialize_database():
+        logger.error("Database migration failed. Skipping the update.")
+        return False
+    from db.uploadToDb import uploadDb
+    uploader = uploadDb()
+    # Refresh kickoff times first so rescheduled (and postponed) fixtures move before we look for kicked-off games
+    schedule = fetcher.fetchSchedule()
+    if schedule:
+        uploader.upload_fixture_data(schedule)
+
     recentlyCompletedFixtures = fetcher.recentlyCompletedGames()
     if recentlyCompletedFixtures:
-        from db.uploadToDb import uploadDb
-        uploader = uploadDb()
         matches = []
-        for matchId, homeTeamId, awayTeamId in recentlyCompletedFixtures:
+        statuses = {}
+        now = datetime.now(timezone.utc)
+        for matchId, homeTeamId, awayTeamId, kickoffTime in recentlyCompletedFixtures:
             logger.info(f"Updating data for Match ID: {matchId}")
             matchData = fetcher.getMatchData(matchId)
             if not matchData:
                 logger.error(f"No data found for match ID: {matchId}. Skipping.")
                 continue
-            matches.append(matchData)
+            if matchData['period'] == 'PreMatch':
+                if kickoffTime and now - kickoffTime > POSTPONED_AFTER:
+                    statuses[matchId] = 'postponed'
+                continue
+            statuses[matchId] = fixtureStatus(matchData['period'])
+            # Matches still in play stay 'live' and are fetched again on the next run
+            if statuses[matchId] == 'finished':
+                matches.append(matchData)
                 
-        uploader.upload_completed_fixtures_data(matches)
+        uploader.upload_completed_fixtures_data(matches, statuses)
         
         teamsData = fetcher.init_TeamsData()
         uploader.uploadTeamsData(teamsData)
@@ -81,8 +110,14 @@ def update():
         logger.info("Updating Weekly Performance Table")
         updateWeeklyTable()
         logger.info("Weekly Performance Table updated successfully.")
+
+        from transformers.buildTeamForm import buildTeamForm
+        logger.info("Updating Team Form Table")
+        buildTeamForm()
+        logger.info("Team Form Table updated successfully.")
             
         logger.info("Recently completed fixtures updated successfully.")
+    return True
 
 
 if __name__ == "__main__":
@@ -96,5 +131,6 @@ if __name__ == "__main__":
     if args.action == "init":
         initialize()
     elif args.action == "update":
-        update()
-        logger.info("Updating the existing plDashboard database...")
\ No newline at end of file
+        logger.info("Updating the existing plDashboard database...")
+        if not update():
+            sys.exit(1)
\ No newline at end of file
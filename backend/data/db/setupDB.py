@@ -1,9 +1,204 @@
 import psycopg2
+from psycopg2 import sql
 from db.dbConn import dbConnections
 from utils.logger import Logger
 
 logger = Logger(__name__).get()
 
+def create_data_versions_table(cursor):
+    """
+    Create the data_versions table the API polls to invalidate its response cache.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name VARCHAR(64) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+        );
+    """)
+
+FIXTURE_STATUSES = ('scheduled', 'live', 'finished', 'postponed')
+
+def add_fixture_status(cursor):
+    """
+    Add the fixtures.status lifecycle column and the partial index over unfinished fixtures.
+    Fixtures move scheduled -> live -> finished, or scheduled -> postponed -> scheduled when
+    rescheduled; finished is final. Rows that already have a completedFixtures entry are backfilled.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+    """
+    cursor.execute(f"""
+        ALTER TABLE fixtures ADD COLUMN IF NOT EXISTS status VARCHAR(16) NOT NULL DEFAULT 'scheduled'
+            CONSTRAINT fixtures_status_check CHECK (status IN {FIXTURE_STATUSES});
+    """)
+    cursor.execute("""
+        UPDATE fixtures SET status = 'finished'
+        WHERE status = 'scheduled' AND match_id IN (SELECT match_id FROM completedFixtures);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_fixtures_status_kickoff_time ON fixtures (status, kickoff_time)
+        WHERE status <> 'finished';
+    """)
+
+MATCH_DETAIL_COLUMNS = ('events', 'home_stats', 'away_stats', 'home_team_lineup', 'away_team_lineup', 'match_report')
+
+def create_match_details_table(cursor):
+    """
+    Create matchDetails, the side table holding each completed match's heavy data (events, stats,
+    lineups, report) so list scans of completedFixtures only read the scoreline columns.
+    On databases that still keep those columns in completedFixtures they are copied over and dropped.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS matchDetails (
+            match_id INT PRIMARY KEY REFERENCES completedFixtures (match_id) ON DELETE CASCADE,
+            events JSONB,
+            home_stats JSONB,
+            away_stats JSONB,
+            home_team_lineup JSONB,
+            away_team_lineup JSONB,
+            match_report TEXT
+        );
+    """)
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'completedfixtures' AND column_name = ANY(%s);
+    """, (list(MATCH_DETAIL_COLUMNS),))
+    legacy = [row[0] for row in cursor.fetchall()]
+    if not legacy:
+        return
+    columns = ', '.join(legacy)
+    logger.info(f"Moving {columns} from completedFixtures to matchDetails...")
+    cursor.execute(f"""
+        INSERT INTO matchDetails (match_id, {columns})
+        SELECT match_id, {columns} FROM completedFixtures
+        ON CONFLICT (match_id) DO NOTHING;
+    """)
+    cursor.execute("ALTER TABLE completedFixtures " + ', '.join(f"DROP COLUMN {c}" for c in legacy) + ";")
+
+def create_team_form_table(cursor):
+    """
+    Create the teamForm table buildTeamForm fills with each team's precomputed form.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS teamForm (
+            team_id INT PRIMARY KEY,
+            team_name VARCHAR(255),
+            team_abbr VARCHAR(10),
+            played INT NOT NULL,
+            form VARCHAR(10) NOT NULL,
+            home_form VARCHAR(10) NOT NULL,
+            away_form VARCHAR(10) NOT NULL,
+            streak VARCHAR(8) NOT NULL,
+            unbeaten INT NOT NULL,
+            home JSONB,
+            away JSONB,
+            last_results JSONB,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+        );
+    """)
+
+LEADERBOARD_STATS = {
+    'goals': ('stats', 'goals'),
+    'assists': ('stats', 'goalAssists'),
+    'appearances': ('stats', 'appearances'),
+    'minutes': ('stats', 'timePlayed'),
+    'shots': ('stats', 'totalShots'),
+    'shots_on_target': ('stats', 'shotsOnTargetIncGoals'),
+    'clean_sheets': ('stats', 'cleanSheets'),
+    'saves': ('stats', 'savesMade'),
+    'yellow_cards': ('stats', 'yellowCards'),
+    'expected_goals': ('fpl_stats', 'expected_goals'),
+    'expected_assists': ('fpl_stats', 'expected_assists'),
+    'fpl_points': ('fpl_stats', 'total_points'),
+    'fpl_form': ('fpl_stats', 'form'),
+    'fpl_ict_index': ('fpl_stats', 'ict_index'),
+    'fpl_selected_by_percent': ('fpl_stats', 'selected_by_percent'),
+}
+
+def refresh_player_stat_values(cursor, player_ids=None):
+    """
+    Rebuild the typed player_stat_values rows for the LEADERBOARD_STATS of the given players.
+    Values that are missing or not numeric in the players JSONB are left out.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+        player_ids (list): The players to refresh, or None to rebuild the whole table.
+    """
+    extract = sql.SQL(', ').join(
+        sql.SQL("({}, p.{} ->> {})").format(sql.Literal(stat), sql.Identifier(column), sql.Literal(key))
+        for stat, (column, key) in LEADERBOARD_STATS.items()
+    )
+    if player_ids is None:
+        cursor.execute("DELETE FROM player_stat_values;")
+        scope = sql.SQL("TRUE")
+    else:
+        cursor.execute("DELETE FROM player_stat_values WHERE player_id = ANY(%s);", (list(player_ids),))
+        scope = sql.SQL("p.player_id = ANY(%s)")
+    cursor.execute(sql.SQL("""
+        INSERT INTO player_stat_values (stat, player_id, value, position, team_id)
+        SELECT s.stat, p.player_id, s.raw::DOUBLE PRECISION, p.position, p.team_id
+        FROM players p
+        CROSS JOIN LATERAL (VALUES {}) AS s (stat, raw)
+        WHERE {} AND s.raw ~ '^-?[0-9]+(\\.[0-9]+)?$';
+    """).format(extract, scope), None if player_ids is None else (list(player_ids),))
+
+def create_player_stat_values_table(cursor):
+    """
+    Create player_stat_values, one typed row per (stat, player) for the LEADERBOARD_STATS, with the
+    B-tree indexes the API's /leaderboard walks in value order. Backfilled from players when empty.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS player_stat_values (
+            stat VARCHAR(64) NOT NULL,
+            player_id INT NOT NULL REFERENCES players (player_id) ON DELETE CASCADE,
+            value DOUBLE PRECISION NOT NULL,
+            position VARCHAR(50),
+            team_id INT,
+            PRIMARY KEY (stat, player_id)
+        );
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_player_stat_values_rank ON player_stat_values (stat, value DESC, player_id);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_player_stat_values_position_rank ON player_stat_values (stat, position, value DESC, player_id);")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_player_stat_values_team_rank ON player_stat_values (stat, team_id, value DESC, player_id);")
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM player_stat_values);")
+    if not cursor.fetchone()[0]:
+        refresh_player_stat_values(cursor)
+
+def create_visits_table(cursor):
+    """
+    Create the visits table the API's postgres visit sink COPYs events into.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS visits (
+            id BIGSERIAL PRIMARY KEY,
+            ts TIMESTAMP WITH TIME ZONE NOT NULL,
+            path TEXT NOT NULL,
+            method VARCHAR(10) NOT NULL,
+            ip VARCHAR(64),
+            country VARCHAR(16),
+            city TEXT,
+            region TEXT,
+            asn TEXT,
+            isp TEXT,
+            lat DOUBLE PRECISION,
+            lon DOUBLE PRECISION,
+            device VARCHAR(16),
+            os TEXT,
+            browser TEXT,
+            status INTEGER
+        );
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_visits_ts ON visits (ts);")
+
 def initialize_database():
     """
     Initialize the plDashboard database and all required tables.
@@ -88,18 +283,14 @@ def initialize_database():
                 away_team_score INT,
                 away_team_redcard INT,
                 gameweek INT,
-                venue VARCHAR(255),
-                events JSONB,
-                home_stats JSONB,
-                away_stats JSONB,
-                home_team_lineup JSONB,
-                away_team_lineup JSONB,
-                match_report TEXT
+                venue VARCHAR(255)
             );
         """)
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_completedfixtures_gameweek ON completedFixtures (gameweek);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_completedfixtures_home_team_id ON completedFixtures (home_team_id);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_completedfixtures_away_team_id ON completedFixtures (away_team_id);")
+        create_match_details_table(cursor)
+        add_fixture_status(cursor)
 
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS players (
@@ -124,6 +315,7 @@ def initialize_database():
         """)
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_players_player_name ON players (player_name);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_players_team_id ON players (team_id);")
+        create_player_stat_values_table(cursor)
 
         conn.commit()
         logger.info("Tables created or already exist.")
@@ -177,6 +369,18 @@ def initialize_database():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_weekly_standings_team_id ON weeklyStandings (team_id);")
         conn.commit()
         logger.info("Weekly standings table and indexes created or already exist.")
+
+        create_data_versions_table(cursor)
+        conn.commit()
+        logger.info("Data versions table created or already exists.")
+
+        create_visits_table(cursor)
+        conn.commit()
+        logger.info("Visits table and indexes created or already exist.")
+
+        create_team_form_table(cursor)
+        conn.commit()
+        logger.info("Team form table created or already exists.")
         
         logger.info("\n=== Database initialization completed successfully ===")
         return True
@@ -1,11 +1,49 @@
 import psycopg2
 import json
 from db.dbConn import dbConnections
+from db.setupDB import refresh_player_stat_values
 from utils.logger import Logger
 
 db = dbConnections()
 logger = Logger(__name__).get()
 
+def bump_data_version(cursor, name):
+    """
+    Increments the version of a table in data_versions as part of the caller's transaction.
+    The API derives ETags, Last-Modified and cache invalidation from these rows.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+        name (str): The table whose data changed.
+    """
+    cursor.execute("""
+        INSERT INTO data_versions (name, version, updated_at)
+        VALUES (%s, 1, NOW())
+        ON CONFLICT (name) DO UPDATE SET
+            version = data_versions.version + 1,
+            updated_at = NOW();
+    """, (name,))
+
+def set_fixture_statuses(cursor, statuses):
+    """
+    Moves fixtures along their lifecycle (scheduled -> live -> finished, scheduled -> postponed)
+    as part of the caller's transaction. Finished fixtures are never moved again.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+        statuses (dict): Match ID -> new status.
+    Returns:
+        int: The number of fixtures whose status changed.
+    """
+    if not statuses:
+        return 0
+    cursor.execute("""
+        UPDATE fixtures AS f SET status = s.status
+        FROM unnest(%s::int[], %s::varchar[]) AS s (match_id, status)
+        WHERE f.match_id = s.match_id
+          AND f.status <> 'finished'
+          AND f.status <> s.status;
+    """, (list(statuses.keys()), list(statuses.values())))
+    return cursor.rowcount
+
 class uploadDb:
     def __init__(self):
         self.conn = db.connect_db()
@@ -32,13 +70,23 @@ class uploadDb:
                 """, (
                     team['id'], team['name'], team['short_name'], team['abbr'], team['stadium'], team['fplID'], json.dumps(team['fplData']), json.dumps(team['stats'])
                 ))
+            bump_data_version(cursor, 'teams')
             self.conn.commit()
             logger.info(f"Successfully uploaded {len(teams_data)} team records.")
         except psycopg2.Error as e:
             logger.error(f"Error uploading teams data: {e}")
             self.conn.rollback()
     
-    def upload_completed_fixtures_data(self, matches_data):
+    def upload_completed_fixtures_data(self, matches_data, statuses=None):
+        """
+        Upserts finished matches and, in the same transaction, the fixture statuses observed
+        while fetching them, so a fixture is only marked finished once its result is stored.
+        Rows left from matches that are live again are removed; the completedfixtures
+        version is only bumped when rows were written or removed.
+        Args:
+            matches_data (list): Match dicts as returned by getMatchData / init_FetchFixtures.
+            statuses (dict): Optional match ID -> new fixtures.status.
+        """
         logger.info(f"Attempting to upload {len(matches_data)} completed match records.")
         if not self.conn:
             logger.error("No database connection. Skipping completed fixtures data upload.")
@@ -50,10 +98,9 @@ class uploadDb:
                     INSERT INTO completedFixtures (
                         match_id, kickoff_timezone, kickoff_time, home_team_id, home_team_name, home_team_abbr,
                         home_team_score, home_team_redcard, away_team_id, away_team_name, away_team_abbr,
-                        away_team_score, away_team_redcard, gameweek, venue, events, home_stats, away_stats,
-                        home_team_lineup, away_team_lineup, match_report
+                        away_team_score, away_team_redcard, gameweek, venue
                     )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                     ON CONFLICT (match_id) DO UPDATE SET
                         kickoff_timezone = EXCLUDED.kickoff_timezone,
                         kickoff_time = EXCLUDED.kickoff_time,
@@ -68,7 +115,22 @@ class uploadDb:
                         away_team_score = EXCLUDED.away_team_score,
                         away_team_redcard = EXCLUDED.away_team_redcard,
                         gameweek = EXCLUDED.gameweek,
-                        venue = EXCLUDED.venue,
+                        venue = EXCLUDED.venue;
+                """, (
+                    match['matchId'], match['kickoffTimezone'], match['kickoffTime'],
+                    match['homeTeamId'], match['homeTeamName'], match['homeTeamAbbr'],
+                    match['homeTeamScore'], match['homeTeamRedcard'],
+                    match['awayTeamId'], match['awayTeamName'], match['awayTeamAbbr'],
+                    match['awayTeamScore'], match['awayTeamRedcard'],
+                    match['gameweek'], match['venue']
+                ))
+                # Heavy per-match data lives in matchDetails so list scans of completedFixtures stay small
+                cursor.execute("""
+                    INSERT INTO matchDetails (
+                        match_id, events, home_stats, away_stats, home_team_lineup, away_team_lineup, match_report
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (match_id) DO UPDATE SET
                         events = EXCLUDED.events,
                         home_stats = EXCLUDED.home_stats,
                         away_stats = EXCLUDED.away_stats,
@@ -76,18 +138,26 @@ class uploadDb:
                         away_team_lineup = EXCLUDED.away_team_lineup,
                         match_report = EXCLUDED.match_report;
                 """, (
-                    match['matchId'], match['kickoffTimezone'], match['kickoffTime'],
-                    match['homeTeamId'], match['homeTeamName'], match['homeTeamAbbr'],
-                    match['homeTeamScore'], match['homeTeamRedcard'],
-                    match['awayTeamId'], match['awayTeamName'], match['awayTeamAbbr'],
-                    match['awayTeamScore'], match['awayTeamRedcard'],
-                    match['gameweek'], match['venue'], json.dumps(match['events']), 
+                    match['matchId'], json.dumps(match['events']),
                     json.dumps(match['homeStats']), json.dumps(match['awayStats']),
                     json.dumps(match['homeTeamLineup']), json.dumps(match['awayTeamLineup']),
                     match['matchReport']
                 ))
+            # A result stored while its match was still in play is not final; drop it until the match finishes
+            live = [match_id for match_id, status in (statuses or {}).items() if status == 'live']
+            removed = 0
+            if live:
+                cursor.execute("DELETE FROM completedFixtures WHERE match_id = ANY(%s);", (live,))
+                removed = cursor.rowcount
+            if matches_data or removed:
+                bump_data_version(cursor, 'completedfixtures')
+            changed = set_fixture_statuses(cursor, statuses)
+            if changed:
+                bump_data_version(cursor, 'fixtures')
             self.conn.commit()
             logger.info(f"Successfully uploaded {len(matches_data)} completed match records.")
+            if statuses:
+                logger.info(f"Updated the status of {changed} fixtures.")
         except psycopg2.Error as e:
             logger.error(f"Error uploading completed fixtures data: {e}")
             self.conn.rollback()
@@ -131,6 +201,8 @@ class uploadDb:
                     player['height'], player['weight'], player['preferredFoot'], player['shirtNum'], json.dumps(player['stats']),
                     player.get('fplID'), json.dumps(player.get('fplStats'))
                 ))
+            refresh_player_stat_values(cursor, [player['playerId'] for player in player_data])
+            bump_data_version(cursor, 'players')
             self.conn.commit()
             logger.info(f"Successfully uploaded {len(player_data)} player records.")
         except psycopg2.Error as e:
@@ -148,9 +220,9 @@ class uploadDb:
                 cursor.execute("""
                     INSERT INTO fixtures (
                         match_id, kickoff_timezone, kickoff_time, home_team_id, home_team_name, home_team_abbr,
-                        away_team_id, away_team_name, away_team_abbr, gameweek, venue
+                        away_team_id, away_team_name, away_team_abbr, gameweek, venue, status
                     )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                     ON CONFLICT (match_id) DO UPDATE SET
                         kickoff_timezone = EXCLUDED.kickoff_timezone,
                         kickoff_time = EXCLUDED.kickoff_time,
@@ -161,13 +233,25 @@ class uploadDb:
                         away_team_name = EXCLUDED.away_team_name,
                         away_team_abbr = EXCLUDED.away_team_abbr,
                         gameweek = EXCLUDED.gameweek,
-                        venue = EXCLUDED.venue;
+                        venue = EXCLUDED.venue,
+                        status = CASE
+                            WHEN fixtures.status = 'finished' THEN fixtures.status
+                            -- only the completed-fixtures upload may finish a fixture, once its result is stored
+                            WHEN EXCLUDED.status = 'finished' AND NOT EXISTS (
+                                SELECT 1 FROM completedFixtures c WHERE c.match_id = fixtures.match_id
+                            ) THEN fixtures.status
+                            -- a postponed fixture only becomes scheduled again once it gets a new kickoff
+                            WHEN fixtures.status = 'postponed' AND EXCLUDED.status = 'scheduled'
+                                 AND EXCLUDED.kickoff_time IS NOT DISTINCT FROM fixtures.kickoff_time THEN fixtures.status
+                            ELSE EXCLUDED.status
+                        END;
                 """, (
                     fixture['matchId'], fixture['kickoffTimezone'], fixture['kickoffTime'],
                     fixture['homeTeamId'], fixture['homeTeamName'], fixture['homeTeamAbbr'],
                     fixture['awayTeamId'], fixture['awayTeamName'], fixture['awayTeamAbbr'],
-                    fixture['gameweek'], fixture['venue']
+                    fixture['gameweek'], fixture['venue'], fixture.get('status', 'scheduled')
                 ))
+            bump_data_version(cursor, 'fixtures')
             self.conn.commit()
             logger.info(f"Successfully uploaded {len(schedule_data)} schedule records.")
         except psycopg2.Error as e:
@@ -216,8 +300,9 @@ class uploadDb:
                     json.dumps(team_standing['away'])
                 ))
             
+            bump_data_version(cursor, 'standings')
             self.conn.commit()
             logger.info(f"Successfully updated standings table with {len(standings_list)} teams")
         except Exception as e:
             logger.error(f"Error updating standings table: {e}")
-            self.conn.rollback()
\ No newline at end of file
+            self.conn.rollback()
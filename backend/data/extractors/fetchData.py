@@ -288,6 +288,43 @@ def fetchMatchReport(matchID):
         logger.error(f"Error fetching match report for match ID {matchID}: {e}")
         return ""
 
+def fixtureStatus(period):
+    """
+    Maps a match's API period onto the fixtures.status lifecycle.
+    Args:
+        str: period: The match period reported by the API (PreMatch, FirstHalf, ..., FullTime).
+    Returns:
+        str: 'scheduled', 'live' or 'finished'. 'postponed' is decided by the pipeline.
+    """
+    if period == 'PreMatch':
+        return 'scheduled'
+    if period == 'FullTime':
+        return 'finished'
+    return 'live'
+
+def scheduleRecord(game):
+    """
+    Builds a fixtures row from a match in the /v2/matches listing.
+    Args:
+        dict: game: A match as returned by the matches endpoint.
+    Returns:
+        dict: The schedule fields of the match and its status.
+    """
+    return {
+        'matchId': game['matchId'],
+        'kickoffTimezone': game['kickoffTimezoneString'],
+        'kickoffTime': game['kickoff'],
+        'homeTeamId': game['homeTeam']['id'],
+        'homeTeamName': game['homeTeam']['name'],
+        'homeTeamAbbr': game['homeTeam']['abbr'],
+        'awayTeamId': game['awayTeam']['id'],
+        'awayTeamName': game['awayTeam']['name'],
+        'awayTeamAbbr': game['awayTeam']['abbr'],
+        'gameweek': game['matchWeek'],
+        'venue': game['ground'],
+        'status': fixtureStatus(game['period'])
+    }
+
 class fetchData:
     def __init__(self):
         self.API_BASE = API_BASE
@@ -315,21 +352,8 @@ class fetchData:
                 response.raise_for_status()
                 data = response.json()
                 for game in data['data']:
-                    fixture_data = {
-                        'matchId': game['matchId'],
-                        'kickoffTimezone': game['kickoffTimezoneString'],
-                        'kickoffTime': game['kickoff'],
-                        'homeTeamId': game['homeTeam']['id'],
-                        'homeTeamName': game['homeTeam']['name'],
-                        'homeTeamAbbr': game['homeTeam']['abbr'],
-                        'awayTeamId': game['awayTeam']['id'],
-                        'awayTeamName': game['awayTeam']['name'],
-                        'awayTeamAbbr': game['awayTeam']['abbr'],
-                        'gameweek': game['matchWeek'],
-                        'venue': game['ground']
-                    }
-                    fixtures.append(fixture_data)
-                    if game['period'] != 'PreMatch':
+                    fixtures.append(scheduleRecord(game))
+                    if fixtureStatus(game['period']) == 'finished':
                         match_events = getMatchEvents(game['matchId'])
                         match_stats_url = f"{self.API_BASE}/v3/matches/{game['matchId']}/stats"
                         match_stats_response = requests.get(match_stats_url).json()
@@ -507,11 +531,40 @@ class fetchData:
             return []
             
     # UPDATE METHODS
+    def fetchSchedule(self):
+        """
+        Fetches the season's fixture list without any per-match data, so the update can pick up
+        rescheduled kickoff times (and bring postponed fixtures back) without re-running init.
+        Returns:
+            list: Fixture records as built by scheduleRecord.
+        """
+        logger.info("Fetching the fixture schedule.")
+        fixtures = []
+        matches_url = f"{self.API_BASE}/v2/matches?competition=8&season=2025&_limit=100"
+        while matches_url:
+            try:
+                response = requests.get(matches_url)
+                response.raise_for_status()
+                data = response.json()
+                fixtures.extend(scheduleRecord(game) for game in data['data'])
+                next_page_token = data['pagination']['_next']
+                if next_page_token:
+                    matches_url = f"{self.API_BASE}/v2/matches?competition=8&season=2025&_limit=100&_next={next_page_token}"
+                else:
+                    matches_url = None
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Error fetching the fixture schedule from {matches_url}: {e}")
+                matches_url = None
+        logger.info(f"Fetched {len(fixtures)} fixtures from the schedule.")
+        return fixtures
+
     def recentlyCompletedGames(self):
         """
-        Fetches recently completed games from the database.
+        Fetches fixtures that have kicked off but are not finished yet (status scheduled, live or
+        postponed), using the partial (status, kickoff_time) index instead of diffing against
+        completedFixtures. Postponed fixtures are re-checked in case they were played at the old kickoff.
         Returns:
-            list: A list of tuples containing match ID, home team ID, and away team ID.
+            list: A list of tuples containing match ID, home team ID, away team ID and kickoff time.
         """
         logger.info("Fetching recently completed games from the database.")
         if not self.conn:
@@ -520,10 +573,9 @@ class fetchData:
         cursor = self.conn.cursor()
         try:
             cursor.execute("""
-                SELECT match_id, home_team_id, away_team_id FROM fixtures
-                WHERE kickoff_time <= NOW() AT TIME ZONE kickoff_timezone
-                EXCEPT
-                SELECT match_id, home_team_id, away_team_id FROM completedFixtures;
+                SELECT match_id, home_team_id, away_team_id, kickoff_time FROM fixtures
+                WHERE status IN ('scheduled', 'live', 'postponed') AND kickoff_time <= NOW()
+                ORDER BY kickoff_time;
             """)
             games = cursor.fetchall()
             self.logger.info(f"Fetched {len(games)} recently completed games.")
@@ -538,7 +590,8 @@ class fetchData:
         Args:
             match_id (int): The ID of the match.
         Returns:
-            dict: A dictionary containing fixture data.
+            dict: A dictionary containing fixture data and the match 'period'; only matchId and
+            period for a match still in PreMatch, and empty if the request failed.
         """
         fixture_url = f"{self.API_BASE}/v2/matches/{match_id}"
         try:
@@ -576,12 +629,13 @@ class fetchData:
                     'awayStats': away_stats,
                     'homeTeamLineup' : home_lineup,
                     'awayTeamLineup' : away_lineup,
-                    'matchReport' : match_report
+                    'matchReport' : match_report,
+                    'period': game['period']
                 }
                 return game_data
             else:
                 self.logger.info(f"Match ID {match_id} is still in PreMatch period. Match not finished yet.")
-                return {}
+                return {'matchId': game['matchId'], 'period': game['period']}
             
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Error fetching fixture data for match ID {match_id}: {e}")
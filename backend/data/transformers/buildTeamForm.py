@@ -0,0 +1,157 @@
+import json
+from db.dbConn import dbConnections
+from db.uploadToDb import bump_data_version
+from utils.logger import Logger
+
+logger = Logger(__name__).get()
+
+FORM_LENGTH = 5
+
+def get_finished_results(cursor):
+    """
+    Retrieve the scoreline of every finished match, most recent first.
+    Matches the pipeline has only seen live are left out.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+    Returns:
+        list: A list of tuples (match_id, gameweek, kickoff_time, home id/name/abbr/score, away id/name/abbr/score).
+    """
+    cursor.execute("""
+        SELECT c.match_id, c.gameweek, c.kickoff_time,
+               c.home_team_id, c.home_team_name, c.home_team_abbr, c.home_team_score,
+               c.away_team_id, c.away_team_name, c.away_team_abbr, c.away_team_score
+        FROM completedFixtures c
+        WHERE c.home_team_score IS NOT NULL AND c.away_team_score IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM fixtures f WHERE f.match_id = c.match_id AND f.status = 'live')
+        ORDER BY c.kickoff_time DESC, c.match_id DESC;
+    """)
+    return cursor.fetchall()
+
+def _result(goals_for, goals_against):
+    if goals_for > goals_against:
+        return 'W'
+    if goals_for == goals_against:
+        return 'D'
+    return 'L'
+
+def _empty_split():
+    return {'played': 0, 'won': 0, 'drawn': 0, 'lost': 0, 'goalsFor': 0, 'goalsAgainst': 0, 'points': 0}
+
+def calculate_team_form(results, form_length=FORM_LENGTH):
+    """
+    Derive form strings, home/away splits, streaks and the last results for every team.
+    Args:
+        results (list): Finished matches, most recent first (see get_finished_results).
+        form_length (int): How many matches the form strings and last_results cover.
+    Returns:
+        list: A list of dictionaries, one per team, ordered by team ID.
+    """
+    teams = {}
+    for match_id, gameweek, kickoff_time, h_id, h_name, h_abbr, h_score, a_id, a_name, a_abbr, a_score in results:
+        for side, team_id, name, abbr, goals_for, opp_id, opp_abbr, goals_against in (
+            ('home', h_id, h_name, h_abbr, h_score, a_id, a_abbr, a_score),
+            ('away', a_id, a_name, a_abbr, a_score, h_id, h_abbr, h_score),
+        ):
+            team = teams.setdefault(team_id, {
+                'team_id': team_id, 'team_name': name, 'team_abbr': abbr,
+                'results': [], 'home': _empty_split(), 'away': _empty_split(),
+                'last_results': [],
+            })
+            result = _result(goals_for, goals_against)
+            team['results'].append((side, result))
+            split = team[side]
+            split['played'] += 1
+            split[{'W': 'won', 'D': 'drawn', 'L': 'lost'}[result]] += 1
+            split['goalsFor'] += goals_for
+            split['goalsAgainst'] += goals_against
+            split['points'] += {'W': 3, 'D': 1, 'L': 0}[result]
+            if len(team['last_results']) < form_length:
+                team['last_results'].append({
+                    'match_id': match_id,
+                    'gameweek': gameweek,
+                    'kickoff_time': kickoff_time.isoformat() if kickoff_time else None,
+                    'side': side,
+                    'opponent_id': opp_id,
+                    'opponent_abbr': opp_abbr,
+                    'goals_for': goals_for,
+                    'goals_against': goals_against,
+                    'result': result,
+                })
+
+    form_rows = []
+    for team_id in sorted(teams):
+        team = teams[team_id]
+        sequence = [result for _, result in team['results']]
+        streak = 0
+        while streak < len(sequence) and sequence[streak] == sequence[0]:
+            streak += 1
+        unbeaten = 0
+        while unbeaten < len(sequence) and sequence[unbeaten] != 'L':
+            unbeaten += 1
+        form_rows.append({
+            'team_id': team_id,
+            'team_name': team['team_name'],
+            'team_abbr': team['team_abbr'],
+            'played': len(sequence),
+            'form': ''.join(sequence[:form_length]),
+            'home_form': ''.join(r for s, r in team['results'] if s == 'home')[:form_length],
+            'away_form': ''.join(r for s, r in team['results'] if s == 'away')[:form_length],
+            'streak': f"{sequence[0]}{streak}" if sequence else '',
+            'unbeaten': unbeaten,
+            'home': team['home'],
+            'away': team['away'],
+            'last_results': team['last_results'],
+        })
+    return form_rows
+
+def upload_team_form(cursor, form_rows):
+    """
+    Replace the contents of teamForm with freshly calculated rows.
+    Args:
+        cursor: An open cursor on the plDashboard database.
+        form_rows (list): Rows from calculate_team_form.
+    """
+    cursor.execute("DELETE FROM teamForm;")
+    for row in form_rows:
+        cursor.execute("""
+            INSERT INTO teamForm (
+                team_id, team_name, team_abbr, played, form, home_form, away_form,
+                streak, unbeaten, home, away, last_results, updated_at
+            )
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW());
+        """, (
+            row['team_id'], row['team_name'], row['team_abbr'], row['played'],
+            row['form'], row['home_form'], row['away_form'], row['streak'], row['unbeaten'],
+            json.dumps(row['home']), json.dumps(row['away']), json.dumps(row['last_results'])
+        ))
+    bump_data_version(cursor, 'teamform')
+
+def buildTeamForm():
+    """
+    Precompute every team's form into the teamForm table served by the API's /teamForm.
+    """
+    logger.info("Building team form table...")
+    db = dbConnections()
+    conn = db.connect_db()
+    if not conn:
+        logger.error("No database connection. Skipping team form build.")
+        return
+    cursor = conn.cursor()
+    try:
+        form_rows = calculate_team_form(get_finished_results(cursor))
+        upload_team_form(cursor, form_rows)
+        conn.commit()
+        logger.info(f"Successfully built team form for {len(form_rows)} teams.")
+    except Exception as e:
+        logger.error(f"Error building team form table: {e}")
+        conn.rollback()
+    finally:
+        cursor.close()
+        db.close_db_connection()
+
+def main():
+    """Main entry point for building the team form table."""
+    buildTeamForm()
+
+if __name__ == "__main__":
+    main()
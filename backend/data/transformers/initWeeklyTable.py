@@ -1,4 +1,5 @@
 from db.dbConn import dbConnections
+from db.uploadToDb import bump_data_version
 from utils.logger import Logger
 
 logger = Logger(__name__).get()
@@ -224,6 +225,15 @@ def buildWeeklyTable():
     for gameweek in range(1, current_gameweek + 1):
         standings = calculate_standings_for_gameweek(gameweek)
         upload_weekly_standings(gameweek, standings)
+
+    try:
+        cursor, conn = _get_cursor()
+        bump_data_version(cursor, 'weeklystandings')
+        conn.commit()
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        logger.error(f"Error recording weekly standings data version: {e}")
     
     logger.info(f"Successfully built weekly standings for gameweeks 1 to {current_gameweek}.")
     # db.close_db_connection()
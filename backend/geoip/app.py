@@ -1,10 +1,13 @@
 # fastapi geo microservice using DB-IP *.mmdb (city+asn)
+from typing import List
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 import maxminddb, ipaddress, os
 
 CITY_DB = os.getenv("CITY_DB", "/data/dbip-city.mmdb")
 ASN_DB  = os.getenv("ASN_DB",  "/data/dbip-asn.mmdb")
+MAX_BATCH = int(os.getenv("MAX_BATCH", "1000"))
 
 app = FastAPI(title="geoip", version="1.0.0")
 
@@ -33,17 +36,9 @@ def health():
     ok = bool(city_reader)
     return {"ok": ok, "city_db": bool(city_reader), "asn_db": bool(asn_reader)}
 
-@app.get("/lookup")
-def lookup(ip: str):
-    try:
-        ipaddress.ip_address(ip)
-    except ValueError:
-        raise HTTPException(400, "invalid ip")
-    if not city_reader:
-        raise HTTPException(503, "city db not loaded")
-
-    city = city_reader.get(ip) or {}
-    asn  = asn_reader.get(ip)  if asn_reader else {}
+def _record(ip, city, asn):
+    city = city or {}
+    asn  = asn or {}
 
     country      = (city.get("country") or {}).get("iso_code") or "UNKNOWN"
     country_name = (city.get("country") or {}).get("names", {}).get("en")
@@ -58,7 +53,7 @@ def lookup(ip: str):
     asn_num = asn.get("autonomous_system_number")
     as_org  = asn.get("autonomous_system_organization")
 
-    return JSONResponse({
+    return {
         "ip": ip,
         "country": country or "UNKNOWN",
         "country_name": country_name,
@@ -68,4 +63,39 @@ def lookup(ip: str):
         "longitude": lon,
         "asn": asn_num,
         "as_org": as_org,
-    })
+    }
+
+@app.get("/lookup")
+def lookup(ip: str):
+    try:
+        ipaddress.ip_address(ip)
+    except ValueError:
+        raise HTTPException(400, "invalid ip")
+    if not city_reader:
+        raise HTTPException(503, "city db not loaded")
+
+    city = city_reader.get(ip)
+    asn  = asn_reader.get(ip) if asn_reader else None
+    return JSONResponse(_record(ip, city, asn))
+
+class BatchLookup(BaseModel):
+    ips: List[str]
+
+@app.post("/lookup/batch")
+def lookup_batch(body: BatchLookup):
+    if not city_reader:
+        raise HTTPException(503, "city db not loaded")
+    if len(body.ips) > MAX_BATCH:
+        raise HTTPException(413, f"at most {MAX_BATCH} ips per batch")
+
+    city_get = city_reader.get
+    asn_get  = asn_reader.get if asn_reader else (lambda _ip: None)
+    results = []
+    for ip in body.ips:
+        try:
+            ipaddress.ip_address(ip)
+        except ValueError:
+            results.append({"ip": ip, "error": "invalid ip"})
+            continue
+        results.append(_record(ip, city_get(ip), asn_get(ip)))
+    return JSONResponse({"results": results})
@@ -1,6 +1,6 @@
 import { useQuery } from '@tanstack/react-query';
 import { api } from './client';
-import type { Standing, CompletedFixture, Fixture, Team, Player, WeeklyStanding } from './types';
+import type { Standing, CompletedFixture, CompletedFixtureWithStats, MatchDetails, Fixture, Team, Player, WeeklyStanding, TeamForm, FPLPlayer } from './types';
 
 export const useStandings = () => {
     return useQuery({
@@ -29,13 +29,29 @@ export const useCompletedMatchesByTeam = (teamId: number | string | undefined) =
         queryKey: ['completedMatchesByTeam', teamId],
         queryFn: async () => {
             if (!teamId) return [];
-            const { data } = await api.get<CompletedFixture[]>(`/completedGamebyTeamId/${teamId}`);
+            // Summary rows plus each side's match stats (for the xG trend)
+            const { data } = await api.get<CompletedFixtureWithStats[]>(`/completedGamebyTeamId/${teamId}`, {
+                params: { include: 'stats' },
+            });
             return data;
         },
         enabled: !!teamId,
     });
 };
 
+// Events, stats, lineups and report of one completed match
+export const useMatchDetails = (matchId: number | string | undefined) => {
+    return useQuery({
+        queryKey: ['matchDetails', matchId],
+        queryFn: async () => {
+            const { data } = await api.get<MatchDetails>(`/matchDetails/${matchId}`);
+            return data;
+        },
+        enabled: !!matchId,
+        retry: false,
+    });
+};
+
 export const useUpcomingFixtures = () => {
     return useQuery({
         queryKey: ['upcomingFixtures'],
@@ -46,48 +62,39 @@ export const useUpcomingFixtures = () => {
     });
 };
 
-// Helper to compute form (last 5 matches)
-// Returns a map of teamId -> string[] (e.g. ['W', 'D', 'L', ...])
+// Last-5 form per team, precomputed by the data pipeline (/teamForm)
+// Returns a map of teamId -> string[] (e.g. ['W', 'D', 'L', ...]), most recent first
 export const useTeamForm = () => {
-    const { data: fixtures } = useCompletedFixtures();
+    const { data: forms } = useQuery({
+        queryKey: ['teamForm'],
+        queryFn: async () => {
+            const { data } = await api.get<Pick<TeamForm, 'team_id' | 'form'>[]>('/teamForm', {
+                params: { fields: 'team_id,form' },
+            });
+            return data;
+        },
+    });
 
-    if (!fixtures) return {};
+    if (!forms) return {};
 
     const teamForm: Record<number, string[]> = {};
-
-    // Sort fixtures by gameweek/date desc
-    const sorted = [...fixtures].sort((a, b) =>
-        new Date(b.kickoff_time).getTime() - new Date(a.kickoff_time).getTime()
-    );
-
-    sorted.forEach(match => {
-        // Process Home Team
-        if (!teamForm[match.home_team_id]) teamForm[match.home_team_id] = [];
-        if (teamForm[match.home_team_id].length < 5) {
-            if (match.home_team_score > match.away_team_score) teamForm[match.home_team_id].push('W');
-            else if (match.home_team_score === match.away_team_score) teamForm[match.home_team_id].push('D');
-            else teamForm[match.home_team_id].push('L');
-        }
-
-        // Process Away Team
-        if (!teamForm[match.away_team_id]) teamForm[match.away_team_id] = [];
-        if (teamForm[match.away_team_id].length < 5) {
-            if (match.away_team_score > match.home_team_score) teamForm[match.away_team_id].push('W');
-            else if (match.away_team_score === match.home_team_score) teamForm[match.away_team_id].push('D');
-            else teamForm[match.away_team_id].push('L');
-        }
+    forms.forEach(row => {
+        teamForm[row.team_id] = row.form.split('');
     });
-
-    // Reverse to show oldest -> newest (Left to Right) or keep Newest -> Oldest? 
-    // Standard is usually Left=Newest or Left=Oldest? 
-    // Flashscore: Left is most recent. Wait, no. usually reading L->R is sequence. 
-    // Let's store as [MostRecent, ..., Oldest] then reverse for display if needed.
-    // Actually, standard is usually: [Oldest ... Newest]. 
-    // My loop pushes Most Recent first. So [Recent, ..., Old].
-
     return teamForm;
 };
 
+// FPL metrics per player, derived server-side; sorted by total points
+export const useFPLPlayers = () => {
+    return useQuery({
+        queryKey: ['fplPlayers'],
+        queryFn: async () => {
+            const { data } = await api.get<FPLPlayer[]>('/fplPlayers');
+            return data;
+        },
+    });
+};
+
 export const useUpcomingGameweek = () => {
     return useQuery({
         queryKey: ['upcomingGameweek'],
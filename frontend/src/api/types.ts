@@ -27,6 +27,34 @@ export interface StandingSplit {
     position: number;
 }
 
+export interface TeamFormResult {
+    match_id: number;
+    gameweek: number;
+    kickoff_time: string; // ISO string
+    side: 'home' | 'away';
+    opponent_id: number;
+    opponent_abbr: string;
+    goals_for: number;
+    goals_against: number;
+    result: 'W' | 'D' | 'L';
+}
+
+export interface TeamForm {
+    team_id: number;
+    team_name: string;
+    team_abbr: string;
+    played: number;
+    form: string; // last 5 results, most recent first, e.g. "WWDLW"
+    home_form: string;
+    away_form: string;
+    streak: string; // current run, e.g. "W3"
+    unbeaten: number;
+    home: Omit<StandingSplit, 'position'>;
+    away: Omit<StandingSplit, 'position'>;
+    last_results: TeamFormResult[];
+    updated_at: string;
+}
+
 export interface Fixture {
     match_id: number;
     kickoff_time: string; // ISO string
@@ -41,11 +69,17 @@ export interface Fixture {
     away_team_abbr: string;
 }
 
+// Scoreline summary returned by /completedFixtures and /completedGamebyTeamId
 export interface CompletedFixture extends Fixture {
     home_team_score: number;
     away_team_score: number;
     home_team_redcard: number;
     away_team_redcard: number;
+}
+
+// Heavy per-match data, fetched lazily from /matchDetails/<id>
+export interface MatchDetails {
+    match_id: number;
     home_stats: TeamMatchStats;
     away_stats: TeamMatchStats;
     events: MatchEvents;
@@ -54,6 +88,11 @@ export interface CompletedFixture extends Fixture {
     match_report: string;
 }
 
+export type CompletedMatch = CompletedFixture & MatchDetails;
+
+// /completedGamebyTeamId/<id>?include=stats
+export type CompletedFixtureWithStats = CompletedFixture & Pick<MatchDetails, 'home_stats' | 'away_stats'>;
+
 export interface TeamLineup {
     teamId: number;
     lineup: string[][];
@@ -304,6 +343,45 @@ export interface Player {
     }
 }
 
+// Slim player row from /fplPlayers; metrics are derived server-side
+export interface FPLPlayer {
+    player_id: number;
+    player_name: string;
+    position: string;
+    team_id: number;
+    team_name: string;
+    team_abbr: string;
+
+    derived: {
+        now_cost: number; // Scaled (e.g., 105 -> 10.5)
+        total_points: number;
+        points_per_game: number;
+        points_per_90: number;
+        last_gameweek_points: number; // Actual event points
+
+        form: number; // Last 30 days avg
+        ict_index: number;
+
+        selected_by_percent: number;
+        minutes_per_game: number;
+
+        value_season: number; // Points per million
+        value_form: number;   // Form per million
+        performance_index: number; // Form * 0.6 + PPG * 0.4
+
+        // Context
+        next_opponent_id: number | null;
+        next_opponent_name: string | null;
+        next_opponent_abbr: string | null;
+        next_opponent_difficulty: number; // 1-5 Scale
+
+        // Availability
+        is_available: boolean;
+        chance_of_playing: number;
+        news: string;
+    };
+}
+
 export interface WeeklyStanding {
     gameweek: number;
     team_name: string;
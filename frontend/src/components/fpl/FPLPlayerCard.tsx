@@ -39,7 +39,7 @@ export const FPLPlayerCard: React.FC<Props> = ({ player }) => {
             {!player.derived.is_available && (
                 <div className="bg-red-50 border border-red-100 text-red-700 p-3 rounded-xl mb-6 text-sm font-bold flex items-center gap-2">
                     <span>⚠️</span>
-                    {player.fpl_stats?.news || "Player unavailable"}
+                    {player.derived.news || "Player unavailable"}
                 </div>
             )}
 
@@ -4,12 +4,12 @@ import { motion, useScroll, useTransform } from 'framer-motion';
 import { ArrowLeft, Calendar, Clock, ArrowRightLeft, MapPin, Users } from 'lucide-react';
 import { ResponsiveContainer, RadarChart, PolarGrid, PolarAngleAxis, PolarRadiusAxis, Radar, Legend } from 'recharts';
 import clsx from 'clsx';
-import { useCompletedFixtures, useUpcomingFixtures, usePlayers } from '../api/queries';
+import { useCompletedFixtures, useUpcomingFixtures, usePlayers, useMatchDetails } from '../api/queries';
 import { PlayerName } from '../components/players/PlayerName';
 import { getTeamLogoUrl } from '../utils/teamLogos';
 import { format } from 'date-fns';
 import { Navbar } from '../components/layout/Navbar';
-import type { CompletedFixture, Fixture, Player } from '../api/types';
+import type { CompletedMatch, Fixture, Player } from '../api/types';
 
 // Moved outside component to avoid re-creation on render
 const StatRow = ({ label, homeValue, awayValue, total, isPercentage = false }: { label: string, homeValue: number, awayValue: number, total?: number, isPercentage?: boolean }) => {
@@ -94,16 +94,22 @@ export const MatchDetailsPage: React.FC = () => {
     const contentY = useTransform(scrollY, [0, 400], [0, -50]);
 
     // 1. Find Match (Check both lists)
-    const match = useMemo(() => {
+    const completedSummary = useMemo(
+        () => (id ? completedFixtures?.find(f => f.match_id.toString() === id) : undefined),
+        [completedFixtures, id]
+    );
+    // The list only carries the scoreline; events, stats, lineups and report are loaded separately
+    const { data: details, isLoading: loadingDetails } = useMatchDetails(completedSummary ? id : undefined);
+
+    const match = useMemo((): CompletedMatch | Fixture | null => {
         if (!id) return null;
-        const comp = completedFixtures?.find(f => f.match_id.toString() === id);
-        if (comp) return comp;
+        if (completedSummary && details) return { ...completedSummary, ...details };
         const upc = upcomingFixtures?.find(f => f.match_id.toString() === id);
         return upc || null;
-    }, [completedFixtures, upcomingFixtures, id]);
+    }, [completedSummary, details, upcomingFixtures, id]);
 
     // 2. Identify Type using Type Guard
-    const isCompleted = (m: Fixture | CompletedFixture): m is CompletedFixture => {
+    const isCompleted = (m: Fixture | CompletedMatch): m is CompletedMatch => {
         return 'home_team_score' in m;
     };
 
@@ -148,7 +154,7 @@ export const MatchDetailsPage: React.FC = () => {
         return playerMap[numId] || `Player ${id}`;
     };
 
-    if (loadingCompleted || loadingUpcoming) return <div className="min-h-screen flex items-center justify-center text-slate-500">Loading match details...</div>;
+    if (loadingCompleted || loadingUpcoming || loadingDetails) return <div className="min-h-screen flex items-center justify-center text-slate-500">Loading match details...</div>;
     if (!match) return <div className="min-h-screen flex items-center justify-center text-slate-500">Match not found.</div>;
 
     const events: { time: number, timeStr: string, type: 'goal' | 'card' | 'sub', player: string, playerId: string | number, team: 'home' | 'away', detail?: string }[] = [];
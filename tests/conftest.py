@@ -0,0 +1,41 @@
+"""
+Shared setup for the API tests: quiet defaults for the settings app.py reads
+at import time, backend/api on sys.path, and a steppable clock.
+"""
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("VISIT_SINK", "none")
+os.environ.setdefault("LOG_JSON", "false")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "api"))
+
+
+class FakeClock:
+    """Stands in for the time module inside app so TTLs and refills can be stepped."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import app
+
+    fake = FakeClock()
+    monkeypatch.setattr(app, "time", fake)
+    return fake
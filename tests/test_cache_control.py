@@ -0,0 +1,17 @@
+"""
+Offline unit tests for the Cache-Control policy
+"""
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize("until, expected", [
+    (100000, "public, max-age=300, s-maxage=86400, stale-while-revalidate=600"),
+    (86700, "public, max-age=300, s-maxage=86400, stale-while-revalidate=300"),
+    (1000, "public, max-age=300, s-maxage=1000"),
+])
+def test_cache_control_ends_the_stale_window_by_the_next_refresh(monkeypatch, until, expected):
+    monkeypatch.setattr(app, "_refresh_window", lambda now: (7200, until))
+    monkeypatch.setattr(app, "_match_in_progress", lambda now: False)
+    assert app._cache_control("nightly") == expected
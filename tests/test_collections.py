@@ -0,0 +1,29 @@
+"""
+Offline unit tests for collection argument parsing (cursors and multi-get ids)
+"""
+import pytest
+from werkzeug.exceptions import BadRequest
+
+import app
+
+
+def test_parse_after_checks_values_against_key_types():
+    spec = app.COLLECTIONS["weeklystandings"]
+    assert app._parse_after(spec, app._encode_cursor([3, 14])) == [3, 14]
+    for values in (["x", 14], [3, {"a": 1}], [3, 1.5], [True, 14], [3, 2 ** 31], [None, 14], [3]):
+        with pytest.raises(BadRequest):
+            app._parse_after(spec, app._encode_cursor(values))
+    kickoff = app._cursor_value("kickoff_time", "2025-08-16T14:00:00+00:00")
+    assert kickoff.utcoffset() is not None and kickoff.hour == 14
+    with pytest.raises(BadRequest):
+        app._cursor_value("kickoff_time", 5)
+
+
+def test_parse_ids_rejects_ids_outside_the_int_range():
+    spec = app.COLLECTIONS["players"]
+    assert app._parse_ids(spec, "2147483647,1,1") == [2147483647, 1, 1]
+    for raw in ("0", "-3", "2147483648", "1,99999999999", "x", ""):
+        with pytest.raises(BadRequest):
+            app._parse_ids(spec, raw)
+    with pytest.raises(BadRequest):
+        app._parse_ids(app.COLLECTIONS["weeklystandings"], "1")
@@ -0,0 +1,74 @@
+"""
+Offline unit tests for the API's connection pool (psycopg2.connect is faked)
+"""
+import threading
+import time
+
+import psycopg2
+import pytest
+
+import app
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = psycopg2.extensions.STATUS_READY
+        self.statement_times = []
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(app.psycopg2, "connect", lambda **kwargs: FakeConnection())
+    return app.ConnectionPool(0, 1, 1, check_after=60)
+
+
+def test_pool_times_out_when_exhausted(pool):
+    pool.getconn(timeout=1)
+    started = time.monotonic()
+    with pytest.raises(app.PoolTimeout, match="within"):
+        pool.getconn(timeout=0.05)
+    assert time.monotonic() - started >= 0.05
+    assert pool.waiting == 0
+    assert len(pool.wait_times) == 2
+
+
+def test_pool_sheds_when_wait_queue_is_full(pool):
+    pool.getconn(timeout=1)
+    waiter = threading.Thread(target=lambda: pytest.raises(app.PoolTimeout, pool.getconn, timeout=0.5))
+    waiter.start()
+    while not pool.waiting:
+        time.sleep(0.001)
+    with pytest.raises(app.PoolTimeout, match="queue is full"):
+        pool.getconn(timeout=1)
+    waiter.join()
+
+
+def test_pool_hands_returned_connection_to_oldest_waiter(pool):
+    conn = pool.getconn(timeout=1, label="/a")
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn(timeout=1, label="/b")))
+    waiter.start()
+    while not pool.waiting:
+        time.sleep(0.001)
+    conn.statement_times.append(("players_by_id", 0.01))
+    pool.putconn(conn)
+    waiter.join()
+    assert got == [conn]
+    assert pool.in_use == 1 and pool.idle == 0
+    assert dict(pool.checkouts) == {"/a": 1, "/b": 1}
+    assert pool.statement_times == [("players_by_id", 0.01)] and conn.statement_times == []
+
+
+def test_pool_snapshot_and_drained_samples(pool):
+    conn = pool.getconn(timeout=1, label="/a")
+    opened, idle, waiting, ages = pool.snapshot()
+    assert (opened, idle, waiting) == (1, 0, 0) and len(ages) == 1 and ages[0] >= 0
+    pool.putconn(conn)
+    checkouts, held, reconnects, wait_times, statement_times = pool.drain_samples()
+    assert checkouts == {"/a": 1} and set(held) == {"/a"} and reconnects == 0
+    assert len(wait_times) == 1 and statement_times == []
+    assert pool.drain_samples()[3] == [] and pool.snapshot()[:3] == (1, 1, 0)
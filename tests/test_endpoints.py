@@ -8,7 +8,7 @@ from typing import Dict, Any
 import os
 
 # Base URL for the API
-BASE_URL = "http://192.168.68.89:8000"
+BASE_URL = os.getenv('API_BASE_URL', "http://192.168.68.89:8000")
 
 # API Token - can be set via environment variable
 API_TOKEN = os.getenv('API_TOKEN', 'LmdbWbDuvLm0i1sWotGlnKOgrJ2Naj2AMPAwKMI62CgKtJDi7LXeSFpOcOoH4H0mX2OjyDsqq6tDebrjcVT14lKrhWFniHrD3Kyh7LMtITUgN1CU6Htm6Pa9JX5apRTG')
@@ -63,6 +63,16 @@ def test_endpoints():
         ("GET", "/teams", "All teams"),
         ("GET", "/fixtures", "All fixtures"),
         ("GET", "/completedFixtures", "Completed fixtures"),
+        ("GET", "/completedFixtures?format=ndjson", "Completed fixtures (NDJSON stream)"),
+        ("GET", "/completedFixtures?fields=home_team_id,away_team_id,home_team_score,away_team_score&limit=50", "Completed fixtures (projected page)"),
+        ("GET", "/players?fields=player_name,team_id&limit=100", "Players (projected page)"),
+        ("GET", "/teams?ids=1,2,3", "Teams (multi-get)"),
+        ("GET", "/teamForm", "Precomputed team form"),
+        ("GET", "/teamForm?fields=form", "Team form strings only"),
+        ("GET", "/fplPlayers", "FPL player metrics"),
+        ("GET", "/fplPlayers?sort=value_season&position=Midfielder&limit=10", "FPL top-10 value midfielders"),
+        ("GET", "/leaderboard?stat=goals", "Top scorers"),
+        ("GET", "/leaderboard?stat=fpl_points&position=Defender&top=5", "Top-5 FPL defenders"),
         ("GET", "/upcomingFixtures", "Upcoming fixtures"),
         ("GET", "/upcomingGameweek", "Next gameweek number"),
     ])
@@ -74,6 +84,8 @@ def test_endpoints():
         ("GET", "/teamsById/{id}", "Team by ID"),
         ("GET", "/fixturesById/{id}", "Fixture by ID"),
         ("GET", "/completedGamebyId/{id}", "Completed game by ID"),
+        ("GET", "/completedGamebyTeamId/{id}?include=stats", "Completed games by team with match stats"),
+        ("GET", "/matchDetails/{id}", "Match events, stats, lineups and report"),
         ("GET", "/upcomingFixturesbyID/{id}", "Upcoming fixture by ID"),
     ]
     
@@ -161,6 +173,8 @@ def test_endpoints():
             ("/teamsById/{id}", "team_id"),
             ("/fixturesById/{id}", "fixture_id"),
             ("/completedGamebyId/{id}", "match_id"),
+            ("/completedGamebyTeamId/{id}?include=stats", "team_id"),
+            ("/matchDetails/{id}", "match_id"),
             ("/upcomingFixturesbyID/{id}", "fixture_id"),
         ]
         
@@ -0,0 +1,52 @@
+"""
+Offline unit tests for the /fplPlayers metrics table
+"""
+import pytest
+from werkzeug.exceptions import BadRequest
+
+import app
+
+
+def fpl_player(player_id, team_id, minutes, total_points, appearances=10, now_cost=50):
+    numeric = {"appearances": appearances, "now_cost": now_cost, "total_points": total_points, "event_points": 2,
+               "points_per_game": 4.5, "form": 5.0, "ict_index": 10.0, "selected_by_percent": 1.5,
+               "minutes": minutes, "chance_of_playing": None}
+    return (player_id, f"p{player_id}", "Forward", team_id, *(numeric[n] for n in app.FPL_NUMERIC), True, "")
+
+
+def test_build_fpl_table_per_90_and_value():
+    players = [fpl_player(1, 1, minutes=900, total_points=60), fpl_player(2, 2, minutes=0, total_points=0),
+               fpl_player(3, 99, minutes=45, total_points=3, appearances=0, now_cost=0)]
+    teams = [(1, "Arsenal", "ARS", 4), (2, "Brentford", "BRE", None)]
+    table = app.build_fpl_table(players, teams, [(7, 1, 2)])
+    metrics = table["metrics"]
+    assert metrics["points_per_90"].tolist() == [6.0, 0.0, 6.0]
+    assert metrics["value_season"].tolist() == [12.0, 0.0, 0.0]  # no division by a zero price
+    assert metrics["minutes_per_game"].tolist() == [90.0, 0.0, 45.0]  # zero appearances count as one
+    assert metrics["chance_of_playing"].tolist() == [100, 100, 100]
+    assert table["next_opponent_id"].tolist() == [2, 1, None]
+    assert metrics["next_opponent_difficulty"].tolist() == [app.FPL_DEFAULT_DIFFICULTY, 4, app.FPL_DEFAULT_DIFFICULTY]
+    assert table["team_name"].tolist() == ["Arsenal", "Brentford", None]
+    assert table["gameweek"] == 7
+
+
+def test_build_fpl_table_double_gameweek_uses_earliest_fixture():
+    players = [fpl_player(1, 1, minutes=90, total_points=5), fpl_player(2, 2, minutes=90, total_points=5),
+               fpl_player(3, 3, minutes=90, total_points=5)]
+    teams = [(1, "A", "A", 2), (2, "B", "B", 3), (3, "C", "C", 5)]
+    # earliest-first, as FPL_NEXT_FIXTURES_SQL orders them: team 1 plays 2 first, then 3
+    table = app.build_fpl_table(players, teams, [(7, 1, 2), (7, 3, 1), (7, 9, 3)])
+    assert table["next_opponent_id"].tolist() == [2, 1, 1]
+    assert table["metrics"]["next_opponent_difficulty"].tolist() == [3, 2, 2]
+
+
+def test_fpl_rows_filters_sorts_and_limits():
+    players = [fpl_player(1, 1, minutes=900, total_points=60), fpl_player(2, 2, minutes=900, total_points=90),
+               fpl_player(3, 2, minutes=900, total_points=30)]
+    table = app.build_fpl_table(players, [(1, "A", "A", 3), (2, "B", "B", 3)], [])
+    query = app.parse_fpl_query({"sort": "points_per_90", "team_id": "2", "limit": "1"})
+    with pytest.raises(BadRequest):
+        app.parse_fpl_query({"sort": "bogus"})
+    rows = app.fpl_rows(table, query)
+    assert [row["player_id"] for row in rows] == [2]
+    assert rows[0]["derived"]["points_per_90"] == 9.0
@@ -0,0 +1,28 @@
+"""
+Offline unit tests for the prefix-keyed geo lookup cache
+"""
+import app
+
+
+def test_geo_cache_keys_by_prefix_with_ttl(clock):
+    geo = app.GeoCache(max_entries=10, ttl=100, negative_ttl=5, v4_prefix=24, v6_prefix=48)
+    geo.put("81.2.69.142", {"country_iso2": "GB"})
+    assert geo.get("81.2.69.7") == {"country_iso2": "GB"}  # same /24
+    assert geo.get("81.2.70.1") is None
+    geo.put("2001:db8:1::1", {})
+    assert geo.get("2001:db8:1:ffff::2") == {}  # cached failure, same /48
+    clock.sleep(5)
+    assert geo.get("2001:db8:1::1") is None  # negative entries expire first
+    assert geo.get("81.2.69.142") == {"country_iso2": "GB"}
+    clock.sleep(95)
+    assert geo.get("81.2.69.142") is None
+
+
+def test_geo_cache_evicts_least_recently_used(clock):
+    geo = app.GeoCache(max_entries=2, ttl=100, negative_ttl=5, v4_prefix=24, v6_prefix=48)
+    geo.put("1.1.1.1", {"city": "a"})
+    geo.put("2.2.2.2", {"city": "b"})
+    geo.get("1.1.1.1")
+    geo.put("3.3.3.3", {"city": "c"})
+    assert geo.get("2.2.2.2") is None
+    assert geo.get("1.1.1.1") == {"city": "a"} and geo.get("3.3.3.3") == {"city": "c"}
@@ -0,0 +1,69 @@
+"""
+Offline unit tests for the token-bucket rate limiter and client IP resolution
+"""
+import pytest
+
+import app
+
+
+@pytest.fixture(params=["local", "shared"])
+def bucket_store(request, tmp_path):
+    if request.param == "local":
+        return app.LocalBucketStore(max_keys=2)
+    return app.SharedBucketStore(str(tmp_path / "buckets.sqlite3"), max_keys=2)
+
+
+def test_bucket_spends_and_refills(bucket_store, clock):
+    assert bucket_store.take("ip:a", 6, capacity=10, rate=2) == 4
+    assert bucket_store.take("ip:a", 6, capacity=10, rate=2) == -2
+    clock.sleep(1)
+    # a refused take leaves the bucket as it was: 4 + 1s * 2
+    assert bucket_store.take("ip:a", 6, capacity=10, rate=2) == 0
+    clock.sleep(100)
+    assert bucket_store.take("ip:a", 1, capacity=10, rate=2) == 9  # capped at capacity
+    assert bucket_store.take("ip:b", 1, capacity=10, rate=2) == 9  # buckets are per key
+
+
+def test_local_bucket_store_evicts_least_recently_used(clock):
+    store = app.LocalBucketStore(max_keys=2)
+    for key in ("ip:a", "ip:b", "ip:c"):
+        store.take(key, 5, capacity=10, rate=1)
+    assert list(store._buckets) == ["ip:b", "ip:c"]
+
+
+def test_rate_limiter_returns_retry_after_and_caps_cost(clock):
+    limiter = app.RateLimiter(app.LocalBucketStore(10), capacity=10, rate=2, costs={"/players": 50})
+    assert limiter.cost("/players") == 10
+    assert limiter.check("ip:a", "/players") is None
+    assert limiter.check("ip:a", "/teams") == 1
+    assert limiter.check("ip:a", "/players") == 5
+
+
+def test_rate_limiter_lets_requests_through_when_the_store_fails(clock):
+    class BrokenStore:
+        def take(self, *args):
+            raise app.sqlite3.OperationalError("database is locked")
+
+    fail_open = app.RATE_LIMIT_FAIL_OPEN.labels(reason="locked")
+    before = fail_open._value.get()
+    limiter = app.RateLimiter(BrokenStore(), capacity=1, rate=1, costs={})
+    assert limiter.check("ip:a", "/teams") is None
+    assert fail_open._value.get() == before + 1
+
+
+def test_rate_limiter_rejects_zero_refill():
+    with pytest.raises(ValueError):
+        app.RateLimiter(app.LocalBucketStore(10), capacity=10, rate=0, costs={})
+
+
+def test_resolve_client_ip_only_believes_trusted_proxies(monkeypatch):
+    headers = {"X-Forwarded-For": "6.6.6.6, 203.0.113.7, 10.0.0.5", "CF-Connecting-IP": "5.6.7.8", "X-Real-IP": "1.2.3.4"}
+    # the right-most hop that is not one of our proxies; client-supplied entries further left are ignored
+    assert app.resolve_client_ip(headers, "10.0.0.9") == "203.0.113.7"
+    # a caller reaching the service directly is keyed on its own address whatever it sends
+    assert app.resolve_client_ip(headers, "198.51.100.2") == "198.51.100.2"
+    assert app.resolve_client_ip({"X-Forwarded-For": "10.0.0.4"}, "10.0.0.9") == "10.0.0.4"
+    assert app.resolve_client_ip({}, "10.0.0.9") == "10.0.0.9"
+    monkeypatch.setattr(app, "CLIENT_IP_HEADER", "CF-Connecting-IP")
+    assert app.resolve_client_ip(headers, "10.0.0.9") == "5.6.7.8"
+    assert app.resolve_client_ip(headers, "198.51.100.2") == "198.51.100.2"
@@ -0,0 +1,29 @@
+"""
+Offline unit tests for the API's versioned response cache
+"""
+import app
+
+
+def test_response_cache_versions_and_ttl(clock):
+    cache = app.ResponseCache(max_bytes=1024, max_entries=10)
+    cache.put(("/a", ""), b"body", "application/json", (1,), ttl=10, headers={"Link": "x"})
+    assert cache.get(("/a", ""), (1,)) == (b"body", "application/json", {"Link": "x"})
+    assert cache.get(("/a", ""), (2,)) is None  # a version bump drops the entry
+    cache.put(("/a", ""), b"body", "application/json", (2,), ttl=10)
+    clock.sleep(10)
+    assert cache.get(("/a", ""), (2,)) is None
+    assert cache._bytes == 0
+
+
+def test_response_cache_evicts_by_entries_and_bytes(clock):
+    cache = app.ResponseCache(max_bytes=10, max_entries=2)
+    cache.put(("/a", ""), b"aaaa", "text/plain", (1,), ttl=60)
+    cache.put(("/b", ""), b"bbbb", "text/plain", (1,), ttl=60)
+    cache.get(("/a", ""), (1,))  # /a is now the most recently used
+    cache.put(("/c", ""), b"cc", "text/plain", (1,), ttl=60)
+    assert cache.get(("/b", ""), (1,)) is None
+    cache.put(("/d", ""), b"ddddddddd", "text/plain", (1,), ttl=60)
+    assert [k for k in (("/a", ""), ("/c", ""), ("/d", "")) if cache.get(k, (1,))] == [("/d", "")]
+    assert cache._bytes == 9
+    cache.put(("/e", ""), b"x" * 11, "text/plain", (1,), ttl=60)  # larger than the whole cache
+    assert cache.get(("/e", ""), (1,)) is None
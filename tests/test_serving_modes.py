@@ -0,0 +1,140 @@
+"""
+The same endpoint checks run against both serving modes: the Flask app
+(API_MODE=wsgi) through its test client and the FastAPI app (API_MODE=asgi)
+through Starlette's TestClient.
+
+Needs a loaded database reachable with the DB_* settings (e.g.
+DB_HOST=/tmp/pgdata); the module is skipped when there is none.
+"""
+import json
+import time
+from collections import namedtuple
+
+import psycopg2
+import pytest
+
+import app
+
+TOKEN = "serving-modes-token"
+COMPARED_HEADERS = ("Content-Type", "Cache-Control", "ETag", "Last-Modified", "X-Next-Cursor", "Link")
+
+Reply = namedtuple("Reply", "status headers body")
+
+
+def _json(reply):
+    return json.loads(reply.body)
+
+
+@pytest.fixture(scope="module")
+def clients():
+    try:
+        psycopg2.connect(host=app.DB_HOST, port=app.DB_PORT, dbname=app.DB_NAME, user=app.DB_USER,
+                         password=app.DB_PASS, connect_timeout=2).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"no database for the serving-mode tests: {e}")
+    pytest.importorskip("fastapi")
+    import asgi
+    from fastapi.testclient import TestClient
+
+    flask_client = app.app.test_client()
+
+    def flask_get(path, headers=None):
+        r = flask_client.get(path, headers=headers or {})
+        return Reply(r.status_code, r.headers, r.get_data())
+
+    with TestClient(asgi.app) as asgi_client:
+        def asgi_get(path, headers=None):
+            r = asgi_client.get(path, headers=headers or {})
+            return Reply(r.status_code, r.headers, r.content)
+
+        # the asyncpg pools connect in the background after startup
+        deadline = time.monotonic() + 10
+        while asgi_get("/readyz").status != 200:
+            assert time.monotonic() < deadline, "asgi mode never became ready"
+            time.sleep(0.1)
+        yield {"wsgi": flask_get, "asgi": asgi_get}
+
+
+@pytest.fixture(autouse=True)
+def api_token(monkeypatch):
+    monkeypatch.setattr(app, "API_TOKEN", TOKEN)
+
+
+@pytest.fixture(params=["wsgi", "asgi"])
+def get(request, clients):
+    def get(path, headers=None, token=True):
+        return clients[request.param](path, {"X-API-Token": TOKEN, **(headers or {})} if token else headers)
+    return get
+
+
+def test_health_is_public_and_not_cached(get):
+    r = get("/health", token=False)
+    assert r.status == 200 and _json(r) == {"status": "ok"}
+    assert r.headers["Cache-Control"] == "no-store"
+    assert r.headers["X-Content-Type-Options"] == "nosniff" and r.headers["X-Request-ID"]
+
+
+def test_data_routes_need_the_token(get):
+    r = get("/teams", token=False)
+    assert r.status == 401
+    assert _json(r) == {"error": "unauthorized", "message": "Missing or Invalid API token"}
+
+
+def test_pages_follow_the_link_header(get):
+    first = get("/players?fields=player_name&limit=2")
+    assert first.status == 200
+    rows = _json(first)
+    assert len(rows) == 2 and all(set(row) == {"player_id", "player_name"} for row in rows)
+    assert first.headers["X-Next-Cursor"]
+    link = first.headers["Link"]
+    assert link.endswith('>; rel="next"') and "api_token" not in link
+
+    second = get(link[1:link.index(">")])
+    assert second.status == 200
+    assert all(row["player_id"] > rows[-1]["player_id"] for row in _json(second))
+
+
+def test_ids_keep_request_order_and_null_misses(get):
+    a, b = (row["player_id"] for row in _json(get("/players?fields=player_id&limit=2")))
+    r = get(f"/players?ids={b},{app.PG_INT_MAX},{a}&fields=player_id")
+    assert r.status == 200
+    assert _json(r) == [{"player_id": b}, None, {"player_id": a}]
+
+
+@pytest.mark.parametrize("query", ["limit=x", "after=bad", "ids=1&limit=2", "ids=0", "fields=bogus"])
+def test_bad_collection_arguments_are_400(get, query):
+    r = get(f"/players?{query}")
+    assert r.status == 400 and _json(r)["error"] == "bad_request"
+
+
+def test_conditional_get_answers_304(get):
+    r = get("/teams")
+    assert r.status == 200 and r.headers["Cache-Control"].startswith("public")
+    again = get("/teams", headers={"If-None-Match": r.headers["ETag"]})
+    assert again.status == 304 and again.body == b""
+    assert again.headers["ETag"] == r.headers["ETag"]
+
+
+def test_ndjson_streams_every_row(get):
+    r = get("/players?format=ndjson")
+    assert r.status == 200 and r.headers["Content-Type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.body.decode().splitlines()]
+    assert len(lines) == len(_json(get("/players")))
+
+
+def test_missing_match_is_404(get):
+    r = get("/matchDetails/0")
+    assert r.status == 404 and _json(r) == {"error": "not_found", "message": "Match not found"}
+
+
+@pytest.mark.parametrize("path", [
+    "/standings", "/teams", "/players?fields=player_name,team_id&limit=3", "/fixtures?limit=2",
+    "/completedFixtures?format=ndjson", "/teamForm", "/fplPlayers?limit=5", "/leaderboard?stat=goals",
+    "/upcomingFixtures", "/players?ids=x", "/nope",
+])
+def test_modes_answer_identically(clients, path):
+    headers = {"X-API-Token": TOKEN}
+    wsgi, asgi_reply = clients["wsgi"](path, headers), clients["asgi"](path, headers)
+    assert wsgi.status == asgi_reply.status
+    assert wsgi.body == asgi_reply.body
+    assert {h: wsgi.headers.get(h) for h in COMPARED_HEADERS} == {h: asgi_reply.headers.get(h) for h in COMPARED_HEADERS}
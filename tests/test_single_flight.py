@@ -0,0 +1,110 @@
+"""
+Offline unit tests for single flight and the shared stream fanout
+"""
+import threading
+import time
+
+import app
+
+
+def run_concurrently(flight, n, fn, key="k"):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn, "/test"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def test_single_flight_shares_one_result():
+    calls = []
+    release = threading.Event()
+
+    def render():
+        calls.append(1)
+        release.wait(1)
+        return "own", "shared"
+
+    flight = app.SingleFlight(timeout=2)
+    threading.Timer(0.1, release.set).start()
+    results, errors = run_concurrently(flight, 5, render)
+    assert not errors and len(calls) == 1
+    assert sorted(results, key=str) == [("own", "shared")] + [(None, "shared")] * 4
+    assert flight._flights == {}
+
+
+def test_single_flight_propagates_the_leaders_error():
+    release = threading.Event()
+
+    def render():
+        release.wait(1)
+        raise LookupError("boom")
+
+    flight = app.SingleFlight(timeout=2)
+    threading.Timer(0.1, release.set).start()
+    results, errors = run_concurrently(flight, 4, render)
+    assert results == [] and len(errors) == 4
+    assert all(isinstance(e, LookupError) for e in errors)
+
+
+def test_single_flight_waiter_renders_itself_after_timeout():
+    calls = []
+    release = threading.Event()
+
+    def render():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(1)
+        return "own", "shared"
+
+    flight = app.SingleFlight(timeout=0.05)
+    threading.Timer(0.2, release.set).start()
+    results, errors = run_concurrently(flight, 2, render)
+    assert not errors and len(calls) == 2
+    assert results == [("own", "shared")] * 2
+
+
+def test_stream_fanout_replays_chunks_to_followers():
+    fanout = app.StreamFanout(iter(["[", "1", ",2", "]"]), 200, "application/json", {})
+    assert next(fanout) == "["
+    follower = fanout.join()
+    fanout.close()  # the leader's client went away; the source is still drained for the follower
+    assert "".join(follower[1]) == "[1,2]"
+    abandoned = app.StreamFanout(iter(["["]), 200, "application/json", {})
+    abandoned.close()
+    assert abandoned.join() is None
+
+
+def test_stream_fanout_keeps_only_unread_chunks_once_sealed():
+    sealed = []
+    fanout = app.StreamFanout(iter(["ab"] * 50), 200, "application/json", {}, max_bytes=4)
+    fanout.on_sealed(lambda: sealed.append(True))
+    follower = fanout.join()[1]
+    assert [next(fanout) for _ in range(3)] == ["ab"] * 3
+    assert sealed and fanout.join() is None  # past max_bytes: no late joiners
+    assert fanout._bytes == 6  # the follower has not read anything yet
+    received = []
+
+    def read():
+        for chunk in follower:
+            received.append(chunk)
+            time.sleep(0.001)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    peak = 0
+    for _ in fanout:  # the leader waits whenever the follower's backlog is over max_bytes
+        peak = max(peak, fanout._bytes)
+    reader.join()
+    assert peak <= 6 and len(received) == 50
+    unread = app.StreamFanout(iter(["ab"] * 50), 200, "application/json", {}, max_bytes=4)
+    unread.join()[1].close()  # a follower dropped before it is iterated does not hold the leader
+    assert list(unread) == ["ab"] * 50 and unread._chunks == []
@@ -0,0 +1,85 @@
+"""
+Offline unit tests for the pipeline's team form calculation
+"""
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend", "data"))
+
+from transformers.buildTeamForm import calculate_team_form, upload_team_form  # noqa: E402
+
+
+def match(match_id, home_id, home_score, away_id, away_score, gameweek=1):
+    kickoff = datetime(2025, 8, 1, 15, tzinfo=timezone.utc)
+    return (match_id, gameweek, kickoff, home_id, f"Team {home_id}", f"T{home_id}", home_score,
+            away_id, f"Team {away_id}", f"T{away_id}", away_score)
+
+
+def by_team(rows):
+    return {row['team_id']: row for row in rows}
+
+
+def test_no_results_gives_no_rows():
+    assert calculate_team_form([]) == []
+
+
+def test_form_streak_and_splits_most_recent_first():
+    results = [
+        match(4, 1, 2, 2, 0, gameweek=4),  # latest
+        match(3, 3, 1, 1, 1, gameweek=3),
+        match(2, 1, 0, 3, 1, gameweek=2),
+        match(1, 2, 0, 1, 3, gameweek=1),
+    ]
+    team = by_team(calculate_team_form(results))[1]
+    assert team['played'] == 4
+    assert team['form'] == 'WDLW'
+    assert team['home_form'] == 'WL' and team['away_form'] == 'DW'
+    assert team['streak'] == 'W1'
+    assert team['unbeaten'] == 2
+    assert team['home'] == {'played': 2, 'won': 1, 'drawn': 0, 'lost': 1, 'goalsFor': 2, 'goalsAgainst': 1, 'points': 3}
+    assert team['away'] == {'played': 2, 'won': 1, 'drawn': 1, 'lost': 0, 'goalsFor': 4, 'goalsAgainst': 1, 'points': 4}
+    assert [r['match_id'] for r in team['last_results']] == [4, 3, 2, 1]
+    assert team['last_results'][1] == {
+        'match_id': 3, 'gameweek': 3, 'kickoff_time': '2025-08-01T15:00:00+00:00', 'side': 'away',
+        'opponent_id': 3, 'opponent_abbr': 'T3', 'goals_for': 1, 'goals_against': 1, 'result': 'D',
+    }
+
+
+def test_form_length_caps_strings_but_not_counts():
+    results = [match(i, 1, 0, 2, 0) for i in range(7, 0, -1)]
+    team = by_team(calculate_team_form(results, form_length=3))[2]
+    assert team['played'] == 7
+    assert team['form'] == 'DDD' and team['away_form'] == 'DDD' and team['home_form'] == ''
+    assert team['streak'] == 'D7' and team['unbeaten'] == 7
+    assert len(team['last_results']) == 3
+    assert team['away']['points'] == 7
+
+
+def test_rows_are_ordered_by_team_id_and_handle_missing_kickoff():
+    results = [(1, 1, None, 9, "Team 9", "T9", 0, 5, "Team 5", "T5", 2)]
+    rows = calculate_team_form(results)
+    assert [row['team_id'] for row in rows] == [5, 9]
+    assert rows[1]['streak'] == 'L1' and rows[1]['unbeaten'] == 0
+    assert rows[0]['last_results'][0]['kickoff_time'] is None
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append((" ".join(query.split()), params))
+
+
+def test_upload_replaces_rows_and_bumps_the_version():
+    cursor = RecordingCursor()
+    rows = calculate_team_form([match(1, 1, 2, 2, 1)])
+    upload_team_form(cursor, rows)
+    queries = [query.split(" ")[0] for query, _ in cursor.statements]
+    assert queries == ["DELETE", "INSERT", "INSERT", "INSERT"]
+    assert cursor.statements[-1][1] == ("teamform",)  # the data_versions bump the API's ETags follow
+    params = cursor.statements[1][1]
+    assert params[:9] == (1, "Team 1", "T1", 1, "W", "W", "", "W1", 1)
+    assert json.loads(params[11])[0]["match_id"] == 1